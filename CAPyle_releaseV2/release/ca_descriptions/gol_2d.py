@@ -24,18 +24,18 @@ STATE_CHAP = 4
 STATE_SCRUB = 5
 STATE_TOWN = 6
 
-def transition_func(grid, neighbourstates, neighbourcounts):
+def transition_func(grid, neighbourstates, neighbourcounts, probabilities,
+                    uniforms=None):
 
     old = grid.copy()
     # burning neighbours
     burning_neighbours = neighbourcounts[STATE_FIRE]
 
-    probability = np.random.random(grid.shape)
+    # random numbers drawn from the seeded generator of the run
+    probability = uniforms if uniforms is not None else np.random.random(grid.shape)
 
    # catching fire probabilities
-    probability_dense = 0.5
-    probability_chaparral = 0.9
-    probability_scrub = 0.95
+    probability_dense, probability_chaparral, probability_scrub = probabilities
 
     dense_burn = (grid == STATE_DENSE) & (burning_neighbours > 0) & (probability < probability_dense)
     chap_burn  = (grid == STATE_CHAP) & (burning_neighbours > 0) & (probability < probability_chaparral)
@@ -69,6 +69,14 @@ def setup(args):
     config.grid_dims = (100,100)
     config.wrap = False
 
+    # catching fire probabilities
+    config.probability_dense = 0.5
+    config.probability_chaparral = 0.9
+    config.probability_scrub = 0.95
+
+    # seed of the random numbers, set to an int to replay a run
+    config.seed = None
+
     # ----------------------------------------------------------------------
 
     if len(args) == 2:
@@ -98,12 +106,15 @@ def generate_grid(grid):
 
     grid[88:92, 28:32] = STATE_TOWN
 
-def main():
+def main(args=None):
     # Open the config object
-    config = setup(sys.argv[1:])
+    config = setup(sys.argv[1:] if args is None else args)
 
-    # Create grid object
-    grid = Grid2D(config, transition_func)
+    # Create grid object, passing the catching fire probabilities
+    # to the transition function
+    probabilities = (config.probability_dense, config.probability_chaparral,
+                     config.probability_scrub)
+    grid = Grid2D(config, (transition_func, probabilities))
 
     # Grid generation logic function
     generate_grid(grid.grid)
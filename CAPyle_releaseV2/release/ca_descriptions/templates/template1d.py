@@ -51,10 +51,11 @@ def transition_function(grid, neighbourstates, neighbourcounts):
     return newrow
 
 
-def main():
-    """ Main function that sets up, runs and saves CA"""
+def main(args=None):
+    """ Main function that sets up, runs and saves CA, args being the
+    command line arguments (sys.argv[1:] if None)"""
     # get the config object
-    config = setup(sys.argv[1:])
+    config = setup(sys.argv[1:] if args is None else args)
 
     # create the grid
     grid = Grid1D(config, transition_function)
@@ -49,10 +49,11 @@ def transition_function(grid, neighbourstates, neighbourcounts):
     return grid
 
 
-def main():
-    """ Main function that sets up, runs and saves CA"""
+def main(args=None):
+    """ Main function that sets up, runs and saves CA, args being the
+    command line arguments (sys.argv[1:] if None)"""
     # Get the config object from set up
-    config = setup(sys.argv[1:])
+    config = setup(sys.argv[1:] if args is None else args)
 
     # Create grid object using parameters from config + transition function
     grid = Grid2D(config, transition_function)
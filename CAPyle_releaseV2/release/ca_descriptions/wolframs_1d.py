@@ -13,7 +13,7 @@ sys.path.append(main_dir_loc + 'capyle/guicomponents')
 # -------------------------------------------
 
 import numpy as np
-from capyle.ca import Grid1D
+from capyle.ca import Grid1D, ElementaryRule
 import capyle.utils as utils
 
 
@@ -40,42 +40,14 @@ def setup(args):
     return config
 
 
-def transition_function(grid, neighbourstates, neighbourcounts, rulebool):
-    left, center, right = neighbourstates
-    left = left == 1
-    center = center == 1
-    right = right == 1
-    not_left, not_center, not_right = (np.invert(left),
-                                       np.invert(center),
-                                       np.invert(right))
-    rule_application = np.array([
-        rulebool[0] & left     & center     & right,
-        rulebool[1] & left     & center     & not_right,
-        rulebool[2] & left     & not_center & right,
-        rulebool[3] & left     & not_center & not_right,
-        rulebool[4] & not_left & center     & right,
-        rulebool[5] & not_left & center     & not_right,
-        rulebool[6] & not_left & not_center & right,
-        rulebool[7] & not_left & not_center & not_right,
-        ])
+def main(args=None):
+    config = setup(sys.argv[1:] if args is None else args)
 
-    newrow = rule_application[0]
-    for i in range(rule_application.shape[0] - 1):
-        newrow += rule_application[i+1]
-    return newrow
-
-
-def main():
-    config = setup(sys.argv[1:])
-
-    # Translate rule numer to boolean array:
-    # 30 -> [0,0,0,1,1,1,1,0] -> [F,F,F,T,T,T,T,F]
-    rulebool = utils.int_to_binary(config.rule_num) * True
-
-    # Create grid object
-    # passing transition function and rulebool as tuple to
-    # keep track of rulebool
-    grid = Grid1D(config, (transition_function, rulebool))
+    # The rule number gives the new state of the center cell for each
+    # (left, center, right) neighbourhood:
+    # 30 -> [0,0,0,1,1,1,1,0] for 111, 110, ..., 000
+    # ElementaryRule applies it with one table lookup per row
+    grid = Grid1D(config, ElementaryRule(config.rule_num))
 
     timeline = grid.run()
     utils.save(timeline, config.timeline_path)
@@ -1,3 +1,5 @@
 import utils
 from playbackcontrols import _PlaybackControls
 from display import Display
+from capyle.runner import run, run_description, resume
+from capyle.sweep import sweep, iter_sweep
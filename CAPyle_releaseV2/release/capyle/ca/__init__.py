@@ -1,5 +1,23 @@
-from neighbourhood import Neighbourhood
+from neighbourhood import (Neighbourhood, moore_neighbourhood,
+                           von_neumann_neighbourhood, circular_neighbourhood)
 from caconfig import CAConfig
+from configfile import save_config, load_config
+from pyramid import FramePyramid, mode_downsample
+from timeline import Timeline
+from checkpoint import Checkpointer, load_checkpoint
+from observers import (Observer, StateCounts, FirstGeneration, FrameSampler,
+                       Reducer, StopWhen, CycleDetector, observe_runs,
+                       run_observers)
+from progress import (ProgressEvent, ProgressSink, NullProgress,
+                      TerminalProgress, StreamProgress, TkProgress,
+                      ProgressReporter, progress_sink, thread_progress,
+                      current_progress)
+from initialgrid import (proportional_states, random_states, value_noise,
+                         fractal_noise, noise_states)
 from grid import Grid
+from hashlife import LifeRule, HashLife
+from rules import TableRule, TotalisticRule, CountRule, compile_rule
+from elementary import (ElementaryRule, run_elementary, pack_row,
+                        unpack_rows)
 from grid1d import Grid1D, randomise1d
 from grid2d import Grid2D, randomise2d
@@ -20,6 +20,48 @@ class CAConfig(object):
         self.initial_grid = None
         # default wrapping behaviour is True
         self.wrap = True
+        # file to write the timeline to while running, None keeps it in memory
+        self.timeline_file = None
+        # dtype of the grid and timeline, None picks the narrowest dtype
+        # that holds all the states
+        self.state_dtype = None
+        # size of the tiles stepped only when near a change in the grid,
+        # None steps the whole grid every generation
+        self.active_tile_size = None
+        # number of threads to step the grid on in row bands, None steps
+        # the whole grid on one thread
+        self.num_threads = None
+        # B/S rule to run with the HashLife engine (eg. 'B3/S23'), None
+        # runs the transition function unless it is itself a LifeRule
+        self.life_rule = None
+        # most nodes cached by the HashLife engine, None uses the default
+        self.hashlife_max_nodes = None
+        # compile the transition function into a lookup table, stochastic
+        # rules need the number of samples to estimate their probabilities
+        self.compile_rule = False
+        self.compile_samples = None
+        # generations between the frames saved to the timeline
+        self.timeline_interval = 1
+        # file to checkpoint the run to, None does not checkpoint, with
+        # the generations or seconds between checkpoints (None for both
+        # checkpoints every checkpoint.DEFAULT_EVERY generations)
+        self.checkpoint_file = None
+        self.checkpoint_every = None
+        self.checkpoint_seconds = None
+        # carry on from the last checkpoint, if there is one
+        self.resume = False
+        # end the run once the grid reaches a fixed point or cycle of at
+        # most cycle_window generations, repeated for cycle_confirm more
+        # periods, with cycle_action 'stop' or 'fast_forward' to fill in
+        # the rest of the timeline from the cycle
+        self.detect_cycles = False
+        self.cycle_window = 100
+        self.cycle_confirm = 1
+        self.cycle_action = 'stop'
+        # seed of the random generator passed to transition functions
+        # taking an rng or uniforms argument (see Grid.setup_rng), None for
+        # a different seed every run
+        self.seed = None
         self.default_paths()
 
     def fill_in_defaults(self):
@@ -51,8 +93,27 @@ class CAConfig(object):
             else:
                 self.nhood_arr = np.array([1, 1, 1])
 
+    def __setattr__(self, name, value):
+        # pinned values are kept even if the description tries to set them
+        if name in self.__dict__.get('pinned', ()):
+            return
+        object.__setattr__(self, name, value)
+
+    def pin(self, **values):
+        """Set config values that are then kept fixed, so that they are not
+        overwritten by the setup function of the CA description
+
+        Example:
+            config.pin(num_generations=50, probability_dense=0.3)
+        """
+        pinned = self.__dict__.get('pinned', set()) - set(values)
+        object.__setattr__(self, 'pinned', pinned)
+        for name, value in values.items():
+            setattr(self, name, value)
+        object.__setattr__(self, 'pinned', pinned | set(values))
+
     def default_paths(self):
-        self.path = self.ROOT_PATH + '/temp/config.pkl'
+        self.path = self.ROOT_PATH + '/temp/config.json'
         self.timeline_path = self.ROOT_PATH + '/temp/timeline.pkl'
 
     def neighbourhood(self):
@@ -0,0 +1,131 @@
+import os
+import time
+import pickle
+import random
+import numpy as np
+
+# generations between checkpoints if neither a number of generations nor
+# a number of seconds is given
+DEFAULT_EVERY = 100
+# the frames of an in memory timeline are saved beside the checkpoint, eg.
+# run.ckpt -> run.ckpt.frames
+FRAMES_SUFFIX = '.frames'
+
+
+class Checkpointer(object):
+    """Saves snapshots of a running grid, so that the run can be resumed
+    from the last one (see Grid.run)
+
+    Note:
+        A snapshot holds the state of the grid (see Grid.get_state), the
+        state of numpy's and python's global random generators and the
+        number of frames of the timeline so far. File backed timelines
+        (ca_config.timeline_file) are flushed and only their path is
+        saved. The frames of in memory timelines are appended to a frames
+        file beside the checkpoint (see FRAMES_SUFFIX), only those since
+        the last checkpoint being written each time.
+
+        The checkpoint file is replaced atomically after the frames are
+        appended, so a crash while saving leaves the previous checkpoint
+        intact, any frames after it in the frames file being ignored.
+
+    Args:
+        path (str): the file to save the checkpoints to
+        every (int): generations between checkpoints
+        seconds (float): seconds between checkpoints
+    """
+
+    def __init__(self, path, every=None, seconds=None):
+        self.path = path
+        if every is None and seconds is None:
+            every = DEFAULT_EVERY
+        self.every = every
+        self.seconds = seconds
+        self.last_generation = 0
+        self.last_time = time.time()
+        # frames of an in memory timeline already in the frames file
+        self.saved_frames = 0
+
+    @property
+    def frames_path(self):
+        """str: the file the frames of in memory timelines are saved to"""
+        return self.path + FRAMES_SUFFIX
+
+    @classmethod
+    def from_config(cls, ca_config):
+        """Create the checkpointer for a config, None if
+        ca_config.checkpoint_file is not set"""
+        path = getattr(ca_config, 'checkpoint_file', None)
+        if path is None:
+            return None
+        return cls(path, getattr(ca_config, 'checkpoint_every', None),
+                   getattr(ca_config, 'checkpoint_seconds', None))
+
+    def due(self, generation):
+        """Return True if a checkpoint should be saved at the generation"""
+        if (self.every is not None and
+                generation - self.last_generation >= self.every):
+            return True
+        return (self.seconds is not None and
+                time.time() - self.last_time >= self.seconds)
+
+    def save(self, grid, timeline, generation):
+        """Save a checkpoint of the grid after the given generation, the
+        last frame of the timeline being that generation"""
+        if timeline.path is not None:
+            timeline.flush()
+        else:
+            self._append_frames(timeline)
+        checkpoint = {
+            'generation': generation,
+            'num_frames': len(timeline),
+            'grid_state': grid.get_state(),
+            'numpy_random': np.random.get_state(),
+            'python_random': random.getstate(),
+            'timeline_path': timeline.path,
+            'frame_shape': tuple(timeline.frame_shape),
+            'dtype': timeline.dtype.str,
+        }
+        temp = self.path + '.tmp'
+        with open(temp, 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self.path)
+        self.last_generation = generation
+        self.last_time = time.time()
+
+    def _append_frames(self, timeline):
+        """Write the frames of the timeline not yet in the frames file,
+        dropping any left after them by an earlier run"""
+        mode = 'r+b' if self.saved_frames else 'wb'
+        frame_bytes = timeline.frames[0].nbytes
+        with open(self.frames_path, mode) as f:
+            f.seek(self.saved_frames * frame_bytes)
+            f.truncate()
+            f.write(np.ascontiguousarray(
+                timeline.array[self.saved_frames:]).tobytes())
+        self.saved_frames = len(timeline)
+
+    def load_frames(self, checkpoint):
+        """Return the frames of an in memory timeline up to a checkpoint,
+        read from the frames file"""
+        shape = (checkpoint['num_frames'],) + tuple(checkpoint['frame_shape'])
+        frames = np.fromfile(self.frames_path,
+                             dtype=np.dtype(checkpoint['dtype']),
+                             count=int(np.prod(shape)))
+        if frames.size != np.prod(shape):
+            raise ValueError("Frames file {p} is shorter than the "
+                             "checkpoint".format(p=self.frames_path))
+        self.saved_frames = checkpoint['num_frames']
+        return frames.reshape(shape)
+
+
+def load_checkpoint(path):
+    """Load a checkpoint saved by a Checkpointer, None if there is none
+
+    Returns:
+        dict: the checkpoint, see Checkpointer.save
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,238 @@
+import os
+import json
+import base64
+import pickle
+import hashlib
+import uuid
+import numpy as np
+from capyle.ca import CAConfig
+
+# the version of the config file format written by save_config
+FORMAT_VERSION = 1
+# initial grids larger than this many bytes are memory mapped when loaded
+MMAP_BYTES = 2**26
+# the initial grid is saved beside the config, eg. config.json ->
+# config_initial_grid.npy
+GRID_SUFFIX = '_initial_grid.npy'
+# arrays with more elements than this, other than the initial grid, are
+# saved as base64 encoded bytes rather than lists
+MAX_LIST_SIZE = 1024
+
+_INT = (int, np.integer)
+_NUMBER = (int, float, np.integer, np.floating)
+_ARRAY = (np.ndarray, list, tuple)
+# the types each config value may have, besides None
+SCHEMA = {
+    'filepath': (str,),
+    'title': (str,),
+    'dimensions': _INT,
+    'states': (tuple, list, np.ndarray),
+    'grid_dims': (tuple, list),
+    'rule_num': _INT,
+    'state_colors': _ARRAY,
+    'num_generations': _INT,
+    'nhood_arr': _ARRAY,
+    'wrap': (bool,) + _NUMBER,
+    'timeline_file': (str,),
+    'active_tile_size': _INT,
+    'num_threads': _INT,
+    'hashlife_max_nodes': _INT,
+    'compile_rule': (bool,),
+    'compile_samples': _INT,
+    'timeline_interval': _INT,
+    'checkpoint_file': (str,),
+    'checkpoint_every': _INT,
+    'checkpoint_seconds': _NUMBER,
+    'resume': (bool,),
+    'detect_cycles': (bool,),
+    'cycle_window': _INT,
+    'cycle_confirm': _INT,
+    'cycle_action': (str,),
+    'seed': _INT + (np.random.SeedSequence,),
+    'path': (str,),
+    'timeline_path': (str,),
+    'pinned': (set,),
+}
+
+
+def validate(values):
+    """Check the types of config values against SCHEMA, values not in the
+    schema (eg. those added by a description) may have any type
+
+    Args:
+        values (dict): config attribute name -> value
+
+    Raises:
+        ValueError: naming the first value with the wrong type
+    """
+    for name, value in values.items():
+        types = SCHEMA.get(name)
+        if value is None or types is None:
+            continue
+        if not isinstance(value, types):
+            raise ValueError("Invalid config value {name}={value!r}".format(
+                name=name, value=value))
+
+
+def _encode(value):
+    """Return a JSON value for a config value, tagging the types JSON does
+    not have and pickling anything else (eg. a LifeRule)"""
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, _INT):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {'tuple': [_encode(v) for v in value]}
+    if isinstance(value, set):
+        return {'set': [_encode(v) for v in sorted(value, key=str)]}
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        if value.size <= MAX_LIST_SIZE:
+            return {'array': value.tolist(), 'dtype': value.dtype.str}
+        data = np.ascontiguousarray(value).tobytes()
+        return {'array': base64.b64encode(data).decode('ascii'),
+                'dtype': value.dtype.str, 'shape': list(value.shape)}
+    if isinstance(value, np.dtype):
+        return {'dtype': value.str}
+    if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+        return {'dict': {k: _encode(v) for k, v in value.items()}}
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return {'pickle': base64.b64encode(data).decode('ascii')}
+
+
+def _decode(value):
+    """Return the config value for a JSON value written by _encode"""
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if 'tuple' in value:
+        return tuple(_decode(v) for v in value['tuple'])
+    if 'set' in value:
+        return set(_decode(v) for v in value['set'])
+    if 'array' in value:
+        dtype = np.dtype(value['dtype'])
+        if 'shape' not in value:
+            return np.array(value['array'], dtype=dtype)
+        data = base64.b64decode(value['array'])
+        return np.frombuffer(data, dtype=dtype).reshape(value['shape']).copy()
+    if 'dict' in value:
+        return {k: _decode(v) for k, v in value['dict'].items()}
+    if 'dtype' in value:
+        return np.dtype(value['dtype'])
+    if 'pickle' in value:
+        return pickle.loads(base64.b64decode(value['pickle']))
+    raise ValueError("Unknown config value {v!r}".format(v=value))
+
+
+def grid_path(path):
+    """Return the path the initial grid of the config at path is saved to"""
+    return os.path.splitext(path)[0] + GRID_SUFFIX
+
+
+def _read_header(path):
+    """Return the JSON header of a config file, None if it cannot be read"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _replace(path, write):
+    """Write a file through write(file) to a temporary file then move it
+    over path, so the file is never seen half written, even by processes
+    saving the same config at once (eg. a sweep)"""
+    temp = '{p}.{u}.tmp'.format(p=path, u=uuid.uuid4().hex)
+    # created like open(path, 'wb') would, with the permissions the umask
+    # allows rather than only for the owner as with tempfile.mkstemp
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL |
+                 getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def save_config(ca_config, path):
+    """Save a config as a JSON header, with the initial grid in a .npy
+    file beside it (see grid_path)
+
+    Note:
+        The initial grid is only written when it differs from the grid
+        already saved there, found by comparing a hash of the cells, so
+        saving a config again and again (as the description does every
+        time it is run) does not copy a large grid to disk every time
+
+    Args:
+        ca_config (CAConfig): the config to save
+        path (str): the file to save the header to
+    """
+    values = dict(ca_config.__dict__)
+    grid = values.pop('initial_grid', None)
+    validate(values)
+    header = {'format': FORMAT_VERSION,
+              'values': {k: _encode(v) for k, v in values.items()},
+              'initial_grid': None}
+    if grid is not None:
+        grid = np.ascontiguousarray(grid)
+        digest = hashlib.blake2b(grid, digest_size=16).hexdigest()
+        gridfile = grid_path(path)
+        header['initial_grid'] = {'file': os.path.basename(gridfile),
+                                  'shape': list(grid.shape),
+                                  'dtype': grid.dtype.str,
+                                  'digest': digest}
+        previous = _read_header(path)
+        if (previous is None or not os.path.isfile(gridfile) or
+                previous.get('initial_grid') != header['initial_grid']):
+            _replace(gridfile, lambda f: np.save(f, grid))
+    data = json.dumps(header, indent=1).encode('utf-8')
+    _replace(path, lambda f: f.write(data))
+
+
+def load_config(path):
+    """Load a config saved by save_config
+
+    Note:
+        Initial grids larger than MMAP_BYTES are memory mapped copy on
+        write, so only the cells read are loaded and changes to the grid
+        are never written back to the file
+
+    Args:
+        path (str): the file the header was saved to
+
+    Returns:
+        CAConfig: the config
+
+    Raises:
+        ValueError: if the file is not a config or its values have the
+            wrong types
+    """
+    header = _read_header(path)
+    if header is None or header.get('format') != FORMAT_VERSION:
+        raise ValueError("{p} is not a config file".format(p=path))
+    values = {k: _decode(v) for k, v in header['values'].items()}
+    validate(values)
+    grid = None
+    if header['initial_grid'] is not None:
+        info = header['initial_grid']
+        gridfile = os.path.join(os.path.dirname(path), info['file'])
+        big = os.path.getsize(gridfile) > MMAP_BYTES
+        grid = np.load(gridfile, mmap_mode='c' if big else None,
+                       allow_pickle=False)
+        if list(grid.shape) != info['shape']:
+            raise ValueError("Initial grid {p} does not match the "
+                             "config".format(p=gridfile))
+    values['initial_grid'] = grid
+    # set the values directly, bypassing the checks for pinned values
+    ca_config = CAConfig.__new__(CAConfig)
+    ca_config.__dict__.update(values)
+    return ca_config
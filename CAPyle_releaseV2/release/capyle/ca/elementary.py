@@ -0,0 +1,150 @@
+import numpy as np
+from capyle.ca import TableRule
+
+# cells per packed word
+WORD_BITS = 64
+
+
+class ElementaryRule(TableRule):
+    """A two state, radius 1 CA rule given by its Wolfram rule number
+
+    Note:
+        Can be passed to Grid1D in place of a transition function, in
+        which case each row is calculated with a single table lookup.
+        For long runs without the grid see run_elementary, which stores
+        the rows bit packed.
+
+    Example:
+        Grid1D(config, ElementaryRule(config.rule_num))
+
+    Args:
+        rule_num (int): the Wolfram rule number, clipped to 0-255
+    """
+
+    def __init__(self, rule_num):
+        self.rule_num = min(max(int(rule_num), 0), 255)
+        # table[4*left + 2*center + right] -> new state of the center
+        TableRule.__init__(self, (self.rule_num >> np.arange(8)) & 1)
+        # the (left, center, right) neighbourhoods giving state 1
+        self.minterms = [((i >> 2) & 1, (i >> 1) & 1, i & 1)
+                         for i in range(8) if self.table[i]]
+
+    @classmethod
+    def from_number(cls, rule_num, num_states=2, radius=1):
+        """Create the rule from its Wolfram rule number (see
+        TableRule.from_number), elementary rules have 2 states and
+        radius 1"""
+        if (num_states, radius) != (2, 1):
+            raise ValueError("Elementary rules have 2 states and radius 1")
+        return cls(rule_num)
+
+    def __call__(self, grid, neighbourstates, neighbourcounts=None):
+        """Transition function applying the rule to the current row"""
+        left, center, right = neighbourstates
+        return TableRule.__call__(self, grid, (left == 1, center == 1,
+                                               right == 1))
+
+    def step_packed(self, words, numcells, wrap=True):
+        """Apply the rule to a bit packed row
+
+        Args:
+            words (numpy.ndarray): the row as uint64 words, see pack_row
+            numcells (int): the number of cells in the row
+            wrap (bool): if False the cells beyond the ends are in state 0
+
+        Returns:
+            numpy.ndarray: the next row, bit packed
+        """
+        # cell i is bit i % 64 of word i // 64, so the left neighbour of
+        # each cell is found by shifting the words up one bit
+        left = words << np.uint64(1)
+        left[1:] |= words[:-1] >> np.uint64(WORD_BITS - 1)
+        right = words >> np.uint64(1)
+        right[:-1] |= words[1:] << np.uint64(WORD_BITS - 1)
+        if wrap:
+            last = (numcells - 1) % WORD_BITS
+            lastcell = (words[-1] >> np.uint64(last)) & np.uint64(1)
+            left[0] |= lastcell
+            right[-1] |= (words[0] & np.uint64(1)) << np.uint64(last)
+
+        # the new row is set wherever one of the minterms of the rule is
+        notleft, notcenter, notright = ~left, ~words, ~right
+        new = np.zeros_like(words)
+        for l, c, r in self.minterms:
+            term = (left if l else notleft) & (words if c else notcenter)
+            term &= right if r else notright
+            new |= term
+        new[-1] &= _last_word_mask(numcells)
+        return new
+
+
+def pack_row(row):
+    """Pack a row of 0/1 cells into uint64 words, cell i being bit i % 64
+    of word i // 64
+
+    Args:
+        row (numpy.ndarray): the cells, any value other than 0 is 1
+
+    Returns:
+        numpy.ndarray: the packed row
+    """
+    numwords = -(-len(row) // WORD_BITS)
+    bits = np.zeros(numwords * WORD_BITS, dtype=np.uint8)
+    bits[:len(row)] = np.asarray(row) != 0
+    packed = np.packbits(bits, bitorder='little')
+    return packed.view('<u8').astype(np.uint64)
+
+
+def unpack_rows(words, numcells):
+    """Unpack rows packed by pack_row
+
+    Args:
+        words (numpy.ndarray): the packed rows, 1 or 2 dimensional
+        numcells (int): the number of cells in each row
+
+    Returns:
+        numpy.ndarray: the uint8 cells of each row
+    """
+    words = np.asarray(words, dtype='<u8')
+    bits = np.unpackbits(words.view(np.uint8), axis=-1, bitorder='little')
+    return bits[..., :numcells]
+
+
+def run_elementary(rule_num, initial_row, num_generations, wrap=True):
+    """Run an elementary CA on bit packed rows, without creating a grid
+
+    Note:
+        Each generation costs a few bitwise operations per 64 cells and
+        the rows are stored packed, so long runs over wide rows (eg. scans
+        over all 256 rules) fit in memory
+
+    Example:
+        rows = run_elementary(30, row, 1000)
+        image = unpack_rows(rows, len(row))
+
+    Args:
+        rule_num (int): the Wolfram rule number
+        initial_row (numpy.ndarray): the 0/1 cells of the first row
+        num_generations (int): number of generations to run
+        wrap (bool): if False the cells beyond the ends are in state 0
+
+    Returns:
+        numpy.ndarray: (num_generations + 1, words per row) uint64 array
+            of the packed rows, see unpack_rows
+    """
+    rule = ElementaryRule(rule_num)
+    numcells = len(initial_row)
+    first = pack_row(initial_row)
+    rows = np.empty((num_generations + 1, len(first)), dtype=np.uint64)
+    rows[0] = first
+    for i in range(num_generations):
+        rows[i + 1] = rule.step_packed(rows[i], numcells, wrap)
+    return rows
+
+
+def _last_word_mask(numcells):
+    """Mask of the bits of the last word that hold cells"""
+    used = numcells % WORD_BITS
+    if used == 0:
+        return np.uint64(0xFFFFFFFFFFFFFFFF)
+    return np.uint64((1 << used) - 1)
@@ -1,11 +1,20 @@
+import random
 import numpy as np
-from capyle.ca import Neighbourhood
-from capyle.utils import scale_array, verify_gens
-import tkinter as tk
+from capyle.ca import (Neighbourhood, Timeline, Checkpointer,
+                       load_checkpoint, CycleDetector, ProgressReporter,
+                       progress_sink, current_progress, run_observers)
+from capyle.utils import (scale_array, verify_gens, state_dtype,
+                          accepts_keyword)
 
 
 class Grid(object):
     """Superclass to the Grid1D and Grid2D classes"""
+    # how the progress of a run is shown, True for a window if there is a
+    # display (otherwise the terminal), False for none, 'tk', 'terminal'
+    # or a ProgressSink (see progress.progress_sink). Setting it on a grid
+    # overrides the setting of the thread it is run on (see
+    # progress.thread_progress), which overrides the setting here
+    show_progress = True
 
     def __init__(self):
         pass
@@ -18,6 +27,12 @@ class Grid(object):
         """Enforce a step funciton in subclasses"""
         pass
 
+    def advance(self, generations):
+        """Calculate the grid a number of generations on, subclasses may
+        do this without stepping through each generation"""
+        for i in range(generations):
+            self.step()
+
     def set_grid(self, g):
         """Set self.grid to supplied grid, scaling the supplied grid
         if nessacary"""
@@ -35,6 +50,109 @@ class Grid(object):
             self.grid[0, :] = g[0]
         self.refresh_wrap()
 
+    def get_state(self):
+        """Return everything needed to carry on stepping the grid later,
+        see set_state
+
+        Returns:
+            dict: a copy of the grid, the additional transition args and
+                the state of the random generator
+        """
+        return {'grid': np.array(self.grid),
+                'additional_args': self.additional_args,
+                'rng': self.rng.bit_generator.state}
+
+    def set_state(self, state):
+        """Restore the grid to a state returned by get_state"""
+        self.grid[...] = state['grid']
+        self.additional_args = state['additional_args']
+        if 'rng' in state:
+            self.rng.bit_generator.state = state['rng']
+        self.refresh_wrap()
+
+    def setup_rng(self, ca_config):
+        """Create the random generator of the run, self.rng, seeded from
+        ca_config.seed
+
+        Note:
+            The seed may be an int, a numpy SeedSequence (eg. one of
+            SeedSequence(seed).spawn(n) for each run of an ensemble) or
+            None for a different seed every run. Each grid owns its
+            generator, so runs with the same seed give the same result
+            whatever else draws random numbers in the process
+        """
+        seed = getattr(ca_config, 'seed', None)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.rng = np.random.Generator(np.random.PCG64(seed))
+        self._uniforms = None
+
+    def uniforms(self, shape):
+        """Return uniform random numbers in [0, 1) of the given shape,
+        drawn from self.rng in one call
+
+        Note:
+            The numbers are drawn into a buffer reused while the shape
+            stays the same, so they must not be kept between generations
+
+        Args:
+            shape (tuple): the shape of the array of numbers
+
+        Returns:
+            numpy.ndarray: float64 array of the numbers
+        """
+        shape = tuple(shape)
+        if self._uniforms is None or self._uniforms.shape != shape:
+            self._uniforms = np.empty(shape)
+        self.rng.random(out=self._uniforms)
+        return self._uniforms
+
+    def setup_random_args(self):
+        """Find which of the random keyword arguments the transition
+        function takes (see random_kwargs)"""
+        self._transition_rng = accepts_keyword(self.transition_func, 'rng')
+        # rules built by compile_rule only take the numbers if stochastic
+        self._transition_uniforms = (
+            accepts_keyword(self.transition_func, 'uniforms') and
+            getattr(self.transition_func, 'stochastic', True))
+
+    def random_kwargs(self, shape, uniforms=None):
+        """Return the random keyword arguments to pass the transition
+        function, rng for the generator of the run if it takes rng, and
+        uniforms for a fresh array of uniform random numbers the shape of
+        the cells it returns if it takes uniforms
+
+        Args:
+            shape (tuple): the shape of the cells the transition returns
+            uniforms (numpy.ndarray): the numbers to pass, None draws them
+        """
+        kwargs = {}
+        if self._transition_rng:
+            kwargs['rng'] = self.rng
+        if self._transition_uniforms:
+            kwargs['uniforms'] = (self.uniforms(shape) if uniforms is None
+                                  else uniforms)
+        return kwargs
+
+    def grid_dtype(self, ca_config, border=()):
+        """Return the dtype to store the grid in
+
+        Note:
+            ca_config.state_dtype is used if set, otherwise the narrowest
+            dtype holding every state (see utils.state_dtype)
+
+        Args:
+            ca_config (CAConfig): the config object with the states
+            border (tuple): any other values the wrapping grid must hold
+
+        Returns:
+            numpy.dtype: the dtype of the grid
+        """
+        if getattr(ca_config, 'state_dtype', None) is not None:
+            return np.dtype(ca_config.state_dtype)
+        return state_dtype(ca_config.states, border)
+
     def set_neighbourhood(self, ca_config):
         """Sets self.neighbourhood with a Neighbourhood object
         from ca_config
@@ -47,93 +165,258 @@ class Grid(object):
             self.neighbourhood = Neighbourhood(self.neighbourhood,
                                                dims=ca_config.dimensions)
 
-    def run(self):
+    def run(self, observers=(), timeline=True):
         """Set up running the CA for given generations,
         saving each timestep to an array 'timeline'
 
         Note:
             The actual running of the CA is done by the self.runca
-            which is passed to the progress bar so that it can be
-            updated
+            which is passed to the progress sink (see show_progress)
+            so that it can be updated
+
+            If ca_config.timeline_file is set the timeline is written to
+            that file as the CA runs, rather than kept in memory
+
+            If ca_config.timeline_interval is more than 1 only every
+            timeline_interval-th generation (and the last) is saved
+
+            If ca_config.checkpoint_file is set the run is checkpointed
+            every ca_config.checkpoint_every generations or
+            ca_config.checkpoint_seconds seconds, and if ca_config.resume
+            is set the run carries on from the last checkpoint if there
+            is one (see runner.resume)
+
+            Observers are shown the cells after every generation (see
+            observers.Observer), with timeline False no frames are kept
+            so memory use does not grow with the number of generations.
+            The run ends early once an observer is done. Observers added
+            with observers.observe_runs are run too. To show them every
+            generation the grid is stepped one generation at a time, so
+            HashLife (see Grid2D.advance) no longer jumps between the
+            saved frames, unless every observer only needs the saved
+            frames (see Observer.every_generation). Cycle detection
+            (below) needs every generation.
+
+            If ca_config.detect_cycles is set the run ends once the grid
+            reaches a fixed point or cycle (see observers.CycleDetector),
+            with ca_config.cycle_action 'fast_forward' the rest of the
+            timeline is filled in from the cycle rather than stopping.
+            The period and generation of the cycle are recorded in
+            timeline.metadata
+
+            The run ends early, recording the generation reached in
+            timeline.metadata['cancelled'], if the progress sink is
+            cancelled (see progress.ProgressSink)
+
+        Args:
+            observers (list): Observer objects to update every generation
+            timeline (bool): keep the timeline, if False only the
+                observers see the grid
 
         Returns:
-            numpy.ndarray: contains the grid state for each timestep
+            Timeline: contains the grid state for each timestep, None if
+                timeline is False
         """
         num_generations = verify_gens(self.ca_config.num_generations)
-        timeline = np.empty(num_generations + 1, dtype=np.ndarray)
-        # Progress window
-        # pass in the run function and timeline to the progress bar
-        # progress bar executes these
-        gui = _ProgressWindow(num_generations, self._runca, timeline)
+        frames = frame_generations(
+            num_generations, getattr(self.ca_config, 'timeline_interval', 1))
+        self._checkpointer = Checkpointer.from_config(self.ca_config)
+        added, keep_timeline = run_observers()
+        self._observers = list(observers) + added
+        timeline = timeline and keep_timeline
+        self._cycle_detector = None
+        if getattr(self.ca_config, 'detect_cycles', False):
+            action = getattr(self.ca_config, 'cycle_action', 'stop')
+            if action not in ('stop', 'fast_forward'):
+                raise ValueError("Invalid cycle action {a}".format(a=action))
+            self._cycle_detector = CycleDetector(
+                getattr(self.ca_config, 'cycle_window', 100),
+                getattr(self.ca_config, 'cycle_confirm', 1),
+                collect=action == 'fast_forward')
+            self._observers.append(self._cycle_detector)
+        if not timeline:
+            if self._checkpointer is not None:
+                raise ValueError("Checkpointing needs the timeline kept")
+            timeline = None
+        else:
+            timeline = None
+            if (self._checkpointer is not None and
+                    getattr(self.ca_config, 'resume', False)):
+                timeline = self._resume(frames)
+            if timeline is None:
+                timeline = Timeline(len(frames), self.grid.shape,
+                                    self.grid.dtype, self.ca_config.states,
+                                    path=self.ca_config.timeline_file)
+        for observer in self._observers:
+            observer.start(self, num_generations)
+        # the progress sink runs the CA, eg. on a worker thread while the
+        # progress window runs on this one
+        if 'show_progress' in self.__dict__:
+            show_progress = self.show_progress
+        else:
+            show_progress = current_progress(self.show_progress)
+        progress = ProgressReporter(progress_sink(show_progress),
+                                    num_generations, self.grid.size)
+        first = 0 if timeline is None or len(timeline) == 0 else \
+            frames[len(timeline) - 1]
+        progress.run(lambda: self._runca(num_generations, progress, timeline),
+                     first, timeline)
+        for observer in self._observers:
+            observer.finish()
         return timeline
 
-    def _runca(self, num_generations, progressbar, timeline):
+    def _runca(self, num_generations, progress, timeline):
         """Running the CA for given generations,
         saving each timestep to an array 'timeline'
 
         Note:
-            This function is passed to the progress bar for it to execute
+            This function is run by the progress sink, it carries on from
+            the last frame already in the timeline
+
+        Args:
+            num_generations (int): the number of generations to run
+            progress (ProgressReporter): told the generations reached,
+                None to not report progress
+            timeline (Timeline): the timeline to save the frames to, None
+                to not save them
         """
+        frames = frame_generations(
+            num_generations, getattr(self.ca_config, 'timeline_interval', 1))
+        checkpointer = getattr(self, '_checkpointer', None)
+        observers = getattr(self, '_observers', ())
         # save initial state
-        timeline[0] = np.copy(self.grid)
-        for i in range(num_generations):
-            # calculate the next timestep and save it
-            self.step()
-            timeline[i+1] = np.copy(self.grid)
-            # update the progress bar every 10 generations
-            if (i+1) % 10 == 9:
-                progressbar.set(i+1)
+        if timeline is not None and len(timeline) == 0:
+            timeline[0] = self.grid
+        start = 1 if timeline is None else len(timeline)
+        self._notify(observers, frames[start - 1])
+        stopped = frames[start - 1] if self._done(observers) else None
+        every_generation = any(o.every_generation for o in observers)
+        for i in range(start, len(frames)):
+            # calculate the next saved timestep and save it
+            if stopped is None and every_generation:
+                # observers see every generation
+                for generation in range(frames[i - 1] + 1, frames[i] + 1):
+                    self.advance(1)
+                    self._notify(observers, generation)
+                    if self._done(observers):
+                        stopped = generation
+                        break
+            elif stopped is None:
+                self.advance(frames[i] - frames[i - 1])
+                # observers, if any, only see the saved frames
+                self._notify(observers, frames[i])
+                if self._done(observers):
+                    stopped = frames[i]
+            if stopped is not None:
+                self._stop_early(stopped, frames[i:], timeline,
+                                 saved=stopped == frames[i - 1])
+                break
+            if timeline is not None:
+                timeline[i] = self.grid
+                if checkpointer is not None and checkpointer.due(frames[i]):
+                    checkpointer.save(self, timeline, frames[i])
+            if progress is not None:
+                progress.update(frames[i])
+                if progress.cancelled:
+                    stopped = frames[i]
+                    if timeline is not None:
+                        timeline.metadata['cancelled'] = int(stopped)
+                    break
+        if timeline is not None:
+            timeline.flush()
+        if progress is not None:
+            progress.finish(num_generations if stopped is None else stopped)
+
+    def _notify(self, observers, generation):
+        """Show the observers the cells after the generation"""
+        if observers:
+            cells = self.current_cells()
+            for observer in observers:
+                observer.update(generation, cells)
 
+    def _done(self, observers):
+        return any(observer.done for observer in observers)
 
-class _ProgressWindow(object):
-    WINDOW_TITLE = 'Running...'
-    MAX_WIDTH = 200
-    HEIGHT = 20
+    def _stop_early(self, generation, remaining, timeline, saved):
+        """End the run at the generation, an observer being done, either
+        saving the grid as the last frame (unless already saved) or
+        filling in the remaining frame generations from a cycle that has
+        been found"""
+        detector = getattr(self, '_cycle_detector', None)
+        found = detector is not None and detector.done
+        if timeline is not None:
+            timeline.metadata['stopped'] = int(generation)
+            if found:
+                timeline.metadata['cycle_period'] = int(detector.period)
+                timeline.metadata['cycle_generation'] = int(
+                    detector.generation)
+        if found and detector.cycle is not None:
+            for frame in remaining:
+                self.fill_cycle(detector.cycle, detector.generation, frame)
+                if timeline is not None:
+                    timeline[len(timeline)] = self.grid
+        elif timeline is not None and not saved:
+            timeline[len(timeline)] = self.grid
 
-    def __init__(self, maxval, run, timeline):
-        """Create a progress bar window, and use the function 'run' to
-        run the CA, update the variable timeline, and the progress gui
+    def fill_cycle(self, cycle, start, generation):
+        """Move the grid on to a later generation of a cycle without
+        stepping
 
         Args:
-            maxval (int): The number of generation to be run by the CA
-            run (function): The run function that actuall executes the CA
-            timeline (numpy.ndarray): the array object to save the grid state
-                for each timestep
+            cycle (list): the cells of each generation of the cycle
+            start (int): the generation of the first cells in the cycle
+            generation (int): the generation to move the grid on to
         """
-        self.maxval = maxval
-        self.root = tk.Tk()
-        # set title
-        self.root.wm_title(self.WINDOW_TITLE)
-        # lift to top layer
-        self.root.lift()
-        self.root.attributes('-topmost', True)
-        self.root.after_idle(self.root.attributes, '-topmost', False)
-        #disable close
-        self.root.protocol('WM_DELETE_WINDOW', self.noclose)
-
-        self.progress_canvas = tk.Canvas(self.root,
-                                         height=self.HEIGHT,
-                                         width=self.MAX_WIDTH)
-        bar = self.progress_canvas.create_rectangle(0, 0, 0,
-                                                    self.HEIGHT, fill="blue")
-        self.progress_canvas.pack()
-        self.root.after(1, run(maxval, self, timeline))
-
-    def noclose(self):
-        pass
+        self.grid[...] = cycle[(generation - start) % len(cycle)]
+        self.refresh_wrap()
 
-    def set(self, val):
-        """Set the progress bar to the given generation number
+    def current_cells(self):
+        """Return the cells of the current generation, without copying"""
+        return self.grid
+
+    def _resume(self, frames):
+        """Restore the grid and random generators from the last
+        checkpoint and return the timeline up to it, None if there is
+        no checkpoint"""
+        checkpoint = load_checkpoint(self._checkpointer.path)
+        if checkpoint is None:
+            return None
+        num_frames = checkpoint['num_frames']
+        if (num_frames > len(frames) or
+                frames[num_frames - 1] != checkpoint['generation']):
+            raise ValueError("Checkpoint {p} does not match the number of "
+                             "generations and timeline interval".format(
+                                 p=self._checkpointer.path))
+        if checkpoint['timeline_path'] is not None:
+            timeline = Timeline.open(checkpoint['timeline_path'], 'r+')
+            # frames saved after the checkpoint are written again
+            timeline.length = num_frames
+        else:
+            saved = self._checkpointer.load_frames(checkpoint)
+            timeline = Timeline(len(frames), saved.shape[1:], saved.dtype,
+                                self.ca_config.states)
+            timeline.frames[:num_frames] = saved
+            timeline.length = num_frames
+        if timeline.frame_shape != self.grid.shape:
+            raise ValueError("Checkpoint {p} does not match the grid "
+                             "dimensions".format(p=self._checkpointer.path))
+        self.set_state(checkpoint['grid_state'])
+        np.random.set_state(checkpoint['numpy_random'])
+        random.setstate(checkpoint['python_random'])
+        self._checkpointer.last_generation = checkpoint['generation']
+        return timeline
+
+
+def frame_generations(num_generations, interval=1):
+    """Return the generations saved to the timeline, every interval-th
+    generation from 0 and always the last
+
+    Example:
+        frame_generations(10, 4) -> [0, 4, 8, 10]
+    """
+    interval = max(int(interval), 1)
+    frames = list(range(0, num_generations + 1, interval))
+    if frames[-1] != num_generations:
+        frames.append(num_generations)
+    return frames
 
-        Args:
-            val (int): The generation number (translated to a progress bar
-                length)
-        """
-        if val >= self.maxval:
-            self.root.destroy()
-            return
-        p = val/self.maxval
-        w = int(p * self.MAX_WIDTH)
-        self.progress_canvas.create_rectangle(0, 0, w, self.HEIGHT,
-                                              fill="blue")
-        self.root.update()
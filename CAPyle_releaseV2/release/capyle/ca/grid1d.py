@@ -1,6 +1,6 @@
 import numpy as np
-from capyle.ca import Neighbourhood, Grid
-from capyle.utils import gens_to_dims, clip_numeric
+from capyle.ca import Neighbourhood, Grid, TableRule, proportional_states
+from capyle.utils import gens_to_dims, accepts_keyword
 
 
 class Grid1D(Grid):
@@ -25,18 +25,25 @@ class Grid1D(Grid):
 
         # calculate the grid dimensions from the generations
         numrows, numcols = gens_to_dims(ca_config.num_generations)
-        # wrapsize is the width of the columns at either side (hidden)
-        # used for wrapping behavior
-        # a wrapsize of 1 leads to 2 extra columns (1 either side of the grid)
-        wrapsize = 1
-        self.wrapping_grid = np.zeros((numrows, numcols + wrapsize*2))
 
         # set neighbourhood
         self.set_neighbourhood(ca_config)
 
+        # wrapsize is the width of the columns at either side (hidden)
+        # used for wrapping behavior, matching the neighbourhood radius
+        # a wrapsize of 1 leads to 2 extra columns (1 either side of the grid)
+        wrapsize = self.neighbourhood.radius
+        if ca_config.wrap and numcols < wrapsize:
+            raise ValueError(
+                'Grid width {c} is smaller than the neighbourhood radius {r}'
+                .format(c=numcols, r=wrapsize))
+        self.wrapsize = wrapsize
+        self.wrapping_grid = np.zeros((numrows, numcols + wrapsize*2),
+                                      dtype=self.grid_dtype(ca_config, (0,)))
+
         # initial grid
         self.wrapping_grid.fill(ca_config.states[0])
-        self.grid = self.wrapping_grid[:, 1:-1]
+        self.grid = self.wrapping_grid[:, wrapsize:numcols + wrapsize]
         if ca_config.initial_grid is not None:
             self.set_grid(ca_config.initial_grid)
         self.refresh_wrap()
@@ -51,75 +58,177 @@ class Grid1D(Grid):
             self.additional_args = transition_func[1:]
         else:
             self.transition_func = transition_func
+        self._setup_lookup()
+
+        # buffers reused every step, so that stepping allocates nothing
+        # beyond what the transition function does
+        self._counts = np.zeros((len(ca_config.states), numcols),
+                                dtype=np.min_scalar_type(2 * wrapsize))
+        self._match = np.empty(numcols, dtype=bool)
+        # masked out neighbours read as state 0
+        self._zeros = np.zeros(numcols, dtype=self.grid.dtype)
+        self._zeros.flags.writeable = False
+        # transition functions taking an out argument write the next row
+        # straight into the grid
+        self._transition_out = accepts_keyword(self.transition_func, 'out')
+        # transition functions taking an rng or uniforms argument are
+        # passed the random generator of the run or numbers drawn from it
+        self.setup_rng(ca_config)
+        self.setup_random_args()
+
+    def _setup_lookup(self):
+        """Apply rule tables (see TableRule) with one vectorised pass over
+        the row when the states are 0 to k-1 and the neighbourhood matches
+        the radius of the rule"""
+        self._lookup = None
+        rule = self.transition_func
+        if (isinstance(rule, TableRule) and
+                self.additional_args is None and
+                tuple(self.ca_config.states) == tuple(range(rule.num_states))
+                and self.wrapsize == rule.radius and
+                np.issubdtype(self.grid.dtype, np.integer)):
+            self._lookup = rule.table.astype(self.grid.dtype)
+            # masked out neighbours are treated as state 0, the cell itself
+            # is always included
+            self._weights = self.neighbourhood.neighbourhood == 1
+            self._weights[self.wrapsize] = True
+            # buffer for the neighbourhood index of each cell
+            self._index = np.empty(self.grid.shape[1], dtype=rule.index_dtype)
+
+    def get_state(self):
+        """Return the state of the grid (see Grid.get_state), including
+        the current generation"""
+        state = Grid.get_state(self)
+        state['current_gen'] = self.current_gen
+        return state
+
+    def set_state(self, state):
+        """Restore the grid to a state returned by get_state"""
+        Grid.set_state(self, state)
+        self.current_gen = state['current_gen']
+
+    def current_cells(self):
+        """Return the row of the current generation, without copying"""
+        return self.grid[self.current_gen]
+
+    def fill_cycle(self, cycle, start, generation):
+        """Fill in the rows up to a later generation of a cycle without
+        stepping (see Grid.fill_cycle)"""
+        for n in range(self.current_gen + 1, generation + 1):
+            self.grid[n] = cycle[(n - start) % len(cycle)]
+        self.current_gen = max(self.current_gen, generation)
+        self.refresh_wrap()
 
     def refresh_wrap(self):
         """ Update the wrapping border of the grid to reflect any changes """
+        w = self.wrapsize
+        if w == 0:
+            return
         if not self.ca_config.wrap:
             # if not wrapping set outer borders to 'dead'
-            self.wrapping_grid[:, 0] = 0
-            self.wrapping_grid[:, -1] = 0
+            self.wrapping_grid[:, :w] = 0
+            self.wrapping_grid[:, -w:] = 0
         else:
             # if wrapping set to grid states
-            self.wrapping_grid[:, 0] = self.grid[:, -1]
-            self.wrapping_grid[:, -1] = self.grid[:, 0]
+            self.wrapping_grid[:, :w] = self.grid[:, -w:]
+            self.wrapping_grid[:, -w:] = self.grid[:, :w]
 
     def get_neighbour_arrays(self):
-        """ Get the states of the cells left and right neighbours
-        and apply the neighbourhood """
+        """ Get the states of the cells in the neighbourhood of each cell
+        and apply the neighbourhood
+
+        Returns:
+            tuple: 2r+1 arrays of the states from the leftmost neighbour to
+                the rightmost, the middle array being the cells themselves,
+                eg. (left, self, right) for radius 1. The neighbours are
+                read only views of the grid, so no copy is made
+        """
         nhood_bool = (self.neighbourhood.neighbourhood == 1)
-        self_states = self.grid[self.current_gen]
-        left_neighbour_states = (nhood_bool[0] *
-                                 self.wrapping_grid[self.current_gen, :-2])
-        right_neighbour_states = (nhood_bool[2] *
-                                  self.wrapping_grid[self.current_gen, 2:])
-        return left_neighbour_states, self_states, right_neighbour_states
-
-    def count_neighbours(self, neighbourstates):
-        l, c, r = neighbourstates
+        row = self.wrapping_grid[self.current_gen]
+        numcols = self.grid.shape[1]
+        states = []
+        for j, included in enumerate(nhood_bool):
+            if j == self.wrapsize:
+                states.append(self.grid[self.current_gen])
+            elif included:
+                view = row[j:j + numcols]
+                view.flags.writeable = False
+                states.append(view)
+            else:
+                states.append(self._zeros)
+        return tuple(states)
+
+    def count_neighbours(self, neighbourstates, out=None):
+        """Count how many neighbours of each cell are in each state
+
+        Args:
+            neighbourstates (tuple): the arrays from get_neighbour_arrays
+            out (numpy.ndarray): (n, cols) integer array to write the counts
+                to, where n is the number of states, allocated if None
+
+        Returns:
+            numpy.ndarray: the counts for each state
+        """
+        centre = len(neighbourstates) // 2
+        neighbours = (neighbourstates[:centre] +
+                      neighbourstates[centre + 1:])
         states = self.ca_config.states
-        counts = np.empty(len(states), dtype=np.ndarray)
+        counts = out
+        if counts is None:
+            counts = np.zeros((len(states), neighbourstates[centre].shape[0]),
+                              dtype=np.min_scalar_type(len(neighbours)))
+        else:
+            counts.fill(0)
+        match = self._match
         for i, s in enumerate(states):
-            counts[i] = (l == s) + (r == s)
+            for n in neighbours:
+                np.equal(n, s, out=match)
+                np.add(counts[i], match, out=counts[i])
         return counts
 
     def step(self):
         """ Calculate the next timestep by applying the transistion function
         and save the new state to grid """
+        if self._lookup is not None:
+            self._lookup_step()
+            return
 
         ns = self.get_neighbour_arrays()
-        nc = self.count_neighbours(ns)
-        if self.additional_args is None:
-            # if no additional variables supplied
-            newrow = self.transition_func(self.grid, ns, nc)
+        nc = self.count_neighbours(ns, out=self._counts)
+        args = () if self.additional_args is None else self.additional_args
+        kwargs = self.random_kwargs(self.grid.shape[1:])
+        # the next row of the grid, written to in place
+        nextrow = self.grid[self.current_gen + 1]
+        if self._transition_out:
+            newrow = self.transition_func(self.grid, ns, nc, *args,
+                                          out=nextrow, **kwargs)
         else:
-            # otherwise pass in the arguments to the transision function
-            newrow = self.transition_func(self.grid, ns, nc,
-                                          *self.additional_args)
+            newrow = self.transition_func(self.grid, ns, nc, *args, **kwargs)
+
+        self.current_gen += 1
+        if newrow is not nextrow:
+            self.grid[self.current_gen] = newrow
+        self.refresh_wrap()
 
+    def _lookup_step(self):
+        """Calculate the next row by indexing the rule table with the
+        neighbourhood index of each cell"""
+        row = self.wrapping_grid[self.current_gen]
+        index = self.transition_func.index_row(row, self._weights,
+                                               self._index)
         self.current_gen += 1
-        self.grid[self.current_gen] = newrow
+        np.take(self._lookup, index, out=self.grid[self.current_gen])
         self.refresh_wrap()
 
 
-def randomise1d(grid, background_state, proportions):
+def randomise1d(grid, background_state, proportions, rng=None):
     """ Randomise a 2D grid for a 1D cellular automata
 
     Takes a grid, the background state, and
-    proportions for each state in a list of tuples ([(1,0.4), (2,0.3)])"""
-    grid[0, :] = background_state
-    numcells_per_state = np.zeros(len(proportions), dtype=int)
-    for i, p in enumerate(proportions):
-        proportion = clip_numeric(p[1], 0, 1)
-        numcells_per_state[i] = int(proportion * grid.size)
-    randindicies = np.random.choice(grid[0].size,
-                                    np.sum(numcells_per_state), replace=False)
-    g = np.copy(grid[0])
-    used = 0
-    for i, p in enumerate(proportions):
-        state = p[0]
-        indicies = randindicies[used:numcells_per_state[i]]
-        g[indicies] = state
-        used += numcells_per_state[i]
-
-    grid[0, :] = g[:]
+    proportions for each state in a list of tuples ([(1,0.4), (2,0.3)]),
+    setting the first row to exactly those proportions of cells in each
+    state (see proportional_states), rng being a numpy Generator or seed
+    to draw the positions from"""
+    grid[0, :] = proportional_states(grid[0].shape, background_state,
+                                     proportions, rng=rng, dtype=grid.dtype)
     return grid
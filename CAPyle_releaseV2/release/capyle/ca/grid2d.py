@@ -1,9 +1,15 @@
 import numpy as np
-from capyle.ca import Grid, Neighbourhood
-from capyle.utils import clip_numeric
+from concurrent.futures import ThreadPoolExecutor
+from capyle.ca import (Grid, Neighbourhood, LifeRule, HashLife, CountRule,
+                       compile_rule, proportional_states)
+from capyle.utils import accepts_keyword
 
 
 class Grid2D(Grid):
+    # state of the border around the grid when not wrapping
+    NO_WRAP_STATE = -100
+    # most cells in each band of a grid stepped on several threads
+    BAND_CELLS = 2**18
 
     def __init__(self, ca_config, transition_func):
         # create superclass
@@ -18,12 +24,30 @@ class Grid2D(Grid):
         # store a handle on config object
         self.ca_config = ca_config
 
-        # wrap size is 1 col & row all the way round the grid
-        wrapsize = 1
+        # set neighbourhood
+        self.set_neighbourhood(ca_config)
+
+        # wrap size matches the radius of the neighbourhood, all the way
+        # round the grid
+        wrapsize = self.neighbourhood.radius
+        if ca_config.wrap is True and (numrows < wrapsize or
+                                       numcols < wrapsize):
+            raise ValueError(
+                'Grid size {g} is smaller than the neighbourhood radius {r}'
+                .format(g=ca_config.grid_dims, r=wrapsize))
+        self.wrapsize = wrapsize
         # wrap size doubled for the row/colum on each side of the grid
         # ie. a wrap size of 1 requires 2 extra rows and 2 extra columns
+        # the grid dtype must also hold the border state when not wrapping
+        wrap = ca_config.wrap
+        border = ()
+        if type(wrap) is bool and wrap is False:
+            border = (self.NO_WRAP_STATE,)
+        elif type(wrap) is int or type(wrap) is float:
+            border = (wrap,)
         self.wrapping_grid = np.empty((numrows + wrapsize*2,
-                                       numcols + wrapsize*2))
+                                       numcols + wrapsize*2),
+                                      dtype=self.grid_dtype(ca_config, border))
         # initial state fill
         self.wrapping_grid.fill(ca_config.states[0])
         self.grid = self.wrapping_grid[wrapsize:-wrapsize,
@@ -33,13 +57,37 @@ class Grid2D(Grid):
         self.wrapindicies, self.gridindicies = self._gen_wrap_indicies(
             wrapsize)
 
+        # the next generation is written to the back buffer and then
+        # copied into the grid, which stays a view of the wrapping grid
+        self._back = np.empty_like(self.grid, order='C')
+        # the transition function is passed a copy of the grid, as the
+        # neighbour states are views of the wrapping grid, and a transition
+        # function changing the grid in place must not change them
+        self._front = np.empty_like(self.grid, order='C')
+        # neighbour counts are calculated into the same buffers each step
+        self._counter = _StateCounter(ca_config.states,
+                                      self.neighbourhood.neighbourhood,
+                                      self.grid.shape)
+
+        # opt in active tile stepping, only the tiles near changes are
+        # stepped each generation (see _active_step)
+        self.tile_size = getattr(ca_config, 'active_tile_size', None)
+        if self.tile_size is not None and self.tile_size < 1:
+            raise ValueError(
+                'Invalid tile size {t}'.format(t=self.tile_size))
+        self.reset_active_tiles()
+
+        # opt in stepping of row bands of the grid on a pool of threads
+        # (see _threaded_step)
+        self.num_threads = getattr(ca_config, 'num_threads', None)
+        self._bands = self._pool = None
+        if self.num_threads is not None and self.num_threads > 1:
+            self._setup_bands()
+
         # if at t = 0 grid has been supplied, set the states
         if ca_config.initial_grid is not None:
             self.set_grid(ca_config.initial_grid)
 
-        # set neighbourhood
-        self.set_neighbourhood(ca_config)
-
         # Handle any additional variables the user wishes to keep track of
         # for use in the transition function
         self.additional_args = None
@@ -48,6 +96,56 @@ class Grid2D(Grid):
             self.additional_args = transition_func[1:]
         else:
             self.transition_func = transition_func
+        # transition functions taking an rng or uniforms argument are
+        # passed the random generator of the run or numbers drawn from it,
+        # also while being compiled
+        self.setup_rng(ca_config)
+        self._compile_transition()
+        self._setup_hashlife()
+        # transition functions taking an out argument write the next
+        # generation straight into the back buffer
+        self._transition_out = accepts_keyword(self.transition_func, 'out')
+        self.setup_random_args()
+
+    def _compile_transition(self):
+        """Replace the transition function with a lookup table (see
+        compile_rule) if ca_config.compile_rule is set"""
+        if not getattr(self.ca_config, 'compile_rule', False):
+            return
+        if isinstance(self.transition_func, (LifeRule, CountRule)):
+            return
+        args = self.additional_args
+        self.transition_func = compile_rule(
+            self.transition_func, self.ca_config.states,
+            self.neighbourhood.neighbourhood.size - 1,
+            () if args is None else args,
+            getattr(self.ca_config, 'compile_samples', None), rng=self.rng)
+        self.additional_args = None
+
+    def _setup_hashlife(self):
+        """Run B/S rules (see LifeRule) with the HashLife engine, when the
+        transition function is a LifeRule or ca_config.life_rule names one,
+        the states are (0, 1), the neighbourhood is the full radius 1 Moore
+        neighbourhood and the grid wraps"""
+        self._hashlife = None
+        rule = getattr(self.ca_config, 'life_rule', None)
+        if rule is None and self.additional_args is None:
+            rule = self.transition_func
+        if isinstance(rule, str):
+            rule = LifeRule.from_string(rule)
+        # the center cell itself is never counted
+        moore = self.neighbourhood.neighbourhood == 1
+        if moore.shape == (3, 3):
+            moore[1, 1] = True
+        if (isinstance(rule, LifeRule) and
+                self.ca_config.wrap is True and
+                tuple(self.ca_config.states) == (0, 1) and
+                moore.shape == (3, 3) and np.all(moore)):
+            max_nodes = getattr(self.ca_config, 'hashlife_max_nodes', None)
+            if max_nodes is None:
+                self._hashlife = HashLife(rule)
+            else:
+                self._hashlife = HashLife(rule, max_nodes)
 
     def _gen_wrap_indicies(self, wrapsize):
         """Create the indecies used when refreshing the wrap"""
@@ -100,7 +198,7 @@ class Grid2D(Grid):
         # if wrap false set to default non wrap state (-100)
         wrap = self.ca_config.wrap
         if type(wrap) is bool and wrap is False:
-            wrap = -100
+            wrap = self.NO_WRAP_STATE
         # Normal wrapping behaviour
         if type(wrap) is bool and wrap is True:
             # set the wrap to the oppostite cell bank of the grid
@@ -114,80 +212,515 @@ class Grid2D(Grid):
         else:
             sys.exit("Invalid wrap {} of type {}".format(wrap, type(wrap)))
 
-    def get_neighbour_states(self, applyneighbourhood=True):
-        """Return the 8 arrays of each neighbours current state"""
-        grid = self.wrapping_grid
+    def get_neighbour_states(self, applyneighbourhood=True, lazy=False):
+        """Return the arrays of each neighbours current state
+
+        Args:
+            applyneighbourhood (bool): mask the neighbours with the
+                neighbourhood weights, default is True
+            lazy (bool): return a _NeighbourStates object of zero-copy views
+                into the wrapping grid instead of a materialised stack.
+                Neighbour arrays are only built when they are indexed.
+
+        Returns:
+            numpy.ndarray: the neighbour arrays in row major order, skipping
+                the cell itself. For a 3x3 neighbourhood these are the
+                NW N NE, W E, SW S SE neighbours
+        """
         if applyneighbourhood:
             nhood_arr = self.neighbourhood.neighbourhood
         else:
-            nhood_arr = np.ones((3, 3))
-        # Return the NW N NE, W self E, SW S SE neighbourgrids
-        nw = nhood_arr[0, 0] * grid[0:-2, 0:-2]
-        n = nhood_arr[0, 1] * grid[0:-2, 1:-1]
-        ne = nhood_arr[0, 2] * grid[0:-2, 2:]
-        w = nhood_arr[1, 0] * grid[1:-1, 0:-2]
-        e = nhood_arr[1, 2] * grid[1:-1, 2:]
-        sw = nhood_arr[2, 0] * grid[2:, 0:-2]
-        s = nhood_arr[2, 1] * grid[2:, 1:-1]
-        se = nhood_arr[2, 2] * grid[2:, 2:]
-        return np.array([nw, n, ne, w, e, sw, s, se])
-
-    def count_neighbours(self, neighbour_states):
-        """
-        Taking the 8 neighbour arrays, return n arrays of how many
-        neighbours of each state each cell are in each state,
-        where n is the number of states
+            nhood_arr = np.ones(self.neighbourhood.neighbourhood.shape)
+        ns = _NeighbourStates(self.wrapping_grid, nhood_arr, self.grid.shape)
+        if lazy:
+            return ns
+        return np.asarray(ns)
+
+    def count_neighbours(self, neighbour_states=None):
+        """Count how many neighbours of each cell are in each state
+
+        A one-hot tensor of every state is built in a single pass and
+        convolved with the neighbourhood, rather than looping over every
+        state and every neighbour array.
+
+        Args:
+            neighbour_states (numpy.ndarray): optional neighbour arrays as
+                returned by get_neighbour_states. If None the counts are
+                taken directly from the wrapping grid.
+
+        Returns:
+            numpy.ndarray: integer array of shape (n, rows, cols) holding the
+                counts for each state, where n is the number of states
         """
-        states = self.ca_config.states
-        # create variable to store the counts for each state
-        state_counts = np.zeros(len(states), dtype=np.ndarray)
-        for i, state in enumerate(states):
-            # for each state in the CA
-            countg = np.zeros(self.grid.shape)
+        states = np.asarray(self.ca_config.states)
+        rows, cols = self.grid.shape
+
+        if neighbour_states is not None:
+            dtype = _count_dtype(len(neighbour_states))
+            counts = np.zeros((len(states), rows, cols), dtype=dtype)
             for g in neighbour_states:
-                # for each neighbour array add the cells in the queried state
-                countg += (g == state) + 0
-            # save the total counts for this state
-            state_counts[i] = countg
-        return state_counts
+                np.add(counts, g == states[:, None, None], out=counts)
+            return counts
+
+        return self._count_states(self.wrapping_grid, (rows, cols))
+
+    def _count_states(self, wrapping_grid, shape):
+        """Count the neighbours in each state of every cell of a grid with
+        a border of the neighbourhood radius all the way round
+
+        Args:
+            wrapping_grid (numpy.ndarray): the grid including its border
+            shape (tuple): the shape of the grid without the border
+
+        Returns:
+            numpy.ndarray: see count_neighbours
+        """
+        counter = _StateCounter(self.ca_config.states,
+                                self.neighbourhood.neighbourhood, shape)
+        return counter(wrapping_grid)
+
+    def _setup_bands(self):
+        """Split the grid into row bands, at least one per thread and
+        each of at most BAND_CELLS cells, with their own count buffers"""
+        rows, cols = self.grid.shape
+        numbands = max(self.num_threads, -(-rows * cols // self.BAND_CELLS))
+        bounds = np.linspace(0, rows, min(numbands, rows) + 1).astype(int)
+        self._bands = [(r0, r1, _StateCounter(self.ca_config.states,
+                                              self.neighbourhood.neighbourhood,
+                                              (r1 - r0, cols)))
+                       for r0, r1 in zip(bounds[:-1], bounds[1:])]
+
+    def close(self):
+        """Shut down the thread pool of a threaded grid (see
+        _threaded_step), which is started again if the grid is stepped
+        after closing"""
+        pool, self._pool = getattr(self, '_pool', None), None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def __del__(self):
+        self.close()
 
     def step(self):
         """ Calculate the next timestep by applying the transistion function
         and save the new state to grid """
-        # collect the 8 arrays of neighbour states
-        ns = self.get_neighbour_states()
+        if self._hashlife is not None:
+            self.advance(1)
+            return
+        if self.tile_size is not None:
+            self._active_step()
+            return
+        if self._bands is not None:
+            self._threaded_step()
+            return
+        # collect the 8 arrays of neighbour states, these are only
+        # materialised if the transition function uses them
+        ns = self.get_neighbour_states(lazy=True)
         # calculate the number of neighbours each cell has of each state
-        # return n arrays where n is the number of states
-        nc = self.count_neighbours(ns)
+        # into the preallocated counts, n arrays where n is the number of
+        # states
+        nc = self._counter(self.wrapping_grid)
+        np.copyto(self._front, self.grid)
 
         # apply the user's transition function
         # passing in the states and counts to allow complex rules
         # if the user supplied any addition arguments, pass them here
-        if self.additional_args is None:
-            self.grid = self.transition_func(self.grid, ns, nc)
+        if self._transition_out:
+            new = self._transition(self._front, ns, nc, out=self._back)
         else:
-            self.grid = self.transition_func(self.grid, ns, nc,
-                                             *self.additional_args)
+            new = self._transition(self._front, ns, nc)
+        # the neighbours have all been read, so the grid can be overwritten
+        np.copyto(self.grid, new, casting='unsafe')
         # refresh wrapping border
         self.refresh_wrap()
 
+    def _threaded_step(self):
+        """Calculate the next timestep band by band on the thread pool
+
+        Note:
+            The neighbour states of each band are views of the wrapping
+            grid including a border of the neighbourhood radius above and
+            below, and each band writes its rows of the back buffer, so
+            the bands are neither copied nor stitched together. The
+            transition function is passed the band's rows of the copy of
+            the grid (see step), so a transition function that changes the
+            grid in place never changes the neighbours read by another
+            band, or by itself.
+
+            The transition function must only combine cells elementwise,
+            it is called with each band in place of the whole grid. The
+            uniforms argument is drawn for the whole grid before the bands
+            and each band is passed its rows, so rules taking it give the
+            same result on any number of threads, unlike rules drawing
+            random numbers themselves.
+        """
+        w = self.wrapsize
+        cols = self.grid.shape[1]
+        uniforms = None
+        if self._transition_uniforms:
+            uniforms = self.uniforms(self.grid.shape)
+
+        def count(band):
+            r0, r1, counter = band
+            return counter(self.wrapping_grid[r0:r1 + 2*w])
+
+        def transition(band, nc):
+            r0, r1, counter = band
+            ns = _NeighbourStates(self.wrapping_grid[r0:r1 + 2*w],
+                                  self.neighbourhood.neighbourhood,
+                                  (r1 - r0, cols))
+            back = self._back[r0:r1]
+            u = None if uniforms is None else uniforms[r0:r1]
+            front = self._front[r0:r1]
+            if self._transition_out:
+                new = self._transition(front, ns, nc, uniforms=u, out=back)
+            else:
+                new = self._transition(front, ns, nc, uniforms=u)
+            if new is not back:
+                np.copyto(back, new, casting='unsafe')
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.num_threads)
+        np.copyto(self._front, self.grid)
+        counts = list(self._pool.map(count, self._bands))
+        # list() waits for every band and raises any error from them
+        list(self._pool.map(transition, self._bands, counts))
+        np.copyto(self.grid, self._back)
+        self.refresh_wrap()
+
+    def advance(self, generations):
+        """Calculate the grid a number of generations on, with the
+        HashLife engine if the rule allows (see _setup_hashlife), in which
+        case the generations in between are not calculated one by one"""
+        if self._hashlife is None:
+            Grid.advance(self, generations)
+            return
+        self.grid[:, :] = self._hashlife.step_torus(self.grid, generations)
+        self.refresh_wrap()
+
+    def _transition(self, grid, ns, nc, uniforms=None, **kwargs):
+        """Apply the transition function, with any additional and random
+        arguments (see Grid.random_kwargs)"""
+        kwargs.update(self.random_kwargs(np.shape(grid), uniforms))
+        if self.additional_args is None:
+            return self.transition_func(grid, ns, nc, **kwargs)
+        return self.transition_func(grid, ns, nc, *self.additional_args,
+                                    **kwargs)
+
+    def _tile_bounds(self, axis):
+        """Return the start of each tile along an axis, and the end"""
+        return np.append(np.arange(0, self.grid.shape[axis], self.tile_size),
+                         self.grid.shape[axis])
 
-def randomise2d(grid, background_state, proportions):
+    def _active_step(self):
+        """Calculate the next timestep only for the active tiles, those
+        where a cell in the tile or its halo changed last generation
+
+        Note:
+            The active tiles, each with a border of the neighbourhood
+            radius, are laid side by side in one array so the transition
+            function is called once per generation. The cells of the
+            inactive tiles are left as they are, which matches stepping
+            the full grid for any deterministic rule.
+        """
+        r = self.wrapsize
+        rowbounds, colbounds = self._tile_bounds(0), self._tile_bounds(1)
+        tiles = np.argwhere(self.active_tiles)
+        changed = np.zeros_like(self.active_tiles)
+        if len(tiles) == 0:
+            return
+
+        if len(tiles) * 2 > self.active_tiles.size:
+            # most of the grid is active, evaluate all of it
+            np.copyto(self._front, self.grid)
+            ns = self.get_neighbour_states(lazy=True)
+            nc = self.count_neighbours()
+            if self._transition_out:
+                new = self._transition(self._front, ns, nc, out=self._back)
+            else:
+                new = self._transition(self._front, ns, nc)
+            diff = np.asarray(new != self.grid)
+            # tile changed if any of its cells changed
+            diff = np.logical_or.reduceat(diff, rowbounds[:-1], axis=0)
+            changed = np.logical_or.reduceat(diff, colbounds[:-1], axis=1)
+            self.grid[:, :] = new
+        else:
+            # lay the active tiles and their halos out side by side
+            size = self.tile_size + 2*r
+            mosaic = np.zeros((size, len(tiles) * size),
+                              dtype=self.wrapping_grid.dtype)
+            blocks = []
+            for k, (i, j) in enumerate(tiles):
+                r0, r1 = rowbounds[i], rowbounds[i + 1]
+                c0, c1 = colbounds[j], colbounds[j + 1]
+                mosaic[:r1 - r0 + 2*r, k*size:k*size + c1 - c0 + 2*r] = \
+                    self.wrapping_grid[r0:r1 + 2*r, c0:c1 + 2*r]
+                blocks.append((r0, r1, c0, c1))
+            shape = (self.tile_size, mosaic.shape[1] - 2*r)
+            ns = _NeighbourStates(mosaic, self.neighbourhood.neighbourhood,
+                                  shape)
+            nc = self._count_states(mosaic, shape)
+            # a copy, so changes to it do not reach the neighbour states
+            interior = mosaic[r:r + shape[0], r:r + shape[1]].copy()
+            if self._transition_out:
+                new = self._transition(interior, ns, nc,
+                                       out=np.empty_like(interior))
+            else:
+                new = self._transition(interior, ns, nc)
+            for k, (r0, r1, c0, c1) in enumerate(blocks):
+                tile = new[:r1 - r0, k*size:k*size + c1 - c0]
+                if np.any(tile != self.grid[r0:r1, c0:c1]):
+                    changed[tuple(tiles[k])] = True
+                    self.grid[r0:r1, c0:c1] = tile
+
+        self.active_tiles = self._dilate_tiles(changed)
+        self.refresh_wrap()
+
+    def _dilate_tiles(self, changed):
+        """Mark every tile within the neighbourhood radius of a changed tile
+        as active"""
+        smallest = min(self.tile_size, *[
+            np.diff(self._tile_bounds(axis)).min() for axis in (0, 1)])
+        reach = -(-self.wrapsize // smallest)
+        wrap = self.ca_config.wrap is True
+        active = changed.copy()
+        for axis in (0, 1):
+            spread = active.copy()
+            for d in range(1, reach + 1):
+                if wrap:
+                    spread |= np.roll(active, d, axis=axis)
+                    spread |= np.roll(active, -d, axis=axis)
+                elif axis == 0:
+                    spread[d:] |= active[:-d]
+                    spread[:-d] |= active[d:]
+                else:
+                    spread[:, d:] |= active[:, :-d]
+                    spread[:, :-d] |= active[:, d:]
+            active = spread
+        return active
+
+    def set_grid(self, g):
+        """Set self.grid to supplied grid (see Grid.set_grid), every tile
+        is stepped in the next generation"""
+        Grid.set_grid(self, g)
+        self.reset_active_tiles()
+
+    def fill_cycle(self, cycle, start, generation):
+        """Move the grid on to a later generation of a cycle (see
+        Grid.fill_cycle), every tile is stepped in the next generation"""
+        Grid.fill_cycle(self, cycle, start, generation)
+        self.reset_active_tiles()
+
+    def set_state(self, state):
+        """Restore the grid to a state returned by get_state, every tile
+        is stepped in the next generation"""
+        Grid.set_state(self, state)
+        self.reset_active_tiles()
+
+    def reset_active_tiles(self):
+        """Mark every tile as active, eg. after the grid has been edited
+        directly between steps"""
+        if self.tile_size is not None:
+            numtiles = (len(self._tile_bounds(0)) - 1,
+                        len(self._tile_bounds(1)) - 1)
+            self.active_tiles = np.ones(numtiles, dtype=bool)
+
+
+class _NeighbourStates(np.lib.mixins.NDArrayOperatorsMixin):
+    """Lazy stand in for the stacked neighbour state arrays
+
+    Behaves like the (8, rows, cols) array returned by
+    Grid2D.get_neighbour_states, but each neighbour is a read only view of
+    the wrapping grid that is only created (and masked by the neighbourhood
+    weight if needed) when it is indexed or iterated over. Using the whole
+    object in a numpy expression materialises the full stack.
+    """
+
+    def __init__(self, wrapping_grid, nhood_arr, shape):
+        self.wrapping_grid = wrapping_grid
+        self.rows, self.cols = shape
+        krows, kcols = nhood_arr.shape
+        centre = (krows // 2, kcols // 2)
+        # neighbours in row major order, skipping the cell itself
+        self.offsets = [(i, j) for i in range(krows) for j in range(kcols)
+                        if (i, j) != centre]
+        self.weights = [nhood_arr[i, j] for i, j in self.offsets]
+
+    @property
+    def shape(self):
+        return (len(self.offsets), self.rows, self.cols)
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def dtype(self):
+        return np.asarray(self[0]).dtype if len(self) else self.wrapping_grid.dtype
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self.neighbour(k)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self.neighbour(key)
+        return np.asarray(self)[key]
+
+    def __array__(self, dtype=None, copy=None):
+        arr = np.array([n for n in self])
+        if dtype is not None:
+            arr = arr.astype(dtype)
+        return arr
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [np.asarray(x) if x is self else x for x in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def neighbour(self, k):
+        """Return the state array of the kth neighbour
+
+        Note:
+            Unmasked neighbours are returned as read only views of the
+            wrapping grid, so no copy is made
+        """
+        i, j = self.offsets[k]
+        view = self.wrapping_grid[i:i + self.rows, j:j + self.cols]
+        weight = self.weights[k]
+        if weight == 1:
+            view = view.view()
+            view.flags.writeable = False
+            return view
+        return weight * view
+
+
+class _StateCounter(object):
+    """Counts the neighbours in each state of every cell of a grid with a
+    border of the neighbourhood radius, reusing the same buffers each time
+
+    Note:
+        The one-hot tensor of every state is built in place, neighbours
+        sharing a weight in the neighbourhood share the same tensor, and the
+        plan for summing each stencil is made once. The counts returned are
+        overwritten by the next call.
+
+    Args:
+        states (tuple): the states to count
+        nhood_arr (numpy.ndarray): the (2r + 1, 2r + 1) neighbourhood
+        shape (tuple): the shape of the grid without the border
+    """
+
+    def __init__(self, states, nhood_arr, shape):
+        self.states = np.asarray(states)[:, None, None]
+        rows, cols = shape
+        r = nhood_arr.shape[0] // 2
+        padded = (rows + 2*r, cols + 2*r)
+        self.counts = np.zeros((len(states), rows, cols),
+                               dtype=_count_dtype(nhood_arr.size - 1))
+        self.onehot = np.empty((len(states),) + padded, dtype=bool)
+        # masked out neighbours always read as state 0
+        self.zeros = np.zeros(len(states), dtype=self.counts.dtype)
+        self.stencils = []
+        self.weighted = self.prefix = None
+        centre = (nhood_arr.shape[0] // 2, nhood_arr.shape[1] // 2)
+        for weight in np.unique(nhood_arr):
+            mask = nhood_arr == weight
+            mask[centre] = False
+            if not mask.any():
+                continue
+            if weight == 0:
+                self.zeros[np.asarray(states) == 0] += np.count_nonzero(mask)
+                continue
+            runs = _stencil_runs(mask)
+            if (np.count_nonzero(mask) > 2 * len(runs) + 2 and
+                    self.prefix is None):
+                self.prefix = np.zeros(self.onehot.shape[:2] +
+                                       (self.onehot.shape[2] + 1,),
+                                       dtype=np.int32)
+            if weight != 1 and self.weighted is None:
+                self.weighted = np.empty(padded, dtype=np.result_type(
+                    weight, self.states.dtype))
+            self.stencils.append((weight, mask, runs))
+
+    def __call__(self, wrapping_grid):
+        """Return the counts of each state, see Grid2D.count_neighbours"""
+        counts = self.counts
+        counts[...] = self.zeros[:, None, None]
+        for weight, mask, runs in self.stencils:
+            grid = wrapping_grid
+            if weight != 1:
+                grid = np.multiply(wrapping_grid, weight, out=self.weighted)
+            np.equal(grid[None, :, :], self.states, out=self.onehot)
+            _stencil_sum(self.onehot, mask, counts, runs, self.prefix)
+        return counts
+
+
+def _stencil_runs(mask):
+    """Split a stencil into horizontal runs of neighbours (row, start,
+    end)"""
+    runs = []
+    for i, maskrow in enumerate(mask):
+        # find the start and end (exclusive) of each run of neighbours
+        edges = np.diff(np.concatenate(([0], maskrow.astype(np.int8), [0])))
+        starts, = np.nonzero(edges == 1)
+        ends, = np.nonzero(edges == -1)
+        runs.extend((i, a, b) for a, b in zip(starts, ends))
+    return runs
+
+
+def _stencil_sum(onehot, mask, out, runs=None, prefix=None):
+    """Add the sum of onehot over the stencil mask at every cell to out
+
+    Small stencils add one shifted slice per neighbour. Larger stencils are
+    split into horizontal runs of neighbours, each summed from a prefix sum
+    along the rows, so the cost grows with the stencil height rather than
+    its area.
+
+    Args:
+        onehot (numpy.ndarray): (n, rows + 2r, cols + 2r) boolean array
+        mask (numpy.ndarray): (2r + 1, 2r + 1) boolean stencil
+        out (numpy.ndarray): (n, rows, cols) integer array to add to
+        runs (list): the runs of the stencil (see _stencil_runs), found
+            from the mask if None
+        prefix (numpy.ndarray): (n, rows + 2r, cols + 2r + 1) int32 buffer
+            for the prefix sums, allocated if None
+    """
+    rows, cols = out.shape[1:]
+    if runs is None:
+        runs = _stencil_runs(mask)
+
+    if np.count_nonzero(mask) <= 2 * len(runs) + 2:
+        for i, j in zip(*np.nonzero(mask)):
+            np.add(out, onehot[:, i:i + rows, j:j + cols], out=out)
+        return
+
+    if prefix is None:
+        prefix = np.zeros(onehot.shape[:2] + (onehot.shape[2] + 1,),
+                          dtype=np.int32)
+    np.cumsum(onehot, axis=2, out=prefix[:, :, 1:])
+    for i, a, b in runs:
+        # out only holds the final counts, so the intermediate wrap around
+        # from the unsafe casts cancels out
+        np.add(out, prefix[:, i:i + rows, b:b + cols], out=out,
+               casting='unsafe')
+        np.subtract(out, prefix[:, i:i + rows, a:a + cols], out=out,
+                    casting='unsafe')
+
+
+def _count_dtype(max_count):
+    """Return the narrowest signed integer dtype able to hold max_count"""
+    return np.result_type(np.int8, np.min_scalar_type(-int(max_count) - 1))
+
+
+def randomise2d(grid, background_state, proportions, rng=None):
     """ Takes a grid, the background state, and
-    proportions for each state in a list of tuples ([(1,0.4), (2,0.3)]) """
-    grid[:, :] = background_state
-    numcells_per_state = np.zeros(len(proportions), dtype=int)
-    for i, p in enumerate(proportions):
-        proportion = clip_numeric(p[1], 0, 1)
-        numcells_per_state[i] = int(proportion * grid.size)
-    randindicies = np.random.choice(grid.size, np.sum(numcells_per_state),
-                                    replace=False)
-    g = np.copy(grid).reshape(grid.size)
-    used = 0
-    for i, p in enumerate(proportions):
-        state = p[0]
-        indicies = randindicies[used:numcells_per_state[i]]
-        g[indicies] = state
-        used += numcells_per_state[i]
-
-    return g.reshape(grid.shape)
+    proportions for each state in a list of tuples ([(1,0.4), (2,0.3)])
+
+    Returns a new grid of the same shape and dtype with exactly those
+    proportions of cells in each state (see proportional_states), rng
+    being a numpy Generator or seed to draw the positions from """
+    return proportional_states(grid.shape, background_state, proportions,
+                               rng=rng, dtype=grid.dtype)
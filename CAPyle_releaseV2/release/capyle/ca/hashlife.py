@@ -0,0 +1,380 @@
+import numpy as np
+
+# default number of canonical nodes kept before the cache is emptied
+DEFAULT_MAX_NODES = 2**20
+
+
+class LifeRule(object):
+    """A deterministic 2 state outer totalistic rule on the Moore
+    neighbourhood, given by the live neighbour counts for birth and survival
+
+    Note:
+        Can be passed to Grid2D in place of a transition function. When the
+        states are (0, 1), the neighbourhood is the radius 1 Moore
+        neighbourhood and the grid wraps, Grid2D runs the rule with the
+        HashLife engine rather than stepping every cell.
+
+    Example:
+        Grid2D(config, LifeRule.from_string('B3/S23'))
+
+    Args:
+        birth (iterable): live neighbour counts at which a dead cell is born
+        survival (iterable): live neighbour counts at which a live cell
+            survives
+    """
+
+    def __init__(self, birth=(3,), survival=(2, 3)):
+        self.birth = frozenset(int(n) for n in birth)
+        self.survival = frozenset(int(n) for n in survival)
+        if not self.birth | self.survival <= set(range(9)):
+            raise ValueError("Neighbour counts must be 0 to 8")
+        # table[state, live neighbours] -> new state
+        self.table = np.zeros((2, 9), dtype=np.uint8)
+        self.table[0, sorted(self.birth)] = 1
+        self.table[1, sorted(self.survival)] = 1
+
+    @classmethod
+    def from_string(cls, rule):
+        """Create the rule from B/S notation
+
+        Example:
+            LifeRule.from_string('B36/S23') is HighLife
+        """
+        parts = rule.upper().replace(' ', '').split('/')
+        counts = {}
+        for part in parts:
+            digits = part[1:]
+            if part[:1] not in ('B', 'S') or not (digits.isdigit() or
+                                                   digits == ''):
+                raise ValueError("Invalid rule {r}".format(r=rule))
+            counts[part[0]] = [int(c) for c in digits]
+        if sorted(counts) != ['B', 'S'] or len(parts) != 2:
+            raise ValueError("Invalid rule {r}".format(r=rule))
+        return cls(counts['B'], counts['S'])
+
+    def __str__(self):
+        return 'B{b}/S{s}'.format(b=''.join(map(str, sorted(self.birth))),
+                                  s=''.join(map(str, sorted(self.survival))))
+
+    def __repr__(self):
+        return 'LifeRule.from_string({r!r})'.format(r=str(self))
+
+    def __eq__(self, other):
+        return (isinstance(other, LifeRule) and
+                self.birth == other.birth and self.survival == other.survival)
+
+    def __hash__(self):
+        return hash((self.birth, self.survival))
+
+    def __call__(self, grid, neighbourstates, neighbourcounts, out=None):
+        """Transition function applying the rule to the grid, writing the
+        new states to out if given"""
+        # index into the flattened table, 9 * state + live neighbours
+        index = np.multiply(grid == 1, 9, dtype=np.intp)
+        np.add(index, neighbourcounts[1], out=index, casting='unsafe')
+        table = self.table.ravel()
+        if out is not None:
+            table = table.astype(out.dtype)
+        return np.take(table, index, out=out, mode='clip')
+
+
+class _Node(object):
+    """A square of 2**level by 2**level cells, made of four quadrants one
+    level down. Level 0 nodes are single cells. Nodes are only created by
+    HashLife.node so that equal squares are the same object."""
+    __slots__ = ('level', 'nw', 'ne', 'sw', 'se', 'population', 'code')
+
+    def __init__(self, level, nw, ne, sw, se, population, code):
+        self.level = level
+        self.nw, self.ne, self.sw, self.se = nw, ne, sw, se
+        self.population = population
+        # the cells as bits, cell (y, x) being bit y * 2**level + x, only
+        # kept up to level 2
+        self.code = code
+
+
+class HashLife(object):
+    """Gosper's HashLife algorithm for a LifeRule
+
+    The pattern is stored as a quadtree of canonical (hash consed) nodes,
+    so repeated squares are stored once, and the result of advancing each
+    node is memoised, so repeated squares are only ever calculated once.
+    Advancing a node by 2**j generations costs time that grows with the
+    number of distinct nodes involved, not the number of generations.
+
+    Note:
+        When the cache holds more than max_nodes nodes it is emptied, along
+        with the memoised results, keeping only the nodes that are always
+        needed. Results stay exact, but work may be repeated, so a cap too
+        small for the pattern makes the engine slow rather than wrong.
+
+    Args:
+        rule (LifeRule): the rule to run
+        max_nodes (int): the most canonical nodes to keep cached
+    """
+
+    def __init__(self, rule, max_nodes=DEFAULT_MAX_NODES):
+        self.rule = rule
+        self.max_nodes = max_nodes
+        # number of times the cache has been emptied
+        self.evictions = 0
+        self._nodes = {}
+        self._results = {}
+        self.cells = (_Node(0, None, None, None, None, 0, 0),
+                      _Node(0, None, None, None, None, 1, 1))
+        # the 16 level 1 nodes indexed by their code
+        self._level1 = [self.node(*[self.cells[(c >> b) & 1]
+                                    for b in range(4)]) for c in range(16)]
+        self._empty = [self.cells[0], self._level1[0]]
+        self._life4x4 = _life_4x4_table(rule)
+
+    def node(self, nw, ne, sw, se):
+        """Return the canonical node with the given quadrants"""
+        key = (nw, ne, sw, se)
+        node = self._nodes.get(key)
+        if node is not None:
+            return node
+        if len(self._nodes) >= self.max_nodes:
+            self.evict()
+        level = nw.level + 1
+        code = None
+        if level == 1:
+            code = nw.code | ne.code << 1 | sw.code << 2 | se.code << 3
+        elif level == 2:
+            code = (_SPREAD[0][nw.code] | _SPREAD[1][ne.code] |
+                    _SPREAD[2][sw.code] | _SPREAD[3][se.code])
+        node = _Node(level, nw, ne, sw, se, nw.population + ne.population +
+                     sw.population + se.population, code)
+        self._nodes[key] = node
+        return node
+
+    def evict(self):
+        """Empty the node cache and the memoised results, keeping the level
+        1 nodes and the empty nodes"""
+        self.evictions += 1
+        self._results.clear()
+        keep = self._level1 + self._empty[2:]
+        self._nodes = dict(((n.nw, n.ne, n.sw, n.se), n) for n in keep)
+
+    def empty(self, level):
+        """Return the node of the given level with no live cells"""
+        while len(self._empty) <= level:
+            e = self._empty[-1]
+            self._empty.append(self.node(e, e, e, e))
+        return self._empty[level]
+
+    def from_array(self, cells):
+        """Build the node holding a square array of cells
+
+        Args:
+            cells (numpy.ndarray): 2**level by 2**level array, any value
+                other than 0 is a live cell
+
+        Returns:
+            _Node: the canonical node of the cells
+        """
+        ids = np.asarray(np.asarray(cells) != 0, dtype=np.intp)
+        size = ids.shape[0]
+        if ids.shape != (size, size) or size & (size - 1):
+            raise ValueError(
+                "Cells must be a square with a power of 2 side, not {s}"
+                .format(s=ids.shape))
+        nodes = self.cells
+        while ids.shape[0] > 1:
+            # ids of the four quadrants of every node one level up
+            quads = np.stack((ids[0::2, 0::2], ids[0::2, 1::2],
+                              ids[1::2, 0::2], ids[1::2, 1::2]), axis=-1)
+            half = quads.shape[0]
+            unique, inverse = np.unique(quads.reshape(-1, 4), axis=0,
+                                        return_inverse=True)
+            nodes = [self.node(nodes[a], nodes[b], nodes[c], nodes[d])
+                     for a, b, c, d in unique]
+            ids = inverse.reshape(half, half)
+        return nodes[ids[0, 0]]
+
+    def to_array(self, node, shape=None):
+        """Return the cells of a node as a uint8 array
+
+        Args:
+            node (_Node): the node to expand
+            shape (tuple): only expand the (rows, cols) at the top left
+                corner, None expands the whole node
+        """
+        size = 2**node.level
+        rows, cols = (size, size) if shape is None else shape
+        ids = np.zeros((1, 1), dtype=np.intp)
+        nodes = [node]
+        for level in range(node.level, 0, -1):
+            children, index = [], {}
+            quads = np.empty((len(nodes), 4), dtype=np.intp)
+            for i, n in enumerate(nodes):
+                for q, child in enumerate((n.nw, n.ne, n.sw, n.se)):
+                    if child not in index:
+                        index[child] = len(children)
+                        children.append(child)
+                    quads[i, q] = index[child]
+            new = np.empty((ids.shape[0] * 2, ids.shape[1] * 2),
+                           dtype=np.intp)
+            new[0::2, 0::2] = quads[ids, 0]
+            new[0::2, 1::2] = quads[ids, 1]
+            new[1::2, 0::2] = quads[ids, 2]
+            new[1::2, 1::2] = quads[ids, 3]
+            # drop the children outside the requested corner
+            child = 2**(level - 1)
+            ids = new[:-(-rows // child), :-(-cols // child)]
+            nodes = children
+        values = np.array([n.population for n in nodes], dtype=np.uint8)
+        return values[ids][:rows, :cols]
+
+    def torus(self, grid, level, offset=0):
+        """Build the node of a wrapping grid tiled across a 2**level square
+
+        Note:
+            The node at each level is fixed by where its corner falls in
+            the grid, so nodes up to the size of the grid are built for
+            every position at once, and larger nodes only for the positions
+            that are needed. The square is never built as an array.
+
+        Args:
+            grid (numpy.ndarray): the cells of the grid, non zero is alive
+            level (int): the level of the node
+            offset (int): the cell of the square (offset, offset) holds
+                cell (0, 0) of the grid
+
+        Returns:
+            _Node: the canonical node of the tiled grid
+        """
+        ids = np.asarray(np.asarray(grid) != 0, dtype=np.intp)
+        rows, cols = ids.shape
+        base = min(level, (max(rows, cols) - 1).bit_length())
+        nodes = self.cells
+        for k in range(1, base + 1):
+            # quadrants of the node with its corner at each cell
+            h = 2**(k - 1)
+            right = np.roll(ids, -h, axis=1)
+            quads = np.stack((ids, right, np.roll(ids, -h, axis=0),
+                              np.roll(right, -h, axis=0)), axis=-1)
+            unique, inverse = np.unique(quads.reshape(-1, 4), axis=0,
+                                        return_inverse=True)
+            nodes = [self.node(nodes[a], nodes[b], nodes[c], nodes[d])
+                     for a, b, c, d in unique]
+            ids = inverse.reshape(rows, cols)
+
+        built = {}
+
+        def build(k, y, x):
+            if k == base:
+                return nodes[ids[y, x]]
+            key = (k, y, x)
+            if key not in built:
+                h = 2**(k - 1)
+                y2, x2 = (y + h) % rows, (x + h) % cols
+                built[key] = self.node(build(k - 1, y, x),
+                                       build(k - 1, y, x2),
+                                       build(k - 1, y2, x),
+                                       build(k - 1, y2, x2))
+            return built[key]
+
+        return build(level, -offset % rows, -offset % cols)
+
+    def successor(self, node, j=None):
+        """Return the center half of a node 2**j generations later
+
+        Args:
+            node (_Node): a node of level 2 or above
+            j (int): advance 2**j generations, at most (and by default)
+                node.level - 2
+
+        Returns:
+            _Node: the node one level down holding the center cells
+        """
+        level = node.level
+        j = level - 2 if j is None else min(j, level - 2)
+        key = (node, j)
+        result = self._results.get(key)
+        if result is not None:
+            return result
+
+        if node.population == 0 and not self.rule.table[0, 0]:
+            result = self.empty(level - 1)
+        elif level == 2:
+            result = self._level1[self._life4x4[node.code]]
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            join = self.node
+            # nine overlapping squares one level down, advanced 2**j
+            # generations (or fewer, see below)
+            c1 = self.successor(nw, j)
+            c2 = self.successor(join(nw.ne, ne.nw, nw.se, ne.sw), j)
+            c3 = self.successor(ne, j)
+            c4 = self.successor(join(nw.sw, nw.se, sw.nw, sw.ne), j)
+            c5 = self.successor(join(nw.se, ne.sw, sw.ne, se.nw), j)
+            c6 = self.successor(join(ne.sw, ne.se, se.nw, se.ne), j)
+            c7 = self.successor(sw, j)
+            c8 = self.successor(join(sw.ne, se.nw, sw.se, se.sw), j)
+            c9 = self.successor(se, j)
+            if j < level - 2:
+                # the nine squares have already been advanced 2**j
+                # generations, take the centers without advancing further
+                result = join(join(c1.se, c2.sw, c4.ne, c5.nw),
+                              join(c2.se, c3.sw, c5.ne, c6.nw),
+                              join(c4.se, c5.sw, c7.ne, c8.nw),
+                              join(c5.se, c6.sw, c8.ne, c9.nw))
+            else:
+                result = join(self.successor(join(c1, c2, c4, c5), j),
+                              self.successor(join(c2, c3, c5, c6), j),
+                              self.successor(join(c4, c5, c7, c8), j),
+                              self.successor(join(c5, c6, c8, c9), j))
+        self._results[key] = result
+        return result
+
+    def step_torus(self, grid, generations):
+        """Advance a wrapping grid a number of generations
+
+        Note:
+            The grid is tiled across a node wide enough that its center
+            half, after 2**j generations, still covers the whole grid (see
+            torus). The generations in between are never built as arrays,
+            apart from once for each power of 2 in the number of
+            generations.
+
+        Args:
+            grid (numpy.ndarray): the cells of the grid, non zero is alive
+            generations (int): the number of generations to advance
+
+        Returns:
+            numpy.ndarray: the uint8 cells of the grid
+        """
+        cells = np.asarray(np.asarray(grid) != 0, dtype=np.uint8)
+        rows, cols = cells.shape
+        while generations > 0:
+            # largest power of 2 first
+            j = int(generations).bit_length() - 1
+            level = max(j + 2, (max(rows, cols) - 1).bit_length() + 1)
+            # offset so that the center half starts at cell (0, 0)
+            root = self.torus(cells, level, 2**(level - 2))
+            cells = self.to_array(self.successor(root, j), (rows, cols))
+            generations -= 2**j
+        return cells
+
+
+def _life_4x4_table(rule):
+    """Return the code of the center 2x2 cells one generation on for each
+    of the 2**16 codes of a 4x4 square"""
+    codes = np.arange(2**16)
+    cells = ((codes[:, None] >> np.arange(16)) & 1).reshape(-1, 4, 4)
+    result = np.zeros(len(codes), dtype=np.intp)
+    for b, (y, x) in enumerate(((1, 1), (1, 2), (2, 1), (2, 2))):
+        alive = cells[:, y - 1:y + 2, x - 1:x + 2].sum(axis=(1, 2))
+        alive -= cells[:, y, x]
+        result |= rule.table[cells[:, y, x], alive].astype(np.intp) << b
+    return result
+
+
+def _spread(oy, ox):
+    """Map each 2x2 code to its bits in a 4x4 code at offset (oy, ox)"""
+    return [sum(((c >> b) & 1) << ((oy + b // 2) * 4 + ox + b % 2)
+                for b in range(4)) for c in range(16)]
+
+# 2x2 codes of the nw, ne, sw and se quadrants placed in a 4x4 code
+_SPREAD = (_spread(0, 0), _spread(0, 2), _spread(2, 0), _spread(2, 2))
@@ -0,0 +1,215 @@
+import numpy as np
+from capyle.utils import clip_numeric, state_dtype
+
+# cells shuffled at once by proportional_states
+BLOCK_SIZE = 2**18
+
+
+def _rng(rng):
+    """Return a numpy Generator for rng, a Generator, a seed, or None for
+    a fresh unpredictable one"""
+    return np.random.default_rng(rng)
+
+
+def _counts(proportions, size):
+    """Return the states and number of cells of each state for a list of
+    (state, proportion) tuples"""
+    states = [p[0] for p in proportions]
+    counts = [int(clip_numeric(p[1], 0, 1) * size) for p in proportions]
+    if sum(counts) > size:
+        raise ValueError("Proportions add up to more than 1")
+    return states, counts
+
+
+def _grid(shape, background_state, states, dtype):
+    """Return a grid of the background state"""
+    if dtype is None:
+        dtype = state_dtype(states, extra=(background_state,))
+    return np.full(shape, background_state, dtype=dtype)
+
+
+def proportional_states(shape, background_state, proportions, rng=None,
+                        dtype=None):
+    """Return a grid with exactly the given proportion of cells in each
+    state, placed at random, and the rest in the background state
+
+    Note:
+        The grid is split into blocks of BLOCK_SIZE cells, the number of
+        cells of each state in each block drawn as from a shuffle of the
+        whole grid, and each block is then filled and shuffled in place.
+        Shuffling blocks that fit in the cache is much faster than
+        shuffling the whole grid, and nothing larger than the grid is
+        allocated
+
+    Example:
+        # 40% trees and 5% lakes on grass
+        grid = proportional_states((1000, 1000), GRASS,
+                                   [(TREE, 0.4), (LAKE, 0.05)], rng=42)
+
+    Args:
+        shape (tuple): the shape of the grid
+        background_state: the state of the cells not given a state
+        proportions (list): (state, proportion) tuples, the number of
+            cells of each state being int(proportion * size)
+        rng: a numpy Generator, or a seed for one, None for a random seed
+        dtype (numpy.dtype): the dtype of the grid, None for the narrowest
+            that holds the states (see utils.state_dtype)
+
+    Returns:
+        numpy.ndarray: the grid
+    """
+    rng = _rng(rng)
+    grid = _grid(shape, background_state, [p[0] for p in proportions],
+                 dtype)
+    cells = grid.reshape(-1)
+    states, counts = _counts(proportions, cells.size)
+    values = np.array(states + [background_state], dtype=grid.dtype)
+    # cells of each state, and of the background, left to place
+    remaining = np.array(counts + [cells.size - sum(counts)], dtype=np.int64)
+    for start in range(0, cells.size, BLOCK_SIZE):
+        block = cells[start:start + BLOCK_SIZE]
+        drawn = rng.multivariate_hypergeometric(remaining, len(block))
+        remaining -= drawn
+        block[:] = np.repeat(values, drawn)
+        rng.shuffle(block)
+    return grid
+
+
+def random_states(shape, background_state, proportions, rng=None,
+                  dtype=None):
+    """Return a grid with each cell drawn independently, in each state
+    with the given probability and otherwise in the background state
+
+    Note:
+        Faster than proportional_states for very large grids, but the
+        number of cells in each state only matches the proportions on
+        average
+
+    Args:
+        see proportional_states
+
+    Returns:
+        numpy.ndarray: the grid
+    """
+    rng = _rng(rng)
+    grid = _grid(shape, background_state, [p[0] for p in proportions],
+                 dtype)
+    states = [p[0] for p in proportions]
+    bounds = np.cumsum([clip_numeric(p[1], 0, 1) for p in proportions])
+    if len(bounds) and bounds[-1] > 1:
+        raise ValueError("Proportions add up to more than 1")
+    draw = rng.random(shape, dtype=np.float32)
+    # the state whose interval of [0, 1) each draw falls in, the highest
+    # states first so the lower intervals overwrite them
+    for state, bound in reversed(list(zip(states, bounds))):
+        grid[draw < bound] = state
+    return grid
+
+
+def _fade(t):
+    """Smooth the interpolation between lattice points, as in Perlin
+    noise, so the noise has no creases along the lattice"""
+    return t * t * (3 - 2 * t)
+
+
+def _lattice(size, scale):
+    """Return the lattice point before each cell along one axis, and how
+    far the cell is towards the next one"""
+    x = np.arange(size, dtype=np.float32) / scale
+    i = np.floor(x).astype(np.intp)
+    return i, _fade(x - i)[:, None]
+
+
+def value_noise(shape, scale, rng=None):
+    """Return smooth random noise, each cell interpolated between random
+    values on a lattice with spacing scale cells
+
+    Args:
+        shape (tuple): the rows and columns of the noise
+        scale (float): the cells between lattice points, about the size
+            of the features of the noise
+        rng: a numpy Generator, or a seed for one
+
+    Returns:
+        numpy.ndarray: float32 noise between 0 and 1
+    """
+    rng = _rng(rng)
+    rows, cols = shape
+    lattice = rng.random((int(rows / scale) + 2, int(cols / scale) + 2),
+                         dtype=np.float32)
+    i, t = _lattice(rows, scale)
+    # interpolate down the rows, then across the columns
+    down = lattice[i] * (1 - t) + lattice[i + 1] * t
+    j, u = _lattice(cols, scale)
+    u = u.T
+    return down[:, j] * (1 - u) + down[:, j + 1] * u
+
+
+def fractal_noise(shape, scale, octaves=4, persistence=0.5, rng=None):
+    """Return Perlin-style fractal noise, the sum of octaves of value
+    noise each with half the scale of the one before
+
+    Args:
+        shape (tuple): the rows and columns of the noise
+        scale (float): the scale of the first (coarsest) octave
+        octaves (int): the number of octaves
+        persistence (float): the weight of each octave relative to the one
+            before, higher makes rougher noise
+        rng: a numpy Generator, or a seed for one
+
+    Returns:
+        numpy.ndarray: float32 noise
+    """
+    rng = _rng(rng)
+    noise = np.zeros(shape, dtype=np.float32)
+    weight = 1.0
+    for octave in range(octaves):
+        noise += weight * value_noise(shape, max(scale / 2 ** octave, 1),
+                                      rng)
+        weight *= persistence
+    return noise
+
+
+def noise_states(shape, background_state, proportions, scale=16, octaves=1,
+                 persistence=0.5, rng=None, dtype=None):
+    """Return a grid with the given proportion of cells in each state, in
+    clustered patches following fractal noise, exact unless cells happen
+    to have the same noise
+
+    The cells with the lowest noise take the first state, the next lowest
+    the second and so on, the rest being in the background state. With
+    one octave the states form patches of about scale cells, with more
+    they form terrain, eg. forest, scrub and lakes in a landscape
+
+    Example:
+        # forest patches of about 50 cells in rough terrain
+        grid = noise_states((500, 500), SCRUB, [(LAKE, 0.05),
+                            (FOREST, 0.3)], scale=50, octaves=4, rng=1)
+
+    Args:
+        shape (tuple): the rows and columns of the grid
+        background_state: the state of the cells not given a state
+        proportions (list): (state, proportion) tuples, as for
+            proportional_states
+        scale, octaves, persistence: the noise, see fractal_noise
+        rng: a numpy Generator, or a seed for one
+        dtype (numpy.dtype): the dtype of the grid, None for the narrowest
+            that holds the states
+
+    Returns:
+        numpy.ndarray: the grid
+    """
+    noise = fractal_noise(shape, scale, octaves, persistence, rng)
+    grid = _grid(shape, background_state, [p[0] for p in proportions],
+                 dtype)
+    states, counts = _counts(proportions, grid.size)
+    ends = np.cumsum(counts)
+    kth = [int(e) - 1 for e in ends if e > 0]
+    if not kth:
+        return grid
+    # the noise of the last cell of each state, in order of noise
+    ordered = np.partition(noise.reshape(-1), kth)
+    for state, end in reversed(list(zip(states, ends))):
+        if end > 0:
+            grid[noise <= ordered[end - 1]] = state
+    return grid
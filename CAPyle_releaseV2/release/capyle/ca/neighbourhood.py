@@ -9,11 +9,13 @@ class Neighbourhood(object):
             raise ValueError(
                 "Unsuported number of dimensions, only 1D or 2D CA supported")
         if dims == 2:
-            # 3,3 neighbourhood
+            # (2r+1, 2r+1) neighbourhood
             self.neighbourhood = self._prepare2D(nhood)
         else:
             # 3, Neighbourhood
             self.neighbourhood = self._prepare1D(nhood)
+        # number of cells the neighbourhood reaches out from the center
+        self.radius = self.neighbourhood.shape[0] // 2
 
     def __str__(self):
         """Return the string version of the neighbourhood array
@@ -47,14 +49,17 @@ class Neighbourhood(object):
             raise ValueError(
                 "Neighbourhood must have a center to represent the cell")
 
-        # scale the neighbourhood to the correct size of 3x3
-        # [1,1,1] -> [[0,0,0],[1,1,1],[0,0,0]]      #increase
-        # nhood.shape = 5,5 -> nhood.shape = 3,3    #decrease
-        if nhood.shape > (3, 3):
-            print("[WARNING] Neighbourhood too large, scaling to 3x3...")
-            nhood = self._reduce_to_3x3(nhood)
-        elif nhood.shape < (3, 3):
-            nhood = self._increase_to_3x3(nhood)
+        # pad the neighbourhood to a square of at least 3x3 with the
+        # cell at the center, larger neighbourhoods keep their full radius
+        # [1,1,1] -> [[0,0,0],[1,1,1],[0,0,0]]
+        # nhood.shape = 3,5 -> nhood.shape = 5,5
+        if nhood.shape == (1,) or nhood.shape == (1, 1):
+            return np.zeros((3, 3))
+        if nhood.ndim == 1:
+            nhood = nhood.reshape(1, nhood.shape[0])
+        size = max(3, *nhood.shape)
+        if not nhood.shape == (size, size):
+            nhood = self._pad_to_square(nhood, size)
         return nhood
 
     def _prepare1D(self, nhood):
@@ -95,47 +100,14 @@ class Neighbourhood(object):
             return True
         return False
 
-    def _reduce_to_3x3(self, nhood, fullmatrix=True):
-        """
-        With the fullmatrix == True, the array will be reduced to 3x3,
-        otherwise the appropriate dimensions will be reduced
-        eg. [[1,1,1,1,1]] -> [[1,1,1]]
-        """
+    def _pad_to_square(self, nhood, size):
+        """Pad an odd shaped neighbourhood with zeros to a size x size
+        array, keeping the center cell at the center"""
         rows, cols = nhood.shape
-        if fullmatrix and (rows == cols == 3):
-            return nhood
-        elif not fullmatrix and cols <= 3 and rows <= 3:
-            return nhood
-        if rows > 3:
-            nhood = nhood[1:-1]
-        if cols > 3:
-            nhood = nhood[:, 1:-1]
-        return self._reduce_to_3x3(nhood, fullmatrix)
-
-    def _increase_to_3x3(self, nhood):
-        # Only valid shapes at this point either have a 3 or 1
-        # If one dimension greater than 3 then reduce to 3
-        if any(s > 3 for s in nhood.shape):
-            nhood = self._reduce_to_3x3(nhood, fullmatrix=False)
-
-        new_col = np.zeros((3, 1))
-        new_row = np.zeros((3))
-
-        if nhood.shape == (1, 3):
-            nhood = nhood[0]
-            shape = nhood.shape
-        if nhood.shape == (3,):
-            nhood = np.vstack((nhood, new_row))
-            nhood = np.vstack((new_row, nhood))
-            return nhood
-
-        if nhood.shape == (3, 1):
-            nhood = np.hstack((nhood, new_col))
-            nhood = np.hstack((new_col, nhood))
-            return nhood
-
-        if nhood.shape == (1,) or nhood.shape == (1, 1):
-            return np.zeros((3, 3))
+        padded = np.zeros((size, size))
+        rowpad, colpad = (size - rows) // 2, (size - cols) // 2
+        padded[rowpad:rowpad + rows, colpad:colpad + cols] = nhood
+        return padded
 
     def _type_neighbourhood(self, nhood):
         """Checks the type of the neighbourhood provided
@@ -149,3 +121,32 @@ class Neighbourhood(object):
             return np.array(nhood)
         # else return numpy array
         return nhood
+
+
+def moore_neighbourhood(radius=1):
+    """Return the Moore neighbourhood array of the given radius
+
+    Example:
+        moore_neighbourhood(1) -> [[1,1,1],[1,1,1],[1,1,1]]
+    """
+    size = 2 * radius + 1
+    return np.ones((size, size), dtype=int)
+
+
+def von_neumann_neighbourhood(radius=1):
+    """Return the von Neumann neighbourhood array of the given radius,
+    all cells within a manhattan distance of radius from the center
+
+    Example:
+        von_neumann_neighbourhood(1) -> [[0,1,0],[1,1,1],[0,1,0]]
+    """
+    offsets = np.abs(np.arange(-radius, radius + 1))
+    return ((offsets[:, None] + offsets[None, :]) <= radius).astype(int)
+
+
+def circular_neighbourhood(radius=1):
+    """Return a circular neighbourhood array of the given radius,
+    all cells within a euclidean distance of radius from the center"""
+    offsets = np.arange(-radius, radius + 1)
+    distances = offsets[:, None]**2 + offsets[None, :]**2
+    return (distances <= radius**2).astype(int)
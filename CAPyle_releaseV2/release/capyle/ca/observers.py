@@ -0,0 +1,346 @@
+import hashlib
+import threading
+import contextlib
+from collections import deque
+import numpy as np
+
+# the observers added to the runs on each thread (see observe_runs)
+_thread = threading.local()
+
+
+@contextlib.contextmanager
+def observe_runs(observers, timeline=True):
+    """Add observers to every Grid.run on this thread inside the context,
+    eg. to watch a run started by a CA description
+
+    Example:
+        counts = StateCounts()
+        with observe_runs([counts], timeline=False):
+            runner.run_description(filepath, ca_config)
+
+    Args:
+        observers (list): the Observer objects to add
+        timeline (bool): False to keep no timeline in those runs
+    """
+    previous = getattr(_thread, 'setting', None)
+    _thread.setting = list(observers), timeline
+    try:
+        yield
+    finally:
+        _thread.setting = previous
+
+
+def run_observers():
+    """Return the observers added to runs on this thread, and whether the
+    runs keep their timeline (see observe_runs)"""
+    setting = getattr(_thread, 'setting', None)
+    return ([], True) if setting is None else setting
+
+
+class Observer(object):
+    """Superclass of the observers passed to Grid.run, which are shown
+    the grid after every generation and keep only what they need of it
+
+    Note:
+        The grid passed to update is the grid being stepped, not a copy,
+        so it must not be modified or kept between calls
+
+        An observer sets done to True to end the run early
+
+        An observer that only needs the saved frames (see
+        ca_config.timeline_interval) sets every_generation to False. If
+        every observer of a run does, the run moves on from one saved
+        frame to the next in a single jump (eg. with HashLife) rather than
+        a generation at a time, and update is only called for the saved
+        frames
+    """
+    done = False
+    every_generation = True
+
+    def start(self, grid, num_generations):
+        """Called once before the run
+
+        Args:
+            grid (Grid): the grid being run
+            num_generations (int): the number of generations to run
+        """
+        pass
+
+    def update(self, generation, grid):
+        """Called with the state of the grid after each generation,
+        including generation 0
+
+        Args:
+            generation (int): the generation number
+            grid (numpy.ndarray): the cells after that generation
+        """
+        pass
+
+    def finish(self):
+        """Called once after the last generation"""
+        pass
+
+    def result(self):
+        """Return what the observer collected, eg. as the statistic of a
+        run in a sweep (see sweep.iter_sweep)"""
+        return None
+
+
+class StateCounts(Observer):
+    """Count the number of cells in each state every generation
+
+    Example:
+        counts = StateCounts()
+        grid.run(observers=[counts], timeline=False)
+        burnt = counts.counts[:, states.index(STATE_BURNT)]
+
+    Args:
+        states (tuple): the states to count, None counts ca_config.states
+    """
+
+    def __init__(self, states=None):
+        self.states = states
+        self.counts = None
+
+    def start(self, grid, num_generations):
+        if self.states is None:
+            self.states = tuple(grid.ca_config.states)
+        states = np.asarray(self.states)
+        self.counts = np.zeros((num_generations + 1, len(states)),
+                               dtype=np.int64)
+        cells = grid.current_cells()
+        # a contiguous copy of the cells to count with bincount
+        self._buffer = np.empty(cells.shape, dtype=cells.dtype)
+        integral = (np.issubdtype(states.dtype, np.integer) and
+                    np.issubdtype(cells.dtype, np.integer))
+        if integral and states.min() >= 0 and states.max() < 2**16:
+            # count the states directly
+            self._states = states
+            self._size = int(states.max()) + 1
+            self._sorted = None
+        else:
+            # count the index of each state in the sorted states
+            self._sorted = np.sort(states)
+            self._states = np.searchsorted(self._sorted, states)
+            self._size = len(states)
+            self._index = np.empty(cells.shape, dtype=np.intp)
+
+    def update(self, generation, grid):
+        np.copyto(self._buffer, grid)
+        if self._sorted is None:
+            values = self._buffer.ravel()
+        else:
+            values = self._index.ravel()
+            values[:] = np.searchsorted(self._sorted, self._buffer.ravel())
+        counts = np.bincount(values, minlength=self._size)
+        self.counts[generation] = counts[self._states]
+
+    def result(self):
+        return self.counts
+
+
+class FirstGeneration(Observer):
+    """Record the first generation each cell is in a state
+
+    Example:
+        # the first generation any town cell is on fire
+        towns = FirstGeneration(STATE_FIRE, mask=initial == STATE_TOWN)
+        grid.run(observers=[towns], timeline=False)
+        towns.generation
+
+    Args:
+        state: the state to look for
+        mask (numpy.ndarray): boolean array of the cells to watch, None
+            watches every cell
+    """
+
+    def __init__(self, state, mask=None):
+        self.state = state
+        self.mask = mask
+        self.generations = None
+
+    def start(self, grid, num_generations):
+        shape = grid.current_cells().shape
+        # -1 for cells never seen in the state
+        self.generations = np.full(shape, -1, dtype=np.int64)
+        self._seen = np.zeros(shape, dtype=bool)
+        self._new = np.empty(shape, dtype=bool)
+        if self.mask is not None:
+            self._seen |= ~np.broadcast_to(np.asarray(self.mask, bool), shape)
+
+    def update(self, generation, grid):
+        np.equal(grid, self.state, out=self._new)
+        self._new &= ~self._seen
+        self.generations[self._new] = generation
+        self._seen |= self._new
+
+    @property
+    def generation(self):
+        """int: the first generation any watched cell was in the state,
+        None if none were"""
+        seen = self.generations[self.generations >= 0]
+        return int(seen.min()) if len(seen) else None
+
+    def result(self):
+        return self.generations
+
+
+class FrameSampler(Observer):
+    """Keep copies of the grid every k generations or when a trigger fires
+
+    Args:
+        every (int): generations between the frames kept, None keeps only
+            the frames the trigger fires on
+        trigger (function): called with the generation and grid, the frame
+            is kept if it returns True
+        limit (int): most frames to keep, None keeps every frame sampled
+    """
+
+    def __init__(self, every=None, trigger=None, limit=None):
+        if every is None and trigger is None:
+            raise ValueError("FrameSampler needs an interval or a trigger")
+        self.every = every
+        self.trigger = trigger
+        self.limit = limit
+        self.generations = []
+        self.frames = []
+
+    def update(self, generation, grid):
+        if self.limit is not None and len(self.frames) >= self.limit:
+            return
+        if ((self.every is not None and generation % self.every == 0) or
+                (self.trigger is not None and self.trigger(generation, grid))):
+            self.generations.append(generation)
+            self.frames.append(np.array(grid))
+
+    def result(self):
+        return self.frames
+
+
+class Reducer(Observer):
+    """Apply a function to the grid every generation and keep the results
+
+    Example:
+        fire = Reducer(lambda g: np.count_nonzero(g == STATE_FIRE))
+
+    Args:
+        func (function): called with the grid, returning the value to keep
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.generations = []
+        self.values = []
+
+    def update(self, generation, grid):
+        self.generations.append(generation)
+        self.values.append(self.func(grid))
+
+    def result(self):
+        return self.values
+
+
+class StopWhen(Observer):
+    """End the run once a condition holds
+
+    Example:
+        # stop once the fire has burnt out
+        StopWhen(lambda g: not np.any(g == STATE_FIRE))
+
+    Args:
+        condition (function): called with the grid, returning True to stop
+    """
+
+    def __init__(self, condition):
+        self.condition = condition
+        self.generation = None
+
+    def update(self, generation, grid):
+        if not self.done and self.condition(grid):
+            self.generation = generation
+            self.done = True
+
+
+class CycleDetector(Observer):
+    """End the run once the grid has reached a fixed point or a cycle
+
+    Note:
+        A hash of the cells is kept for each of the last window
+        generations, a cycle is found when the hash of a generation was
+        seen period generations before. With stochastic transition
+        functions a repeat may be chance, so the cycle must repeat for
+        confirm further periods before it is accepted.
+
+    Args:
+        window (int): the longest period looked for
+        confirm (int): further periods the cycle must repeat for
+        collect (bool): once found, carry on for one more period keeping a
+            copy of the cells of each generation of the cycle, so that
+            the rest of the run can be filled in without stepping
+
+    Attributes:
+        period (int): the period of the cycle found, 1 for a fixed point
+        generation (int): the generation the cycle was found at
+        cycle (list): with collect, the cells of the period generations
+            from generation
+    """
+
+    def __init__(self, window=100, confirm=1, collect=False):
+        self.window = window
+        self.confirm = confirm
+        self.collect = collect
+        self.period = None
+        self.generation = None
+        self.cycle = None
+
+    def start(self, grid, num_generations):
+        cells = grid.current_cells()
+        # a contiguous copy of the cells to hash
+        self._buffer = np.empty(cells.shape, dtype=cells.dtype)
+        # hash of each recent generation, and the latest generation of each
+        self._recent = deque()
+        self._seen = {}
+        self._candidate = None
+        self._repeats = 0
+
+    def update(self, generation, grid):
+        if self.done:
+            return
+        if self.period is not None:
+            # collecting the cycle
+            self.cycle.append(np.array(grid))
+            self.done = len(self.cycle) == self.period
+            return
+        np.copyto(self._buffer, grid)
+        digest = hashlib.blake2b(self._buffer, digest_size=16).digest()
+        previous = self._seen.get(digest)
+        if previous is None:
+            self._candidate = None
+            self._repeats = 0
+        else:
+            period = generation - previous
+            if period == self._candidate:
+                self._repeats += 1
+            else:
+                self._candidate = period
+                self._repeats = 1
+            if self._repeats > self.confirm * period:
+                self._found(generation, period, grid)
+                return
+        self._seen[digest] = generation
+        self._recent.append((generation, digest))
+        if len(self._recent) > self.window:
+            old, old_digest = self._recent.popleft()
+            if self._seen.get(old_digest) == old:
+                del self._seen[old_digest]
+
+    def _found(self, generation, period, grid):
+        self.period = period
+        self.generation = generation
+        self._recent.clear()
+        self._seen.clear()
+        if self.collect:
+            self.cycle = [np.array(grid)]
+            self.done = period == 1
+        else:
+            self.done = True
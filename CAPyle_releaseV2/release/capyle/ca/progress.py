@@ -0,0 +1,316 @@
+import os
+import sys
+import time
+import queue
+import threading
+import contextlib
+from collections import namedtuple
+
+# the progress of a run, sent to the progress sinks
+ProgressEvent = namedtuple('ProgressEvent',
+                           ['generation', 'total', 'elapsed', 'cells_per_sec'])
+
+
+class ProgressSink(object):
+    """Superclass of the sinks that show the progress of a run
+
+    Note:
+        update is called from the loop running the CA, so sinks must not
+        block in it. A sink that has to do its work on another thread,
+        like TkProgress, runs the CA on a worker thread in run
+
+        Setting cancelled to True, from any thread, ends the run after
+        the next frame is saved
+    """
+    # least seconds between the events sent to the sink
+    interval = 0.1
+    cancelled = False
+
+    def run(self, func):
+        """Run the CA by calling func, returning its result"""
+        return func()
+
+    def start(self, total):
+        """Called before the run with the number of generations"""
+        pass
+
+    def attach(self, timeline):
+        """Called before the run with the timeline the frames are saved
+        to, frames may be read from it as it grows (see Timeline.length)"""
+        pass
+
+    def update(self, event):
+        """Called with a ProgressEvent as the CA runs"""
+        pass
+
+    def finish(self, event):
+        """Called with the last ProgressEvent once the run has finished"""
+        pass
+
+
+class NullProgress(ProgressSink):
+    """Discards the progress of the run, eg. for batch runs"""
+    interval = float('inf')
+
+
+class TerminalProgress(ProgressSink):
+    """Shows the progress of the run as a line of text, redrawn in place
+
+    Args:
+        stream (file): the stream to write to, None writes to stderr
+        width (int): the width of the progress bar in characters
+    """
+    interval = 0.5
+
+    def __init__(self, stream=None, width=30):
+        self.stream = sys.stderr if stream is None else stream
+        self.width = width
+
+    def update(self, event):
+        done = int(self.width * event.generation / max(event.total, 1))
+        self.stream.write('\r[{bar}] {n}/{t} {rate:.3g} cells/s'.format(
+            bar='#' * done + ' ' * (self.width - done), n=event.generation,
+            t=event.total, rate=event.cells_per_sec))
+        self.stream.flush()
+
+    def finish(self, event):
+        self.update(event)
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class StreamProgress(ProgressSink):
+    """Keeps the timeline and latest progress of a run for another thread
+    to read while the run carries on, eg. to show frames as they are saved
+
+    Attributes:
+        timeline (Timeline): the timeline being saved to, None until the
+            run starts
+        event (ProgressEvent): the latest progress, None until reported
+        finished (bool): True once the run has ended
+    """
+    interval = 0.05
+
+    def __init__(self):
+        self.timeline = None
+        self.event = None
+        self.finished = False
+
+    def attach(self, timeline):
+        self.timeline = timeline
+
+    def update(self, event):
+        self.event = event
+
+    def finish(self, event):
+        self.event = event
+        self.finished = True
+
+
+class TkProgress(ProgressSink):
+    """Shows the progress of the run in a Tk window
+
+    Note:
+        The CA runs on a worker thread while this thread runs the Tk
+        event loop, the window reads the events from a queue so the CA
+        never waits on the window being redrawn
+    """
+    WINDOW_TITLE = 'Running...'
+    MAX_WIDTH = 200
+    HEIGHT = 20
+    # milliseconds between reading the queue
+    POLL_MS = 50
+
+    def __init__(self):
+        import tkinter as tk
+        self.root = tk.Tk()
+        # set title
+        self.root.wm_title(self.WINDOW_TITLE)
+        # lift to top layer
+        self.root.lift()
+        self.root.attributes('-topmost', True)
+        self.root.after_idle(self.root.attributes, '-topmost', False)
+        # disable close
+        self.root.protocol('WM_DELETE_WINDOW', lambda: None)
+
+        self.progress_canvas = tk.Canvas(self.root, height=self.HEIGHT,
+                                         width=self.MAX_WIDTH)
+        self.bar = self.progress_canvas.create_rectangle(
+            0, 0, 0, self.HEIGHT, fill="blue")
+        self.progress_canvas.pack()
+        self._queue = queue.Queue()
+
+    def run(self, func):
+        result = {}
+
+        def work():
+            try:
+                result['value'] = func()
+            except BaseException as e:
+                result['error'] = e
+            finally:
+                # tell the window the run has ended
+                self._queue.put(None)
+
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        self.root.after(self.POLL_MS, self._poll)
+        self.root.mainloop()
+        worker.join()
+        if 'error' in result:
+            raise result['error']
+        return result.get('value')
+
+    def update(self, event):
+        self._queue.put(event)
+
+    def finish(self, event):
+        self._queue.put(event)
+
+    def _poll(self):
+        """Draw the latest event in the queue, closing the window once the
+        run has ended"""
+        latest, ended = None, False
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                ended = True
+            else:
+                latest = event
+        if ended:
+            self.root.destroy()
+            return
+        if latest is not None:
+            w = int(self.MAX_WIDTH * latest.generation / max(latest.total, 1))
+            self.progress_canvas.coords(self.bar, 0, 0, w, self.HEIGHT)
+        self.root.after(self.POLL_MS, self._poll)
+
+
+class ProgressReporter(object):
+    """Turns the generations reached by a run into ProgressEvents for a
+    sink, at most one every sink.interval seconds
+
+    Args:
+        sink (ProgressSink): where to send the events
+        total (int): the number of generations in the run
+        cells (int): the number of cells stepped each generation
+    """
+
+    def __init__(self, sink, total, cells):
+        self.sink = sink
+        self.total = total
+        self.cells = cells
+        self.start_time = None
+        self.last_time = None
+        self.first_generation = 0
+
+    def run(self, func, first_generation=0, timeline=None):
+        """Run the CA by calling func with the sink (see ProgressSink.run)
+
+        Args:
+            func (function): runs the CA, calling update and finish
+            first_generation (int): the generation the run starts from
+            timeline (Timeline): the timeline the frames are saved to
+        """
+        self.first_generation = first_generation
+        self.start_time = self.last_time = time.perf_counter()
+        self.sink.start(self.total)
+        if timeline is not None:
+            self.sink.attach(timeline)
+        return self.sink.run(func)
+
+    @property
+    def cancelled(self):
+        """bool: True if the sink has asked for the run to end"""
+        return self.sink.cancelled
+
+    def event(self, generation):
+        """Return the ProgressEvent for the generation"""
+        elapsed = time.perf_counter() - self.start_time
+        stepped = (generation - self.first_generation) * self.cells
+        rate = stepped / elapsed if elapsed > 0 else 0.0
+        return ProgressEvent(generation, self.total, elapsed, rate)
+
+    def update(self, generation):
+        """Report that the run has reached the generation"""
+        now = time.perf_counter()
+        if now - self.last_time < self.sink.interval:
+            return
+        self.last_time = now
+        self.sink.update(self.event(generation))
+
+    def finish(self, generation):
+        """Report that the run has ended at the generation"""
+        self.sink.finish(self.event(generation))
+
+
+# the progress setting of the grids run on each thread (see
+# thread_progress), wrapped in a tuple as None is a valid setting
+_thread = threading.local()
+
+
+@contextlib.contextmanager
+def thread_progress(show_progress):
+    """Show the progress of grids run on this thread inside the context as
+    given, in place of Grid.show_progress, unless set on the grid itself
+
+    Args:
+        show_progress: a Grid.show_progress setting
+    """
+    previous = getattr(_thread, 'setting', None)
+    _thread.setting = (show_progress,)
+    try:
+        yield
+    finally:
+        _thread.setting = previous
+
+
+def current_progress(default):
+    """Return the progress setting of this thread (see thread_progress),
+    or default outside thread_progress"""
+    setting = getattr(_thread, 'setting', None)
+    return default if setting is None else setting[0]
+
+
+def progress_sink(show_progress):
+    """Return the sink for a Grid.show_progress setting
+
+    Args:
+        show_progress: False for no progress, 'tk' or 'terminal', a
+            ProgressSink, or True for a Tk window if there is a display,
+            otherwise the terminal if stderr is one, otherwise nothing
+
+    Returns:
+        ProgressSink: the sink to report the progress of a run to
+    """
+    if isinstance(show_progress, ProgressSink):
+        return show_progress
+    if show_progress is None or show_progress is False:
+        return NullProgress()
+    if show_progress == 'tk':
+        return TkProgress()
+    if show_progress == 'terminal':
+        return TerminalProgress()
+    if show_progress is not True:
+        raise ValueError("Invalid progress setting {p}".format(
+            p=show_progress))
+    if _has_display():
+        try:
+            return TkProgress()
+        except Exception:
+            # no tkinter, or it could not open a window
+            pass
+    if sys.stderr is not None and sys.stderr.isatty():
+        return TerminalProgress()
+    return NullProgress()
+
+
+def _has_display():
+    """Return False if there is certainly no display to open a window on"""
+    if sys.platform.startswith('linux') or 'bsd' in sys.platform:
+        return bool(os.environ.get('DISPLAY') or
+                    os.environ.get('WAYLAND_DISPLAY'))
+    return True
@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def mode_downsample(grid):
+    """Halve a grid in each dimension, each cell taking the most common
+    state of the 2x2 block it covers (ties go to the top left-most)
+
+    Note:
+        Odd rows and columns are padded by repeating the last one
+
+    Args:
+        grid (numpy.ndarray): the 2D grid to downsample
+
+    Returns:
+        numpy.ndarray: the downsampled grid, of shape ceil(grid.shape / 2)
+    """
+    rows, cols = grid.shape
+    if rows % 2 or cols % 2:
+        grid = np.pad(grid, ((0, rows % 2), (0, cols % 2)), mode='edge')
+    a, b = grid[0::2, 0::2], grid[0::2, 1::2]
+    c, d = grid[1::2, 0::2], grid[1::2, 1::2]
+    ab, ac, ad = a == b, a == c, a == d
+    bc, bd, cd = b == c, b == d, c == d
+    out = a.copy()
+    # number of other cells in the block equal to each cell
+    best = ab.astype(np.int8) + ac + ad
+    for cells, count in ((b, ab.astype(np.int8) + bc + bd),
+                         (c, ac.astype(np.int8) + bc + cd),
+                         (d, ad.astype(np.int8) + bd + cd)):
+        better = count > best
+        out[better] = cells[better]
+        np.maximum(best, count, out=best)
+    return out
+
+
+class FramePyramid(object):
+    """Mode downsampled levels of the frames of a timeline, computed a
+    tile at a time when first needed and cached
+
+    Level 0 is the frame itself and each level halves the one below it
+    (see mode_downsample). A tile of a level is built from the four tiles
+    below it, so viewing a region only ever computes the tiles covering
+    that region.
+
+    Example:
+        pyramid = timeline.pyramid()
+        # frame 10, rows 0-4000 and columns 0-4000, for an 800x800 view
+        cells = pyramid.view(10, (0, 4000, 0, 4000), (800, 800))
+
+    Note:
+        The cache is guarded by a lock, as frames are invalidated by the
+        thread running the CA (see Timeline.__setitem__) while the GUI
+        thread reads tiles. Tiles are computed outside the lock, and not
+        cached if a frame was invalidated meanwhile
+
+    Args:
+        frames: the frames, eg. a Timeline, indexed by frame number
+        tile_size (int): the rows and columns of each tile
+        max_tiles (int): the most tiles kept in the cache
+    """
+
+    def __init__(self, frames, tile_size=256, max_tiles=1024):
+        self.frames = frames
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        # counts the invalidations, so tiles computed from a frame that
+        # was invalidated while computing them are not cached
+        self._invalidations = 0
+        # the shape of each level, level 0 being the frame shape
+        shape = tuple(np.asarray(frames[0]).shape)
+        self.shapes = [shape]
+        while max(shape) > 1:
+            shape = ((shape[0] + 1) // 2, (shape[1] + 1) // 2)
+            self.shapes.append(shape)
+
+    @property
+    def num_levels(self):
+        return len(self.shapes)
+
+    def level_for(self, cells_per_pixel):
+        """Return the highest level with at most cells_per_pixel level 0
+        cells per cell, the level to view at that zoom"""
+        if cells_per_pixel < 2:
+            return 0
+        level = int(np.floor(np.log2(cells_per_pixel)))
+        return min(level, self.num_levels - 1)
+
+    def invalidate(self, frame=None):
+        """Drop the cached tiles of a frame, eg. after it is rewritten,
+        or of every frame if frame is None"""
+        with self._lock:
+            self._invalidations += 1
+            if frame is None:
+                self._tiles.clear()
+                return
+            for key in [k for k in self._tiles if k[0] == frame]:
+                del self._tiles[key]
+
+    def region(self, frame, level, rows, cols):
+        """Return the cells of a region of a level
+
+        Args:
+            frame (int): the frame number
+            level (int): the level
+            rows (tuple): the first and last + 1 rows of the region
+            cols (tuple): the first and last + 1 columns of the region
+
+        Returns:
+            numpy.ndarray: the cells of the region
+        """
+        r0, r1 = rows
+        c0, c1 = cols
+        if level == 0:
+            return np.asarray(self.frames[frame])[r0:r1, c0:c1]
+        t = self.tile_size
+        out = None
+        for ty in range(r0 // t, -(-r1 // t)):
+            for tx in range(c0 // t, -(-c1 // t)):
+                tile = self.tile(frame, level, ty, tx)
+                # the part of the tile in the region
+                y0, y1 = max(r0, ty * t), min(r1, ty * t + tile.shape[0])
+                x0, x1 = max(c0, tx * t), min(c1, tx * t + tile.shape[1])
+                if out is None:
+                    out = np.empty((r1 - r0, c1 - c0), dtype=tile.dtype)
+                out[y0 - r0:y1 - r0, x0 - c0:x1 - c0] = \
+                    tile[y0 - ty * t:y1 - ty * t, x0 - tx * t:x1 - tx * t]
+        return out
+
+    def tile(self, frame, level, ty, tx):
+        """Return a tile of a level (above 0), computing it from the level
+        below if it is not cached"""
+        key = frame, level, ty, tx
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+            invalidations = self._invalidations
+        t = self.tile_size
+        rows, cols = self.shapes[level - 1]
+        below = self.region(frame, level - 1,
+                            (2 * ty * t, min(2 * (ty + 1) * t, rows)),
+                            (2 * tx * t, min(2 * (tx + 1) * t, cols)))
+        tile = mode_downsample(below)
+        with self._lock:
+            if invalidations == self._invalidations:
+                self._tiles[key] = tile
+                if len(self._tiles) > self.max_tiles:
+                    self._tiles.popitem(last=False)
+        return tile
+
+    def view(self, frame, view, max_shape):
+        """Return the cells to show a region of a frame in at most
+        max_shape pixels, at the level matching the zoom
+
+        Args:
+            frame (int): the frame number
+            view (tuple): the first and last + 1 rows and columns of the
+                region in level 0 cells, (row0, row1, col0, col1)
+            max_shape (tuple): the most rows and columns to return
+
+        Returns:
+            numpy.ndarray: the cells of the region at that level, no
+                larger than twice max_shape in each dimension
+        """
+        r0, r1, c0, c1 = view
+        level = self.level_for(max((r1 - r0) / max_shape[0],
+                                   (c1 - c0) / max_shape[1]))
+        scale = 2 ** level
+        rows, cols = self.shapes[level]
+        return self.region(frame, level,
+                           (r0 // scale, min(-(-r1 // scale), rows)),
+                           (c0 // scale, min(-(-c1 // scale), cols)))
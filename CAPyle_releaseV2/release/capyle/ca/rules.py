@@ -0,0 +1,398 @@
+import itertools
+import threading
+import numpy as np
+from capyle.utils import accepts_keyword
+
+# largest rule table that will be created
+MAX_TABLE_SIZE = 2**24
+
+
+class TableRule(object):
+    """A 1D rule for a k state CA with a radius r neighbourhood, given as a
+    table of the new state of the center cell for every neighbourhood
+
+    Note:
+        The states must be 0 to k-1. Each neighbourhood is read as a base k
+        number with the leftmost cell the most significant digit, as in
+        Wolfram's numbering, and that number indexes the table.
+
+        Can be passed to Grid1D in place of a transition function, in
+        which case the index of every cell is built in one vectorised pass
+        over the row and the table applied by fancy indexing.
+
+    Example:
+        # 3 state, radius 1 rule with a random table
+        rule = TableRule(np.random.randint(0, 3, 27), num_states=3)
+        Grid1D(config, rule)
+
+    Args:
+        table (numpy.ndarray): the new state for each neighbourhood index
+        num_states (int): the number of states k
+        radius (int): the number of cells either side of the center r
+    """
+
+    def __init__(self, table, num_states=2, radius=1):
+        self.num_states = int(num_states)
+        self.radius = int(radius)
+        self.table = np.asarray(table, dtype=np.min_scalar_type(
+            self.num_states - 1))
+        if len(self.table) != self.table_size():
+            raise ValueError(
+                "Rule table has {n} entries, {k} states and radius {r} "
+                "requires {s}".format(n=len(self.table), k=self.num_states,
+                                      r=self.radius, s=self.table_size()))
+        self.index_dtype = np.min_scalar_type(len(self.table) - 1)
+
+    @classmethod
+    def from_number(cls, rule_num, num_states=2, radius=1):
+        """Create the rule from its rule number, whose base k digits are
+        the table with the least significant digit first
+
+        Example:
+            TableRule.from_number(30) is elementary rule 30
+        """
+        rule = cls.__new__(cls)
+        rule.num_states, rule.radius = num_states, radius
+        rule_num = int(rule_num)
+        table = np.zeros(rule.table_size(), dtype=int)
+        for i in range(len(table)):
+            rule_num, table[i] = divmod(rule_num, num_states)
+        return cls(table, num_states, radius)
+
+    def table_size(self):
+        """Return the number of possible neighbourhood indices"""
+        size = self.num_states ** (2 * self.radius + 1)
+        if size > MAX_TABLE_SIZE:
+            raise ValueError(
+                "Rule table for {k} states and radius {r} is too large"
+                .format(k=self.num_states, r=self.radius))
+        return size
+
+    def index(self, neighbourstates):
+        """Return the table index of each cell from the states of its
+        neighbourhood, leftmost first"""
+        index = np.zeros(np.shape(neighbourstates[0]), dtype=self.index_dtype)
+        for states in neighbourstates:
+            index *= self.num_states
+            index += np.asarray(states, dtype=self.index_dtype)
+        return index
+
+    def index_row(self, row, weights, out):
+        """Calculate the table index of each cell of a row in place
+
+        Args:
+            row (numpy.ndarray): the row including radius wrapping cells at
+                either end
+            weights (numpy.ndarray): bool for each neighbourhood position,
+                False positions are treated as state 0
+            out (numpy.ndarray): the index_dtype array to write to
+        """
+        n = len(out)
+        out.fill(0)
+        for j, w in enumerate(weights):
+            np.multiply(out, self.num_states, out=out)
+            if w:
+                np.add(out, row[j:j + n], out=out)
+        return out
+
+    def __call__(self, grid, neighbourstates, neighbourcounts=None,
+                 out=None):
+        """Transition function applying the rule to the current row"""
+        table = self.table if out is None else self.table.astype(out.dtype)
+        return np.take(table, self.index(neighbourstates), out=out)
+
+
+class TotalisticRule(TableRule):
+    """A 1D totalistic rule, the new state of a cell depends only on the
+    sum of the states in its neighbourhood (including the cell itself)
+
+    Note:
+        The states must be 0 to k-1. The table has an entry for each sum
+        from 0 to (2r+1)(k-1).
+
+    Example:
+        # Wolfram's 3 state totalistic code 1635
+        TotalisticRule.from_number(1635, num_states=3)
+
+    Args:
+        See TableRule
+    """
+
+    def table_size(self):
+        return (2 * self.radius + 1) * (self.num_states - 1) + 1
+
+    def index(self, neighbourstates):
+        index = np.zeros(np.shape(neighbourstates[0]), dtype=self.index_dtype)
+        for states in neighbourstates:
+            index += np.asarray(states, dtype=self.index_dtype)
+        return index
+
+    def index_row(self, row, weights, out):
+        n = len(out)
+        out.fill(0)
+        for j, w in enumerate(weights):
+            if w:
+                np.add(out, row[j:j + n], out=out)
+        return out
+
+
+class CountRule(object):
+    """A 2D rule given as a table of the new state for every cell state and
+    every vector of neighbour counts, usually built by compile_rule
+
+    Note:
+        The counts of each cell (as from Grid2D.count_neighbours) are
+        ranked in the combinatorial number system, so the table has one
+        entry per possible count vector rather than a dense entry for every
+        count of every state. Neighbours in none of the states (eg. the
+        border of a grid that does not wrap) make up the difference between
+        the counts and num_neighbours.
+
+        If probabilities are given, the new state is drawn from them with a
+        single random number per cell, rather than looked up. The numbers
+        are taken from the uniforms argument, which a grid draws from its
+        seeded generator (see Grid.random_kwargs).
+
+    Args:
+        states (tuple): the states of the CA
+        num_neighbours (int): the number of neighbours of each cell
+        table (numpy.ndarray): (number of states, number of count vectors)
+            array of the new state, see rank
+        probabilities (numpy.ndarray): (number of states, number of count
+            vectors, number of states) array of the probability of moving
+            to each state, in place of the table
+    """
+
+    def __init__(self, states, num_neighbours, table=None,
+                 probabilities=None):
+        self.states = np.asarray(states)
+        self.num_neighbours = int(num_neighbours)
+        k, n = len(self.states), self.num_neighbours
+        # binomial[j, x] = x choose j + 1, the rank of a count vector is
+        # the sum over the states of binomial[j, cumulative count + j]
+        self.binomial = np.zeros((k, n + k + 1), dtype=np.intp)
+        for j in range(k):
+            for x in range(n + k + 1):
+                self.binomial[j, x] = _choose(x, j + 1)
+        self.num_counts = _choose(n + k, k)
+        if k * self.num_counts > MAX_TABLE_SIZE:
+            raise ValueError(
+                "Rule table for {k} states and {n} neighbours is too large"
+                .format(k=k, n=n))
+        self.table = None if table is None else np.asarray(table)
+        self.cumulative = None
+        if probabilities is not None:
+            self.cumulative = np.cumsum(probabilities, axis=-1)
+        # sorted states, to find the index of the state of each cell
+        self._order = np.argsort(self.states, kind='stable')
+        self._sorted = self.states[self._order]
+        # states 0 to k-1 are their own index
+        self._identity = np.array_equal(self.states, np.arange(k))
+        # intermediate arrays reused for each grid shape, kept per thread
+        # so that bands of a grid can be stepped in parallel, and freed
+        # with the thread
+        self._scratch = threading.local()
+        # the table cast to the dtype of the out array last given
+        self._flat = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # the intermediate arrays are not saved, and a thread local cannot
+        # be pickled
+        del state['_scratch']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._scratch = threading.local()
+
+    def _buffers(self, shape):
+        """Return the intermediate arrays, of the calling thread, for a grid
+        of the given shape"""
+        buffers = getattr(self._scratch, 'buffers', None)
+        if buffers is None:
+            buffers = self._scratch.buffers = {}
+        if shape not in buffers:
+            buffers[shape] = tuple(np.empty(shape, dtype=np.intp)
+                                   for i in range(4))
+        return buffers[shape]
+
+    def rank(self, neighbourcounts, out=None):
+        """Return the index of the count vector of each cell, from 0 to
+        num_counts - 1"""
+        shape = np.shape(neighbourcounts[0])
+        cumulative, position = self._buffers(shape)[:2]
+        rank = np.empty(shape, dtype=np.intp) if out is None else out
+        cumulative.fill(0)
+        rank.fill(0)
+        for j, counts in enumerate(neighbourcounts):
+            np.add(cumulative, counts, out=cumulative, casting='unsafe')
+            np.add(cumulative, j, out=position)
+            np.take(self.binomial[j], position, out=position, mode='clip')
+            np.add(rank, position, out=rank)
+        return rank
+
+    def state_index(self, grid):
+        """Return the index in states of the state of each cell"""
+        if self._identity:
+            return grid
+        index = np.searchsorted(self._sorted, grid)
+        np.minimum(index, len(self.states) - 1, out=index)
+        return self._order[index]
+
+    @property
+    def stochastic(self):
+        """bool: True if the new states are drawn from probabilities, so
+        grids pass the rule uniform random numbers"""
+        return self.cumulative is not None
+
+    def __call__(self, grid, neighbourstates, neighbourcounts, out=None,
+                 uniforms=None):
+        """Transition function applying the rule to the grid, writing the
+        new states to out if given, and drawing them from the uniform
+        random numbers in [0, 1) of each cell if the rule is stochastic
+        (from numpy.random if None)"""
+        state = self.state_index(grid)
+        if self.cumulative is None:
+            # index of each cell in the flattened table
+            rank, index = self._buffers(np.shape(grid))[2:]
+            np.multiply(state, np.intp(self.num_counts), out=index,
+                        casting='unsafe')
+            np.add(index, self.rank(neighbourcounts, out=rank), out=index)
+            if out is None:
+                return self.table.ravel()[index]
+            if self._flat is None or self._flat.dtype != out.dtype:
+                self._flat = self.table.ravel().astype(out.dtype)
+            return np.take(self._flat, index, out=out, mode='clip')
+        rank = self.rank(neighbourcounts)
+        # draw the new state from the cumulative probabilities
+        if uniforms is None:
+            uniforms = np.random.random(np.shape(grid))
+        new = (uniforms[..., None] >= self.cumulative[state, rank]).sum(axis=-1)
+        np.minimum(new, len(self.states) - 1, out=new)
+        if out is None:
+            return self.states[new]
+        return np.take(self.states.astype(out.dtype), new, out=out,
+                       mode='clip')
+
+
+def compile_rule(transition_func, states, num_neighbours,
+                 additional_args=(), samples=None, rng=None):
+    """Compile a 2D transition function into a CountRule by applying it
+    once to every cell state with every possible vector of neighbour counts
+
+    Note:
+        The transition function must depend only on the state of each cell
+        and its neighbour counts, a function that uses the neighbour states
+        raises a ValueError.
+
+        A function that gives different results when probed twice is
+        stochastic, and raises a ValueError unless samples is given, in
+        which case the probability of each new state is estimated by
+        probing the function that many times. If the function takes an rng
+        or uniforms argument (see Grid.random_kwargs) the probes are passed
+        rng or numbers drawn from it, so the estimate is seeded.
+
+    Example:
+        rule = compile_rule(transition_func, config.states, 8,
+                            (probabilities,), samples=1000)
+        Grid2D(config, rule)
+
+    Args:
+        transition_func (function): the transition function
+        states (tuple): the states of the CA
+        num_neighbours (int): the number of neighbours of each cell
+        additional_args (tuple): any additional arguments to pass to the
+            transition function
+        samples (int): for stochastic rules, the number of times to probe
+        rng: a numpy Generator, or a seed for one, for the probes
+
+    Returns:
+        CountRule: the compiled rule
+    """
+    rule = CountRule(states, num_neighbours)
+    k, n = len(rule.states), rule.num_neighbours
+    counts = _count_vectors(k, n)
+    numcounts = counts.shape[1]
+    # every state with every count vector, as a single row of cells
+    grid = np.repeat(rule.states, numcounts)[None, :]
+    neighbourcounts = np.tile(counts, k)[:, None, :]
+    index = (np.repeat(np.arange(k), numcounts),
+             rule.rank(neighbourcounts[:, 0]))
+
+    rng = np.random.default_rng(rng)
+    takes_rng = accepts_keyword(transition_func, 'rng')
+    takes_uniforms = accepts_keyword(transition_func, 'uniforms')
+
+    def probe():
+        kwargs = {}
+        if takes_rng:
+            kwargs['rng'] = rng
+        if takes_uniforms:
+            kwargs['uniforms'] = rng.random(grid.shape)
+        new = transition_func(grid.copy(), _NoNeighbourStates(),
+                              neighbourcounts.copy(), *additional_args,
+                              **kwargs)
+        new = np.broadcast_to(np.asarray(new), grid.shape)[0]
+        if not np.all(np.isin(new, rule.states)):
+            raise ValueError("Transition function returned a value that "
+                             "is not one of the states")
+        return np.asarray(rule.state_index(new), dtype=np.intp)
+
+    first = probe()
+    if samples is None:
+        if not np.array_equal(probe(), first):
+            raise ValueError("Transition function is not deterministic, "
+                             "give the number of samples to compile it")
+        rule.table = np.empty((k, numcounts), dtype=rule.states.dtype)
+        rule.table[index] = rule.states[first]
+        return rule
+
+    frequencies = np.zeros((k * numcounts, k))
+    frequencies[np.arange(k * numcounts), first] += 1
+    for i in range(int(samples) - 1):
+        frequencies[np.arange(k * numcounts), probe()] += 1
+    probabilities = np.empty((k, numcounts, k))
+    probabilities[index] = frequencies / frequencies.sum(axis=1)[:, None]
+    rule.cumulative = np.cumsum(probabilities, axis=-1)
+    return rule
+
+
+class _NoNeighbourStates(np.lib.mixins.NDArrayOperatorsMixin):
+    """Stand in for the neighbour states while compiling a rule, any use
+    raises a ValueError"""
+
+    def _fail(self, *args, **kwargs):
+        raise ValueError("Transition functions that use the neighbour "
+                         "states cannot be compiled")
+
+    __getitem__ = __iter__ = __len__ = __array__ = _fail
+    __array_ufunc__ = __array_function__ = _fail
+    __getattr__ = _fail
+
+
+def _count_vectors(num_states, num_neighbours):
+    """Return every vector of num_states counts summing to at most
+    num_neighbours, as a (num_states, number of vectors) array"""
+    vectors = []
+    total = num_neighbours + num_states
+    # the bar positions of each composition of the neighbours into the
+    # states and one extra part
+    for bars in itertools.combinations(range(total), num_states):
+        previous = -1
+        counts = []
+        for b in bars:
+            counts.append(b - previous - 1)
+            previous = b
+        vectors.append(counts)
+    return np.array(vectors, dtype=np.intp).T.reshape(num_states, -1)
+
+
+def _choose(n, k):
+    """Binomial coefficient, 0 if k > n"""
+    if k > n:
+        return 0
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
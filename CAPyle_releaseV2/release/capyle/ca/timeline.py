@@ -0,0 +1,208 @@
+import os
+import json
+import numpy as np
+from capyle.ca import FramePyramid
+
+
+class Timeline(object):
+    """The grid state for each generation of a run
+
+    Frames are written into a single preallocated array, either in memory
+    or memory mapped from a file with a small header, in which case frames
+    are only read from disk when they are indexed and the memory used does
+    not grow with the number of generations.
+
+    File format:
+        MAGIC, the offset of the frames as an 8 byte and the length of the
+        header as a 4 byte little endian integer, and a JSON header (frame
+        shape, dtype, states, number of frames allocated and written,
+        metadata), padded with zeros up to the frames at the offset, a
+        multiple of ALIGNMENT. The raw frames follow in C order
+    """
+    MAGIC = b'CAPYLETL'
+    ALIGNMENT = 512
+
+    def __init__(self, num_frames, frame_shape, dtype=np.float64,
+                 states=None, path=None):
+        """Allocate a timeline for num_frames frames
+
+        Args:
+            num_frames (int): the number of frames to allocate
+            frame_shape (tuple): the shape of the grid stored in each frame
+            dtype (numpy.dtype): the dtype of the frames
+            states (tuple): the states of the CA
+            path (str): file to store the frames in, if None the frames
+                are kept in memory
+        """
+        shape = (num_frames,) + tuple(frame_shape)
+        self.states = states
+        self.path = path
+        # number of frames written so far
+        self.length = 0
+        # details of the run, eg. a cycle it stopped on
+        self.metadata = {}
+        self._pyramid = None
+        if path is None:
+            self.frames = np.empty(shape, dtype=dtype)
+        else:
+            # remove rather than overwrite any previous timeline, so that
+            # anything still mapping the old file is left untouched
+            if os.path.isfile(path):
+                os.remove(path)
+            self._offset = self._data_offset(
+                len(self._header(shape, np.dtype(dtype))))
+            self.frames = np.memmap(path, dtype=dtype, mode='w+',
+                                    offset=self._offset, shape=shape)
+            self._write_header()
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """Open a timeline stored in a file, frames are read on demand
+
+        Args:
+            path (str): the timeline file
+            mode (str): 'r' for read only or 'r+' to allow writing
+
+        Returns:
+            Timeline: the timeline stored in the file
+        """
+        with open(path, 'rb') as f:
+            prefix = f.read(len(cls.MAGIC) + 12)
+            if not prefix.startswith(cls.MAGIC):
+                raise ValueError("{p} is not a timeline file".format(p=path))
+            start = len(cls.MAGIC)
+            offset = int.from_bytes(prefix[start:start + 8], 'little')
+            size = int.from_bytes(prefix[start + 8:start + 12], 'little')
+            info = json.loads(f.read(size).decode('utf-8'))
+        shape = (info['num_frames'],) + tuple(info['frame_shape'])
+
+        timeline = cls.__new__(cls)
+        timeline.states = info['states']
+        if timeline.states is not None:
+            timeline.states = tuple(timeline.states)
+        timeline.path = path
+        timeline.length = info['length']
+        timeline.metadata = info.get('metadata', {})
+        timeline._pyramid = None
+        timeline._offset = offset
+        timeline.frames = np.memmap(path, dtype=np.dtype(info['dtype']),
+                                    mode=mode, offset=offset, shape=shape)
+        return timeline
+
+    def _header(self, shape, dtype):
+        """Return the header, without the offset and length before it"""
+        states = self.states
+        if states is not None:
+            states = [s.item() if hasattr(s, 'item') else s for s in states]
+        return json.dumps({
+            'frame_shape': list(shape[1:]),
+            'dtype': dtype.str,
+            'states': states,
+            'num_frames': shape[0],
+            'length': self.length,
+            'metadata': self.metadata,
+        }).encode('utf-8')
+
+    @classmethod
+    def _data_offset(cls, size):
+        """Return the offset of the frames for a header of the given size,
+        leaving room for it to double, eg. as metadata is added"""
+        size = 2 * (len(cls.MAGIC) + 12 + size)
+        return -(-size // cls.ALIGNMENT) * cls.ALIGNMENT
+
+    def _write_header(self):
+        """Write the header to the start of the timeline file, moving the
+        frames further on first if it has outgrown the space before them"""
+        info = self._header(self.frames.shape, self.frames.dtype)
+        if len(self.MAGIC) + 12 + len(info) > self._offset:
+            self._move_frames(self._data_offset(len(info)))
+        header = (self.MAGIC + self._offset.to_bytes(8, 'little') +
+                  len(info).to_bytes(4, 'little') + info)
+        with open(self.path, 'r+b') as f:
+            f.write(header.ljust(self._offset, b'\0'))
+
+    def _move_frames(self, offset):
+        """Rewrite the timeline file with the frames at a later offset
+
+        Note:
+            The frames are written to a new file which replaces the old
+            one, so anything still mapping the old file is left untouched
+        """
+        self.frames.flush()
+        temp = self.path + '.tmp'
+        frames = np.memmap(temp, dtype=self.frames.dtype, mode='w+',
+                           offset=offset, shape=self.frames.shape)
+        frames[:self.length] = self.frames[:self.length]
+        frames.flush()
+        os.replace(temp, self.path)
+        self.frames = frames
+        self._offset = offset
+
+    def flush(self):
+        """Write any frames still in memory and the header to the file"""
+        if self.path is not None:
+            self.frames.flush()
+            self._write_header()
+
+    def pyramid(self, tile_size=256, max_tiles=1024):
+        """Return the downsampled levels of the frames, for viewing
+        large grids zoomed out (see pyramid.FramePyramid)
+
+        Note:
+            The pyramid is created on first use and kept with the timeline,
+            the arguments only apply then
+        """
+        if self._pyramid is None:
+            self._pyramid = FramePyramid(self, tile_size, max_tiles)
+        return self._pyramid
+
+    @property
+    def array(self):
+        """numpy.ndarray: all the frames written so far as one array"""
+        return self.frames[:self.length]
+
+    @property
+    def frame_shape(self):
+        return self.frames.shape[1:]
+
+    @property
+    def dtype(self):
+        return self.frames.dtype
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self.frames[i]
+
+    def __getitem__(self, i):
+        return self.array[i]
+
+    def __setitem__(self, i, frame):
+        """Write frame i, frames must be written in order"""
+        if i > self.length:
+            raise IndexError("Frame {i} written before frame {n}".format(
+                i=i, n=self.length))
+        self.frames[i] = frame
+        self.length = max(self.length, i + 1)
+        if self._pyramid is not None:
+            self._pyramid.invalidate(i)
+
+    def __reduce__(self):
+        # file backed timelines are pickled as just their path
+        if self.path is not None:
+            self.flush()
+            return (Timeline.open, (self.path,))
+        return (_timeline_from_array, (np.asarray(self.array), self.states,
+                                       self.metadata))
+
+
+def _timeline_from_array(frames, states=None, metadata=None):
+    """Create an in memory timeline holding the given frames"""
+    timeline = Timeline(len(frames), frames.shape[1:], frames.dtype, states)
+    timeline.frames[:] = frames
+    timeline.length = len(frames)
+    if metadata is not None:
+        timeline.metadata = dict(metadata)
+    return timeline
@@ -4,7 +4,7 @@ import tkinter.font as tkFont
 import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from capyle.utils import (set_icon, get_filename_dialog, get_logo,
-                          prerun_ca, run_ca, extract_states)
+                          prerun_ca, start_ca, finish_ca, extract_states)
 from capyle.ca import CAConfig
 from capyle.guicomponents import (_ConfigFrame, _CAGraph, _ScreenshotUI,
                                   _CreateCA, _AboutWindow)
@@ -15,6 +15,10 @@ class Display(object):
     WINDOW_TITLE = "CAPyLE"
     ROOT_PATH = sys.path[0]
     CA_PATH = ROOT_PATH + "/ca_descriptions/"
+    RUN_TEXT = "Apply configuration & run CA"
+    CANCEL_TEXT = "Cancel run"
+    # milliseconds between checking a run for new frames
+    POLL_DELAY = 50
 
     def __init__(self):
         """Initialise the main GUI
@@ -35,6 +39,8 @@ class Display(object):
         self.add_frames()
 
         self.ca_graph = None
+        # the run in progress, if any
+        self.background_run = None
 
         # play back control variables and UI
         self.playback_controls = _PlaybackControls(self)
@@ -54,6 +60,7 @@ class Display(object):
         """Function to add a menubar to the root window"""
         self.menubar = tk.Menu(self.root)
         file_menu = tk.Menu(self.menubar, tearoff=0)
+        self.file_menu = file_menu
         self.menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="New", command=_CreateCA)
         file_menu.add_command(label="Open", command=lambda: self.load_ca(
@@ -140,8 +147,7 @@ class Display(object):
         if self.lbotframe is not None:
             self.lbotframe.destroy()
         self.lbotframe = tk.Frame(self.lframe)
-        self.btn_run = tk.Button(self.lbotframe,
-                                 text="Apply configuration & run CA",
+        self.btn_run = tk.Button(self.lbotframe, text=self.RUN_TEXT,
                                  command=self.run_ca)
         self.btn_run.pack(side=tk.BOTTOM, pady=10)
         self.lbotframe.pack(fill=tk.BOTH, expand=True)
@@ -161,6 +167,10 @@ class Display(object):
         Args:
             filepath (str): Full path to the CA description py file
         """
+        # the description being run may read sys.argv, which the prerun
+        # would change under it (see runner._run_main)
+        if self.background_run is not None:
+            return
         if not filepath == '':
             # loads the ca into the program with a default config
             # removes previous graph
@@ -182,35 +192,78 @@ class Display(object):
     def run_ca(self):
         """Run the loaded CA passing in the config from GUI
 
-        Running the CA with run_ca returns the new CAConfig object
-        and the Timeline. Timeline loaded by calling self.load_timeline
+        The CA runs on a worker thread and its frames are shown as they
+        are saved, see poll_run. Once it has ended the new CAConfig object
+        is loaded
         Note:
             The config may overwritten in the CA description
         """
+        if self.background_run is not None:
+            return
         # update config object with values from gui
         self.ca_config, valid = self.config_ui.get_config(self.ca_config,
                                                           validate=True)
         if valid:
-            # runs ca with config, returns config and timeline
-            self.ca_config, timeline = run_ca(self.ca_config)
-            if self.ca_config is None or timeline is None:
-                return
-            # if no states saved, takes best guess
-            if self.ca_config.states is None:
-                self.ca_config.states = extract_states(timeline)
+            # runs ca with config on a worker thread
+            self.background_run = start_ca(self.ca_config)
+            self.streaming = False
+            self.set_file_menu(tk.DISABLED)
+            self.btn_run.config(text=self.CANCEL_TEXT,
+                                command=self.background_run.cancel)
+            self.root.after(self.POLL_DELAY, self.poll_run)
+
+    def set_file_menu(self, state):
+        """Enable or disable New and Open, which are disabled while a CA
+        is run"""
+        for label in ("New", "Open"):
+            self.file_menu.entryconfig(label, state=state)
+
+    def poll_run(self):
+        """Show any new frames from the run in progress, loading the
+        timeline and config once the run has ended"""
+        run = self.background_run
+        timeline = run.timeline
+        if (timeline is not None and len(timeline) > 0 and
+                self.ca_config.states is not None):
+            if not self.streaming:
+                # show the first frame as soon as it is saved
+                self.streaming = True
+                self.load_timeline(timeline, streaming=True)
+            else:
+                self.playback_controls.extend(len(timeline) - 1)
+        if not run.done:
+            self.root.after(self.POLL_DELAY, self.poll_run)
+            return
+
+        self.background_run = None
+        self.set_file_menu(tk.NORMAL)
+        self.btn_run.config(text=self.RUN_TEXT, command=self.run_ca)
+        ca_config, timeline = finish_ca(run)
+        if ca_config is None or timeline is None:
+            return
+        self.ca_config = ca_config
+        # if no states saved, takes best guess
+        if self.ca_config.states is None:
+            self.ca_config.states = extract_states(timeline)
+        if self.streaming and timeline is self.ca_graph.timeline:
+            self.playback_controls.extend(len(timeline) - 1,
+                                          streaming=False)
+        else:
             # loads in timeline
             self.load_timeline(timeline)
-            # Updates config with updated user defined config from running CA &
-            # Adds the state colours UI and sets the colour map accordingly
-            self.config_ui.update(self.ca_config, self.ca_graph)
+        # Updates config with updated user defined config from running CA &
+        # Adds the state colours UI and sets the colour map accordingly
+        self.config_ui.update(self.ca_config, self.ca_graph)
 
-    def load_timeline(self, timeline):
+    def load_timeline(self, timeline, streaming=False):
         """Load a timeline into the GUI and display on the graph
 
         Also enables playback and screenshot UI controls.
 
         Args:
-            timeline (np.ndarray): The grid state for each timestep
+            timeline (Timeline): The grid state for each timestep
+            streaming (bool): True if frames are still being added to the
+                timeline by a run
         """
         # Create graph from timeline
         self.ca_graph = _CAGraph(timeline, self.ca_config.states,
@@ -221,11 +274,13 @@ class Display(object):
                                            master=self.rcframe)
         self.rcframe.config(borderwidth=5, relief=tk.GROOVE)
         self.ca_canvas.get_tk_widget().pack(padx=0, pady=0)
+        self.ca_graph.enable_navigation()
         if self.ca_config.state_colors is not None:
             self.ca_graph.set_colormap(self.ca_config.state_colors)
 
         maxframe = len(self.ca_graph.timeline) - 1
         self.update_controls(maxframe)
+        self.playback_controls.streaming = streaming
 
         # enable screenshotting
         self.screenshotui.set(graph=self.ca_graph, title=self.ca_config.title)
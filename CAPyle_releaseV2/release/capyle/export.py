@@ -0,0 +1,343 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+# the most colours an indexed GIF or PNG frame can have
+MAX_COLORS = 256
+
+
+class ColorIndexer(object):
+    """Maps the states of a grid to indices into a table of at most 256
+    colours, the colours the palette gives the states
+
+    Args:
+        palette (Palette): the palette the frames are coloured through
+
+    Attributes:
+        colors (numpy.ndarray): uint8 array of shape (n, 3), the colour
+            of each index
+    """
+
+    def __init__(self, palette):
+        self.palette = palette
+        if len(palette.lut) <= MAX_COLORS:
+            # the lookup table of the palette already fits
+            self._table = np.arange(len(palette.lut), dtype=np.uint8)
+            self.colors = palette.lut
+        else:
+            if len(palette.states) > MAX_COLORS:
+                raise ValueError("Cannot export more than {n} states".format(
+                    n=MAX_COLORS))
+            # one index for each state, rather than each entry in the table
+            used = palette.indices(np.asarray(palette.states))
+            self._table = np.zeros(len(palette.lut), dtype=np.uint8)
+            self._table[used] = np.arange(len(used))
+            self.colors = palette.lut[used]
+
+    def __call__(self, grid):
+        """Return the uint8 colour index of each cell of the grid"""
+        return np.take(self._table, self.palette.indices(grid), mode='clip')
+
+
+def changed_box(previous, image):
+    """Return the smallest (row0, row1, col0, col1) region holding every
+    pixel that differs between two images, at least one pixel"""
+    changed = previous != image
+    rows = np.flatnonzero(changed.any(axis=1))
+    if len(rows) == 0:
+        return 0, 1, 0, 1
+    cols = np.flatnonzero(changed.any(axis=0))
+    return rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+
+class FrameWriter(object):
+    """Superclass of the writers that frames are streamed to by
+    export_timeline, one at a time, so only one frame is held at once
+
+    Args:
+        path (str): the file or directory to write to
+        shape (tuple): the rows and columns of every frame
+        colors (numpy.ndarray): uint8 array of shape (n, 3), the colour of
+            each index in the frames
+        num_frames (int): the number of frames that will be written
+        fps (float): frames per second to play the animation at
+    """
+
+    def __init__(self, path, shape, colors, num_frames, fps):
+        self.path = path
+        self.shape = tuple(shape)
+        self.colors = np.asarray(colors, dtype=np.uint8)
+        self.num_frames = num_frames
+        self.fps = fps
+
+    def write(self, image):
+        """Write the next frame, a uint8 array of colour indices"""
+        raise NotImplementedError
+
+    def close(self):
+        """Finish the file once every frame has been written"""
+        pass
+
+
+class GifWriter(FrameWriter):
+    """Writes an animated GIF, looping forever
+
+    Note:
+        After the first frame only the region that changed since the
+        previous frame is written, which for most CAs is a small part of
+        the grid
+    """
+
+    def __init__(self, path, shape, colors, num_frames, fps):
+        FrameWriter.__init__(self, path, shape, colors, num_frames, fps)
+        # bits per colour index, at least 2 as GIF requires
+        self.bits = max(int(np.ceil(np.log2(max(len(self.colors), 2)))), 2)
+        self.delay = int(round(100.0 / fps))
+        self._previous = None
+        self._file = open(path, 'wb')
+        rows, cols = self.shape
+        table = np.zeros((2 ** self.bits, 3), dtype=np.uint8)
+        table[:len(self.colors)] = self.colors
+        # header, screen descriptor with a global colour table, then loop
+        self._file.write(b'GIF89a' + struct.pack(
+            '<HHBBB', cols, rows, 0xf0 | (self.bits - 1), 0, 0))
+        self._file.write(table.tobytes())
+        self._file.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+    def write(self, image):
+        rows, cols = image.shape
+        r0, r1, c0, c1 = 0, rows, 0, cols
+        if self._previous is not None:
+            r0, r1, c0, c1 = changed_box(self._previous, image)
+        self._previous = image
+        # graphic control: keep the previous frame under the next
+        self._file.write(b'\x21\xf9\x04\x04' +
+                         struct.pack('<H', self.delay) + b'\x00\x00')
+        self._file.write(b'\x2c' + struct.pack('<HHHHB', c0, r0, c1 - c0,
+                                               r1 - r0, 0))
+        self._file.write(struct.pack('B', self.bits))
+        data = lzw_encode(image[r0:r1, c0:c1].tobytes(), self.bits)
+        # in sub-blocks of at most 255 bytes
+        for i in range(0, len(data), 255):
+            block = data[i:i + 255]
+            self._file.write(struct.pack('B', len(block)) + block)
+        self._file.write(b'\x00')
+
+    def close(self):
+        self._file.write(b'\x3b')
+        self._file.close()
+
+
+def lzw_encode(data, min_code_size):
+    """Compress bytes of colour indices with the variable length LZW
+    coding used by GIF
+
+    Args:
+        data (bytes): the colour indices, each less than 2**min_code_size
+        min_code_size (int): the bits per colour index
+
+    Returns:
+        bytes: the codes, packed least significant bit first
+    """
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    # bits waiting to be written, and how many there are
+    acc, nbits = clear, min_code_size + 1
+    size = min_code_size + 1
+    next_code = end + 1
+    codes = {}
+    if not data:
+        acc |= end << nbits
+        nbits += size
+        return bytes(acc.to_bytes((nbits + 7) // 8, 'little'))
+    prefix = data[0]
+    for byte in data[1:]:
+        key = prefix << 8 | byte
+        code = codes.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        acc |= prefix << nbits
+        nbits += size
+        if next_code < 4096:
+            codes[key] = next_code
+            next_code += 1
+            if next_code > 1 << size:
+                size += 1
+        else:
+            # the table is full, start again
+            acc |= clear << nbits
+            nbits += size
+            codes.clear()
+            next_code = end + 1
+            size = min_code_size + 1
+        while nbits >= 8:
+            out.append(acc & 0xff)
+            acc >>= 8
+            nbits -= 8
+        prefix = byte
+    acc |= prefix << nbits
+    nbits += size
+    if next_code == 1 << size and size < 12:
+        # the reader widens its codes on the entry for the last prefix
+        size += 1
+    acc |= end << nbits
+    nbits += size
+    while nbits > 0:
+        out.append(acc & 0xff)
+        acc >>= 8
+        nbits -= 8
+    return bytes(out)
+
+
+def png_chunk(kind, data):
+    """Return a PNG chunk of the given type, eg. b'IDAT'"""
+    return (struct.pack('>I', len(data)) + kind + data +
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def png_data(image, level=6):
+    """Return the compressed scanlines of an image of colour indices"""
+    rows = np.zeros((image.shape[0], image.shape[1] + 1), dtype=np.uint8)
+    # the first byte of each scanline is its filter, none
+    rows[:, 1:] = image
+    return zlib.compress(rows.tobytes(), level)
+
+
+def _png_header(shape, colors):
+    """Return the IHDR and PLTE chunks of an indexed PNG"""
+    rows, cols = shape
+    return (png_chunk(b'IHDR', struct.pack('>IIBBBBB', cols, rows, 8, 3,
+                                           0, 0, 0)),
+            png_chunk(b'PLTE', np.asarray(colors, np.uint8).tobytes()))
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class ApngWriter(FrameWriter):
+    """Writes an animated PNG, looping forever
+
+    Note:
+        As with GifWriter, after the first frame only the region that
+        changed since the previous frame is written
+    """
+
+    def __init__(self, path, shape, colors, num_frames, fps):
+        FrameWriter.__init__(self, path, shape, colors, num_frames, fps)
+        self._previous = None
+        # each fcTL and fdAT chunk has the next sequence number
+        self._sequence = 0
+        self._file = open(path, 'wb')
+        ihdr, plte = _png_header(self.shape, self.colors)
+        self._file.write(PNG_SIGNATURE + ihdr)
+        self._file.write(png_chunk(b'acTL', struct.pack('>II', num_frames,
+                                                        0)))
+        self._file.write(plte)
+
+    def write(self, image):
+        rows, cols = image.shape
+        r0, r1, c0, c1 = 0, rows, 0, cols
+        first = self._previous is None
+        if not first:
+            r0, r1, c0, c1 = changed_box(self._previous, image)
+        self._previous = image
+        # delay of 1000/fps thousandths of a second, keep the previous
+        # frame and draw over it
+        self._file.write(png_chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', self._sequence, c1 - c0, r1 - r0, c0, r0,
+            int(round(1000.0 / self.fps)), 1000, 0, 0)))
+        self._sequence += 1
+        data = png_data(image[r0:r1, c0:c1])
+        if first:
+            self._file.write(png_chunk(b'IDAT', data))
+        else:
+            self._file.write(png_chunk(b'fdAT', struct.pack(
+                '>I', self._sequence) + data))
+            self._sequence += 1
+
+    def close(self):
+        self._file.write(png_chunk(b'IEND', b''))
+        self._file.close()
+
+
+class PngSequenceWriter(FrameWriter):
+    """Writes each frame to its own PNG in a directory, named by its
+    position in the sequence, eg. frame_00000.png"""
+    FILENAME = "frame_{n:05d}.png"
+
+    def __init__(self, path, shape, colors, num_frames, fps):
+        FrameWriter.__init__(self, path, shape, colors, num_frames, fps)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._header = PNG_SIGNATURE + b''.join(_png_header(self.shape,
+                                                            self.colors))
+        self._count = 0
+
+    def write(self, image):
+        filepath = os.path.join(self.path,
+                                self.FILENAME.format(n=self._count))
+        with open(filepath, 'wb') as f:
+            f.write(self._header)
+            f.write(png_chunk(b'IDAT', png_data(image)))
+            f.write(png_chunk(b'IEND', b''))
+        self._count += 1
+
+
+# the writer for each file extension, any other path being a directory
+WRITERS = {
+    '.gif': GifWriter,
+    '.png': ApngWriter,
+    '.apng': ApngWriter,
+}
+
+
+def export_timeline(timeline, path, palette, start=0, stop=None, step=1,
+                    fps=10, scale=1):
+    """Export the frames of a timeline as an animation
+
+    Frames are read from the timeline, coloured and written one at a
+    time, so long timelines (including file backed timelines larger than
+    memory) are exported without holding more than one frame
+
+    Example:
+        palette = Palette(config.states, config.state_colors)
+        # every other frame of the first 1000
+        export_timeline(timeline, 'fire.gif', palette, stop=1000, step=2)
+
+    Args:
+        timeline: the frames, eg. a Timeline, indexed by frame number
+        path (str): an animated GIF (.gif) or PNG (.png, .apng), any other
+            path is a directory to write a PNG of each frame to
+        palette (Palette): the colours of the states
+        start, stop, step (int): the frames to export, as a slice
+        fps (float): frames per second to play the animation at
+        scale (int): pixels per cell in each dimension
+
+    Returns:
+        int: the number of frames written
+    """
+    frames = range(len(timeline))[start:stop:step]
+    if len(frames) == 0:
+        raise ValueError("No frames to export")
+    if scale < 1 or fps <= 0:
+        raise ValueError("scale must be at least 1 and fps positive")
+    indexer = ColorIndexer(palette)
+    shape = np.asarray(timeline[frames[0]]).shape
+    if len(shape) != 2:
+        raise ValueError("Frames must be 2D to export")
+    extension = os.path.splitext(path)[1].lower()
+    writer_class = WRITERS.get(extension, PngSequenceWriter)
+    writer = writer_class(path, (shape[0] * scale, shape[1] * scale),
+                          indexer.colors, len(frames), fps)
+    try:
+        for i in frames:
+            image = indexer(np.asarray(timeline[i]))
+            if scale > 1:
+                image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+            writer.write(image)
+    finally:
+        writer.close()
+    return len(frames)
@@ -7,13 +7,26 @@ from matplotlib.figure import Figure
 from matplotlib import colors
 from matplotlib import pyplot as plt
 import numpy as np
+from capyle.render import Palette, Downsampler
+from capyle.ca import FramePyramid
 
 class _CAGraph(object):
     # increase for high res displays
     GRAPH_SIZE = [8, 8]
 
     def __init__(self, data, states, sequence=False, placeholder=False):
-        """Create a matplotlib graph within a tkinter canvas"""
+        """Create a matplotlib graph within a tkinter canvas
+
+        Note:
+            Grids are drawn as RGB images coloured through a Palette and
+            sampled down to the size of the canvas in pixels, and once the
+            figure has been drawn a new frame only redraws the image
+            (blitting) rather than the whole figure
+
+            Timelines are drawn from their pyramid of downsampled frames
+            (see Timeline.pyramid), so drawing a frame zoomed out or in
+            (see zoom and pan) only reads the cells needed for the pixels
+        """
         # get grid size from file
         try:
             with open(sys.path[0] + "/config.txt", "r") as f:
@@ -25,42 +38,174 @@ class _CAGraph(object):
         except:
             custom_size = self.GRAPH_SIZE
 
+        # the figure behind the image, saved once drawn, for blitting
+        self._background = None
+        self._draw_cid = None
+        self._drag = None
+        self.data = None
+        # the frame of the timeline shown, None if given the data
+        self.frame = None
+        self.pyramid = None
         if placeholder:
             self.fig = plt.Figure(frameon=False)
         else:
             if sequence:
                 self.timeline = data
+                self.frame = 0
+                if hasattr(self.timeline, 'pyramid'):
+                    self.pyramid = self.timeline.pyramid()
+                else:
+                    self.pyramid = FramePyramid(self.timeline)
                 data = self.timeline[0]
+            data = np.asarray(data)
             self.fig = plt.Figure(frameon=False)
             self.fig.set_size_inches(custom_size)
-            ax = self.fig.add_axes([0, 0, 1, 1])
-            ax.axis('off')
-            self.mat = ax.matshow(data, cmap='gray', interpolation='none',
-                                  vmin=states[0], vmax=states[-1])
+            self.ax = self.fig.add_axes([0, 0, 1, 1])
+            self.ax.axis('off')
+            self.states = states
+            self.palette = Palette(states)
+            width, height = self.fig.get_size_inches() * self.fig.dpi
+            # the most cells shown in each dimension, one per pixel
+            self.max_shape = (height, width)
+            self.data = data
+            self.shape = data.shape
+            # the region of the grid shown (row0, row1, col0, col1)
+            self.view = (0, self.shape[0], 0, self.shape[1])
+            # the extent is in cells however far the image is sampled down
+            self.mat = self.ax.imshow(
+                self._image(), interpolation='nearest', aspect='equal',
+                extent=self._extent())
+
+    def _image(self):
+        """Return the RGB image to show for the data in the view"""
+        r0, r1, c0, c1 = self.view
+        if self.frame is not None:
+            cells = self.pyramid.view(self.frame, self.view, self.max_shape)
+        else:
+            cells = np.asarray(self.data)[r0:r1, c0:c1]
+        return self.palette(Downsampler(cells.shape, self.max_shape)(cells))
+
+    def _extent(self):
+        r0, r1, c0, c1 = self.view
+        return (c0 - 0.5, c1 - 0.5, r1 - 0.5, r0 - 0.5)
 
     def clear(self):
         """Clear the graph"""
         self.fig.clf()
+        self._background = None
 
     def update(self, i):
         """Set the graph data to be the timepoint specified"""
-        self.mat.set_data(self.timeline[i])
+        self.frame = int(i)
+        self.data = self.timeline[i]
+        self.mat.set_data(self._image())
 
     def setdata(self, data):
         """Set the data displayed on the graph"""
-        self.mat.set_data(data)
+        self.frame = None
+        self.data = data
+        self.mat.set_data(self._image())
+
+    def set_view(self, view):
+        """Show a region of the grid
+
+        Args:
+            view (tuple): the first and last + 1 rows and columns of the
+                region, (row0, row1, col0, col1)
+        """
+        rows, cols = self.shape
+        r0, r1, c0, c1 = (int(round(x)) for x in view)
+        r0, c0 = min(max(r0, 0), rows - 1), min(max(c0, 0), cols - 1)
+        r1, c1 = min(max(r1, r0 + 1), rows), min(max(c1, c0 + 1), cols)
+        self.view = r0, r1, c0, c1
+        self.mat.set_extent(self._extent())
+        self.ax.set_xlim(c0 - 0.5, c1 - 0.5)
+        self.ax.set_ylim(r1 - 0.5, r0 - 0.5)
+        self.mat.set_data(self._image())
+        # the image may cover other pixels now, so draw it all
+        self._background = None
+        self.refresh()
+
+    def zoom(self, factor, row, col):
+        """Zoom in by a factor (out if below 1) keeping a cell still
+
+        Args:
+            factor (float): the factor to zoom by
+            row (float): the row of the cell to keep still
+            col (float): the column of the cell to keep still
+        """
+        rows, cols = self.shape
+        r0, r1, c0, c1 = self.view
+        # the same factor both ways keeps the aspect of the view
+        factor = max(factor, max((r1 - r0) / rows, (c1 - c0) / cols))
+        height, width = (r1 - r0) / factor, (c1 - c0) / factor
+        top = row - (row - r0) / factor
+        left = col - (col - c0) / factor
+        top = min(max(top, 0), rows - height)
+        left = min(max(left, 0), cols - width)
+        self.set_view((top, top + height, left, left + width))
+
+    def pan(self, drows, dcols):
+        """Move the view by a number of rows and columns"""
+        rows, cols = self.shape
+        r0, r1, c0, c1 = self.view
+        drows = min(max(drows, -r0), rows - r1)
+        dcols = min(max(dcols, -c0), cols - c1)
+        self.set_view((r0 + drows, r1 + drows, c0 + dcols, c1 + dcols))
+
+    def enable_navigation(self):
+        """Zoom with the scroll wheel and pan by dragging with the right
+        mouse button"""
+        canvas = self.fig.canvas
+        canvas.mpl_connect('scroll_event', self._on_scroll)
+        canvas.mpl_connect('button_press_event', self._on_press)
+        canvas.mpl_connect('motion_notify_event', self._on_motion)
+        canvas.mpl_connect('button_release_event', self._on_release)
+
+    def _on_scroll(self, event):
+        if event.inaxes is self.ax:
+            self.zoom(1.25 ** event.step, event.ydata + 0.5,
+                      event.xdata + 0.5)
+
+    def _on_press(self, event):
+        if event.inaxes is self.ax and event.button == 3:
+            self._drag = event.ydata, event.xdata
+
+    def _on_motion(self, event):
+        if self._drag is not None and event.inaxes is self.ax:
+            row, col = self._drag
+            self.pan(row - event.ydata, col - event.xdata)
+
+    def _on_release(self, event):
+        self._drag = None
 
     def refresh(self):
-        """Redraw the graph"""
-        self.fig.canvas.draw()
+        """Redraw the graph, only the image if the rest of the figure
+        has been drawn before"""
+        canvas = self.fig.canvas
+        if self._draw_cid is None:
+            # save the background whenever the whole figure is drawn
+            self._draw_cid = canvas.mpl_connect('draw_event', self._on_draw)
+        if self._background is None or not canvas.supports_blit:
+            canvas.draw()
+            return
+        canvas.restore_region(self._background)
+        self.ax.draw_artist(self.mat)
+        canvas.blit(self.ax.bbox)
+
+    def _on_draw(self, event):
+        """Save the drawn axes to blit new images over, each image covers
+        the same pixels as the last so it is never seen behind them"""
+        self._background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
 
     def set_colormap(self, cmap_ls):
-        """Set the colormap of the matplotlib graph"""
-        cm = colors.LinearSegmentedColormap.from_list(
-            'Custom', cmap_ls, N=len(cmap_ls))
-        self.mat.set_cmap(cm)
+        """Set the colours of the states shown on the graph"""
+        self.palette = Palette(self.states, cmap_ls)
+        self.mat.set_data(self._image())
         self.refresh()
 
     def screenshot(self, filepath):
         """Save an image of the current graph display"""
         self.fig.savefig(filepath, bbox_inches='tight')
+        # saving draws the figure at another size, so draw it all next time
+        self._background = None
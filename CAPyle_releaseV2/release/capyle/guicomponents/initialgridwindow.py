@@ -3,7 +3,7 @@ import tkinter.font as tkFont
 import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from capyle.ca import randomise1d, randomise2d
-from capyle.utils import (rgb_to_hex, clip_numeric, scale_array,
+from capyle.utils import (rgb_to_hex, clip_numeric, scale_array, state_dtype,
                           set_icon, set_entry, clear_entry)
 from capyle.guicomponents import _Separator, _CAGraph
 
@@ -21,10 +21,11 @@ class _EditInitialGridWindow(tk.Toplevel):
         self.update_config(ca_config)
 
         # 1d check
+        dtype = state_dtype(self.ca_config.states)
         if self.ca_config.dimensions == 1:
-            self.grid = np.empty((1, self.ca_config.grid_dims[1]))
+            self.grid = np.empty((1, self.ca_config.grid_dims[1]), dtype=dtype)
         else:
-            self.grid = np.empty(self.ca_config.grid_dims)
+            self.grid = np.empty(self.ca_config.grid_dims, dtype=dtype)
         self.grid.fill(self.ca_config.states[0])
 
         # Display each colour on the grid to
@@ -1,6 +1,7 @@
 import sys
 import tkinter as tk
-from capyle.utils import screenshot, set_entry, get_dir_dialog
+from capyle.utils import (screenshot, export_animation, set_entry,
+                          get_dir_dialog)
 
 
 class _ScreenshotUI(tk.Frame):
@@ -30,7 +31,11 @@ class _ScreenshotUI(tk.Frame):
                              command=self.take)
         btn_take.pack()
 
-        self.uielements = [btn_take]
+        btn_export = tk.Button(self, text="Export animation",
+                               command=self.export)
+        btn_export.pack()
+
+        self.uielements = [btn_take, btn_export]
 
         self.disable()
 
@@ -63,3 +68,13 @@ class _ScreenshotUI(tk.Frame):
             else:
                 msg = "Error supplied path does not exist."
             self.l_saved.config(text=msg)
+
+    def export(self):
+        if self.ca_graph is not None:
+            filename = export_animation(self.ca_graph, self.title,
+                                        self.getdir())
+            if filename is not None:
+                msg = "Saved to: " + filename
+            else:
+                msg = "Error supplied path does not exist."
+            self.l_saved.config(text=msg)
@@ -20,6 +20,8 @@ class _PlaybackControls():
         self.current_frame = 0
         self.maxframe = 0
         self.loop = False
+        # True while frames are still being added to the timeline
+        self.streaming = False
         # Create playback UI
         self.ui = _PlaybackUI(self.display.rtopframe, self)
 
@@ -71,6 +73,9 @@ class _PlaybackControls():
             if self.current_frame < self.maxframe:
                 # if frame has next
                 self.current_frame += 1
+            elif self.streaming:
+                # wait at the last frame for the next to arrive
+                pass
             elif self.current_frame == self.maxframe and self.loop:
                 self.current_frame = 0
             else:
@@ -120,6 +125,22 @@ class _PlaybackControls():
         """Set the text on the play/pause button to the current play state"""
         self.ui.set_playing(self.playing)
 
+    def extend(self, maxframe, streaming=True):
+        """Allow frames up to a new maxframe as they are added to the
+        timeline by a run, without changing the play state
+
+        Args:
+            maxframe (int): The new maximum frame in the timeline
+            streaming (bool): False once no more frames will be added
+        """
+        self.streaming = streaming
+        if maxframe == self.maxframe:
+            return
+        self.maxframe = maxframe
+        self.ui.scrubbing_slider.config(to=maxframe)
+        if self.current_frame < maxframe:
+            self.ui.enable_widget(self.ui.btns[2])
+
     def refresh(self, maxframe):
         """Refresh the whole object by resetting the play state and
         setting a new maxframe when the timeline changes
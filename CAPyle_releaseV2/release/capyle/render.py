@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class Palette(object):
+    """Maps the states of a grid to RGB colours through a lookup table,
+    matching the colours the CA graph shows for the states
+
+    Note:
+        States are coloured as by a matplotlib colormap of the state
+        colours, normalised between the first and last state, or in
+        grayscale if there are no state colours
+
+    Args:
+        states (tuple): the states of the CA, in order
+        state_colors (list): an (r, g, b) colour for each state, each
+            channel between 0 and 1, None for grayscale
+    """
+
+    def __init__(self, states, state_colors=None):
+        self.states = np.asarray(states)
+        vmin, vmax = float(self.states[0]), float(self.states[-1])
+        if state_colors is None:
+            state_colors = [(x, x, x) for x in np.linspace(0, 1, 256)]
+        colors = np.asarray(state_colors, dtype=np.float64)[:, :3]
+        n = len(colors)
+        span = vmax - vmin if vmax != vmin else 1.0
+
+        integral = np.issubdtype(self.states.dtype, np.integer)
+        if integral and self.states.max() - self.states.min() < 2**16:
+            # a table indexed by state value, offset by the smallest state
+            self._offset = int(self.states.min())
+            values = np.arange(self._offset, int(self.states.max()) + 1)
+            self._sorted = None
+        else:
+            # a table indexed by the position in the sorted states
+            self._offset = 0
+            self._sorted = np.sort(self.states)
+            values = self._sorted
+        index = np.clip(((values - vmin) / span * n).astype(int), 0, n - 1)
+        self.lut = np.round(colors[index] * 255).astype(np.uint8)
+
+    def indices(self, grid):
+        """Return the index into the lookup table of each cell"""
+        if self._sorted is not None:
+            return np.searchsorted(self._sorted, grid)
+        if not np.issubdtype(grid.dtype, np.integer):
+            # eg. a float grid of whole number states
+            grid = np.rint(grid).astype(np.intp)
+        if self._offset:
+            return grid.astype(np.intp) - self._offset
+        return grid
+
+    def __call__(self, grid, out=None):
+        """Return the RGB image of the grid
+
+        Args:
+            grid (numpy.ndarray): the states of the cells
+            out (numpy.ndarray): uint8 array of shape grid.shape + (3,) to
+                write the image to
+
+        Returns:
+            numpy.ndarray: the image, of shape grid.shape + (3,)
+        """
+        return np.take(self.lut, self.indices(grid), axis=0, out=out,
+                       mode='clip')
+
+
+def sample_indices(size, max_size):
+    """Return the indices of at most max_size evenly spaced cells out of
+    size, every cell if size is at most max_size"""
+    if size <= max_size:
+        return np.arange(size)
+    return (np.arange(max_size) * size) // max_size
+
+
+class Downsampler(object):
+    """Samples grids down to at most a given shape, eg. the size of the
+    canvas in pixels, so that drawing a frame costs time proportional to
+    the pixels rather than the cells
+
+    Args:
+        shape (tuple): the shape of the grids
+        max_shape (tuple): the largest shape to sample them down to
+    """
+
+    def __init__(self, shape, max_shape):
+        self.shape = tuple(shape)
+        self.rows = sample_indices(shape[0], max(int(max_shape[0]), 1))
+        self.cols = sample_indices(shape[1], max(int(max_shape[1]), 1))
+        self.identity = (len(self.rows) == shape[0] and
+                         len(self.cols) == shape[1])
+        self._index = np.ix_(self.rows, self.cols)
+
+    def __call__(self, grid):
+        """Return the cells sampled from the grid"""
+        if self.identity:
+            return grid
+        return grid[self._index]
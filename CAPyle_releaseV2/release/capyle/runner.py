@@ -0,0 +1,286 @@
+import os
+import sys
+import copy
+import contextlib
+import threading
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from capyle.ca import CAConfig, StreamProgress, thread_progress
+from capyle.utils import accepts_keyword
+
+# description modules imported in this process, keyed by absolute path
+_descriptions = {}
+# worker process used for isolated runs, created on first use
+_worker = None
+# the store of the description being run on each thread, the objects it
+# saves keyed by path, so they can be handed back without a round trip
+# through disk, and the paths in it that are never written to disk
+_local = threading.local()
+
+
+def current_store():
+    """Return the store of the description being run in process on this
+    thread (None if there is no such run) and the paths that are kept in
+    memory only"""
+    return (getattr(_local, 'store', None),
+            getattr(_local, 'memory_only', ()))
+
+
+@contextlib.contextmanager
+def in_process_store(objects=None, memory_only=()):
+    """Keep objects saved with utils.save inside the context in memory so
+    that utils.load can return them without reading them back from disk
+
+    Args:
+        objects (dict): objects to preload into the store, keyed by path
+        memory_only (tuple): paths that are not written to disk at all
+
+    Note:
+        The store is only seen by the thread that entered the context, so
+        descriptions can be run on several threads at once
+
+    Yields:
+        dict: the store, holding every object saved during the context
+    """
+    previous = current_store()
+    store = dict(objects) if objects is not None else {}
+    _local.store, _local.memory_only = store, tuple(memory_only)
+    try:
+        yield store
+    finally:
+        _local.store, _local.memory_only = previous
+
+
+def load_description(filepath):
+    """Import a CA description file as a module, once per process
+
+    Note:
+        The module is imported again if the file has been modified
+        since it was last imported
+
+    Args:
+        filepath (str): Full path to the CA description py file
+
+    Returns:
+        module: The imported description
+    """
+    path = os.path.abspath(filepath)
+    mtime = os.path.getmtime(path)
+    if path in _descriptions and _descriptions[path][0] == mtime:
+        return _descriptions[path][1]
+    name = "_capyle_description_{n}".format(n=len(_descriptions))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _descriptions[path] = mtime, module
+    return module
+
+
+def _run_main(filepath, args, progress):
+    """Invoke the main function of the description as if it had been
+    run from the command line with the given arguments
+
+    Note:
+        The arguments are passed to main if it takes an args argument,
+        eg. main(args=None) reading sys.argv[1:] if args is None. Otherwise
+        sys.argv is set for the call, which is seen by every thread, so
+        such descriptions must not be run while another is being run
+    """
+    module = load_description(filepath)
+    argv = sys.argv
+    takes_args = accepts_keyword(module.main, 'args')
+    if not takes_args:
+        sys.argv = [filepath] + list(args)
+    try:
+        with thread_progress(progress):
+            if takes_args:
+                module.main(args=list(args))
+            else:
+                module.main()
+    except SystemExit as e:
+        # setup exits once the config is saved when prerunning
+        if e.code not in (None, 0):
+            raise
+    finally:
+        if not takes_args:
+            sys.argv = argv
+
+
+def prerun(filepath, ca_config=None):
+    """Run the setup function of a CA description in this process
+
+    Args:
+        filepath (str): Full path to the CA description py file
+        ca_config (CAConfig): The config to pass to the description,
+            if None a default config is created
+
+    Returns:
+        CAConfig: The config updated by the description with any
+            remaining values filled in with defaults
+    """
+    if ca_config is None:
+        ca_config = CAConfig(filepath)
+    # the description works on a copy, as it would in its own process
+    ca_config = copy.copy(ca_config)
+    with in_process_store({ca_config.path: ca_config}) as store:
+        _run_main(filepath, [ca_config.path, '0'], progress=False)
+    ca_config = store[ca_config.path]
+    ca_config.fill_in_defaults()
+    return ca_config
+
+
+def run_description(filepath, ca_config=None, isolated=False,
+                    progress=False):
+    """Run a CA description and collect the config and timeline
+
+    The description is imported once and its main function is run in
+    this process, the timeline it saves is handed back directly rather
+    than pickled to disk.
+
+    Args:
+        filepath (str): Full path to the CA description py file
+        ca_config (CAConfig): The config to run with, if None the
+            description is prerun to create one
+        isolated (bool): run in a separate worker process, protecting this
+            process from crashes or global state in the description
+        progress: how to show the progress of the run, see
+            Grid.show_progress, for the grids run on this thread
+
+    Returns:
+        CAConfig: The config after being updated by the description
+        numpy.ndarray: Array containing the grid state for each time step
+    """
+    if ca_config is None:
+        ca_config = prerun(filepath)
+    if isolated:
+        return _run_isolated(filepath, ca_config)
+    ca_config = copy.copy(ca_config)
+    preload = {ca_config.path: ca_config}
+    with in_process_store(preload, (ca_config.timeline_path,)) as store:
+        _run_main(filepath, [ca_config.path], progress)
+    return store[ca_config.path], store.get(ca_config.timeline_path)
+
+
+def run(filepath, ca_config=None, isolated=False):
+    """Run a CA description without the GUI and return its timeline
+
+    Example:
+        timeline = capyle.run('ca_descriptions/gol_2d.py', config)
+
+    Args:
+        filepath (str): Full path to the CA description py file
+        ca_config (CAConfig): The config to run with, if None the
+            description is prerun to create one
+        isolated (bool): run in a separate worker process
+
+    Returns:
+        numpy.ndarray: Array containing the grid state for each time step
+    """
+    ca_config, timeline = run_description(filepath, ca_config, isolated)
+    return timeline
+
+
+class BackgroundRun(object):
+    """Run a CA description on a worker thread, the frames can be read
+    from the timeline as they are saved
+
+    Example:
+        run = BackgroundRun('ca_descriptions/gol_2d.py', config)
+        while not run.done:
+            frames_so_far = len(run.timeline or ())
+        ca_config, timeline = run.join()
+
+    Args:
+        filepath (str): Full path to the CA description py file
+        ca_config (CAConfig): The config to run with
+        progress (StreamProgress): the sink the run reports to, None
+            creates one
+    """
+
+    def __init__(self, filepath, ca_config, progress=None):
+        self.progress = StreamProgress() if progress is None else progress
+        # the config and timeline once the run has ended
+        self.result = None, None
+        # the exception raised by the description, if any
+        self.error = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(filepath, ca_config),
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, filepath, ca_config):
+        try:
+            self.result = run_description(filepath, ca_config,
+                                          progress=self.progress)
+        except Exception as e:
+            self.error = e
+
+    @property
+    def timeline(self):
+        """Timeline: the frames saved so far, None until the run starts"""
+        return self.progress.timeline
+
+    @property
+    def done(self):
+        """bool: True once the run has ended"""
+        return not self._thread.is_alive()
+
+    def cancel(self):
+        """End the run after the next frame is saved"""
+        self.progress.cancelled = True
+
+    def join(self, timeout=None):
+        """Wait for the run to end, raising any error from the description
+
+        Returns:
+            CAConfig: The config after being updated by the description
+            Timeline: the grid state for each time step
+        """
+        self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def resume(filepath, ca_config, isolated=False):
+    """Run a CA description carrying on from the last checkpoint saved
+    while running it with the same config, or from the start if there is
+    no checkpoint
+
+    Example:
+        config.checkpoint_file = 'gol.ckpt'
+        timeline = capyle.resume('ca_descriptions/gol_2d.py', config)
+
+    Args:
+        filepath (str): Full path to the CA description py file
+        ca_config (CAConfig): The config the run was started with,
+            ca_config.checkpoint_file must be set
+        isolated (bool): run in a separate worker process
+
+    Returns:
+        numpy.ndarray: Array containing the grid state for each time step
+    """
+    if getattr(ca_config, 'checkpoint_file', None) is None:
+        raise ValueError("No checkpoint file set to resume from")
+    ca_config = copy.copy(ca_config)
+    ca_config.resume = True
+    return run(filepath, ca_config, isolated)
+
+
+def _run_isolated(filepath, ca_config):
+    """Run the description in the worker process, starting a new worker
+    if there is none or the last one died"""
+    global _worker
+    for attempt in range(2):
+        if _worker is None:
+            context = multiprocessing.get_context('spawn')
+            _worker = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        try:
+            return _worker.submit(run_description, filepath,
+                                  ca_config).result()
+        except BrokenProcessPool:
+            _worker = None
+            if attempt > 0:
+                raise
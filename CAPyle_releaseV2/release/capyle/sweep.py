@@ -0,0 +1,209 @@
+import os
+import copy
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from capyle.ca import Observer, observe_runs
+from capyle.runner import prerun, run_description
+
+# the description and config shared by every run in a worker process
+_worker_description = None
+
+
+def parameter_grid(overrides):
+    """Expand a dict of config values to try into every combination
+
+    Example:
+        parameter_grid({'wrap': [True, False], 'num_generations': [50]})
+        -> [{'wrap': True, 'num_generations': 50},
+            {'wrap': False, 'num_generations': 50}]
+
+    Args:
+        overrides (dict): config attribute name -> list of values
+
+    Returns:
+        list: a dict of config values for each parameter point
+    """
+    names = sorted(overrides)
+    values = [overrides[name] for name in names]
+    return [dict(zip(names, point)) for point in itertools.product(*values)]
+
+
+def replicate_seed(seed, point, replicate):
+    """Return the seed for a replicate, derived only from the base seed and
+    the replicate's position so results do not depend on scheduling"""
+    sequence = np.random.SeedSequence(seed, spawn_key=(point, replicate))
+    return int(sequence.generate_state(1)[0])
+
+
+def iter_sweep(filepath, overrides, replicates=1, reducers=None, seed=0,
+               ca_config=None, processes=None):
+    """Run a CA description for every parameter point and replicate across
+    a process pool, yielding reduced statistics as each run completes
+
+    Note:
+        The overrides are pinned on the config (see CAConfig.pin), so they
+        take effect even if the setup function of the description sets the
+        same values. Each replicate pins its own seed (see Grid.setup_rng)
+        and also seeds the global numpy random state, for transition
+        functions that draw from it.
+
+    Args:
+        filepath (str): Full path to the CA description py file
+        overrides (dict): config attribute name -> list of values to try
+        replicates (int): number of seeded runs of each parameter point
+        reducers (dict): statistic name -> Observer whose result is the
+            statistic (see EverInState), or function taking the timeline and
+            returning it, must be picklable. If every reducer is an Observer
+            the runs keep no timeline, the statistics being streamed
+        seed (int): base seed the replicate seeds are derived from
+        ca_config (CAConfig): base config, if None the description is
+            prerun to create one
+        processes (int): number of worker processes, defaults to the
+            number of cpus. 1 runs everything in this process.
+
+    Yields:
+        (int, dict, int, dict): the parameter point index, its config
+            values, the replicate number and the statistics of that run
+    """
+    if ca_config is None:
+        ca_config = prerun(filepath)
+    if reducers is None:
+        reducers = {}
+    points = parameter_grid(overrides)
+    tasks = [(i, params, r, replicate_seed(seed, i, r))
+             for i, params in enumerate(points) for r in range(replicates)]
+
+    if processes is None:
+        processes = os.cpu_count()
+    if processes == 1:
+        _init_worker(filepath, ca_config, reducers)
+        for i, params, r, s in tasks:
+            yield i, params, r, _run_replicate(params, s)
+        return
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(filepath, ca_config,
+                                       reducers)) as pool:
+        futures = {pool.submit(_run_replicate, params, s): (i, params, r)
+                   for i, params, r, s in tasks}
+        for future in as_completed(futures):
+            i, params, r = futures[future]
+            yield i, params, r, future.result()
+
+
+def sweep(filepath, overrides, replicates=1, reducers=None, seed=0,
+          ca_config=None, processes=None):
+    """Run a parameter sweep and average the statistics over the
+    replicates of each parameter point
+
+    Note:
+        Only running totals of the statistics are kept. Statistics that
+        are NaN for a replicate (eg. an event that never happened) are left
+        out of that average.
+
+    Args:
+        See iter_sweep
+
+    Returns:
+        list: (config values, {statistic name: mean}) for each parameter
+            point, in the order given by parameter_grid
+    """
+    points = parameter_grid(overrides)
+    totals = [{} for p in points]
+    counts = [{} for p in points]
+    for i, params, r, stats in iter_sweep(filepath, overrides, replicates,
+                                          reducers, seed, ca_config,
+                                          processes):
+        for name, value in stats.items():
+            value = np.asarray(value, dtype=float)
+            valid = ~np.isnan(value)
+            totals[i][name] = totals[i].get(name, 0) + np.where(valid,
+                                                                value, 0)
+            counts[i][name] = counts[i].get(name, 0) + valid
+    results = []
+    for params, total, count in zip(points, totals, counts):
+        means = {}
+        for name in total:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means[name] = total[name] / count[name]
+        results.append((params, means))
+    return results
+
+
+def _init_worker(filepath, ca_config, reducers):
+    """Store the description, base config and reducers in the worker"""
+    global _worker_description
+    _worker_description = filepath, ca_config, reducers
+
+
+def _run_replicate(params, seed):
+    """Run one replicate in the worker, streaming the grid to the observer
+    reducers and handing the timeline, if kept, to the others"""
+    filepath, ca_config, reducers = _worker_description
+    ca_config = copy.copy(ca_config)
+    ca_config.pin(seed=seed, **params)
+    np.random.seed(seed)
+    # fresh observers for each replicate
+    reducers = copy.deepcopy(reducers)
+    observers = [r for r in reducers.values() if isinstance(r, Observer)]
+    keep_timeline = len(observers) < len(reducers)
+    with observe_runs(observers, timeline=keep_timeline):
+        ca_config, timeline = run_description(filepath, ca_config)
+    return {name: reducer.result() if isinstance(reducer, Observer)
+            else reducer(timeline) for name, reducer in reducers.items()}
+
+
+class EverInState(Observer):
+    """Reducer marking the cells that were in the given state at any point
+    in the run, eg. averaged over replicates this is the burn frequency"""
+
+    def __init__(self, state):
+        self.state = state
+        self.reached = None
+
+    def start(self, grid, num_generations):
+        self.reached = np.zeros(grid.current_cells().shape, dtype=bool)
+
+    def update(self, generation, grid):
+        self.reached |= grid == self.state
+
+    def result(self):
+        return self.reached
+
+
+class FirstInState(Observer):
+    """Reducer giving the first generation any cell was in the given state,
+    or NaN if it never was
+
+    Args:
+        state: the state to look for
+        initial_state: only consider the cells that started in this state,
+            eg. the generation a town first caught fire
+    """
+
+    def __init__(self, state, initial_state=None):
+        self.state = state
+        self.initial_state = initial_state
+        self.generation = np.nan
+
+    def start(self, grid, num_generations):
+        self.generation = np.nan
+        self._cells = None
+
+    def update(self, generation, grid):
+        if self.initial_state is not None and self._cells is None:
+            self._cells = grid == self.initial_state
+        if not np.isnan(self.generation):
+            return
+        reached = grid == self.state
+        if self._cells is not None:
+            reached &= self._cells
+        if reached.any():
+            self.generation = generation
+
+    def result(self):
+        return self.generation
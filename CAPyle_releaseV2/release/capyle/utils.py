@@ -1,9 +1,11 @@
 import sys
+import inspect
 import pickle
-import subprocess
 import time
 import platform
 import os.path
+import itertools
+import traceback
 import numpy as np
 
 
@@ -11,70 +13,70 @@ def prerun_ca(ca_config):
     """Run the setup function of a ca description and load the CAConfig
 
     Args:
-        ca_config (CAConfig): The config object to be saved
-            and passed to the CA file.
+        ca_config (CAConfig): The config object to be passed to the CA file.
     Returns:
         CAConfig: The updated config after values have been updated
             while pre-running the ca description
 
     """
-    ca_config.save()
-    args = [sys.executable, ca_config.filepath, ca_config.path, '0']
-    ca = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    #  Collect both stdout and errors & decode to strings
-    out_bytes, errors_bytes = ca.communicate()
-    errors_str = errors_bytes.decode("utf-8")
-    out_str = out_bytes.decode("utf-8")
-    if errors_str != "":
-        #  show print out and errors
+    from capyle.runner import prerun
+    try:
+        return prerun(ca_config.filepath, ca_config)
+    except Exception:
         print('[ERROR] Error in CA description while prerunning')
-        print(out_str)
-        print(errors_str)
-    else:
-        #  show print out and reload ca_config
-        if not out_str == '':
-            print(out_str)
-        ca_config = load(ca_config.path)
-        ca_config.fill_in_defaults()
-        return ca_config
+        traceback.print_exc()
 
 
 def run_ca(ca_config):
-    """Run the ca in a subprocess, saving the timestep to a timeline.
-    This timeline is then saved to disk and loaded back in this process
+    """Run the ca in this process, collecting the timestep to a timeline
 
     Args:
-        ca_config (CAConfig): The config object to be saved
-            and passed to the CA file.
+        ca_config (CAConfig): The config object to be passed to the CA file.
 
     Returns:
         CAConfig: The updated config after values have been updated
             while pre-running the ca description
         numpy.ndarray: Array containing the grid state for each time step
     """
-    ca_config.save()
-    args = [sys.executable, ca_config.filepath, ca_config.path]
-    ca = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    from capyle.runner import run_description
+    try:
+        return run_description(ca_config.filepath, ca_config, progress=True)
+    except Exception:
+        #  if error at runtime, show the errors
+        print('[ERROR] Error in CA description while attempting to run CA')
+        traceback.print_exc()
+        return None, None
 
-    out_bytes, errors_bytes = ca.communicate()
-    errors_str = errors_bytes.decode("utf-8")
-    out_str = out_bytes.decode("utf-8")
 
-    if errors_str != "":
-        #  close progress bar window early
-        #  if error at runtime, show print out and errors
+def start_ca(ca_config):
+    """Start running the ca on a worker thread, see finish_ca
+
+    Args:
+        ca_config (CAConfig): The config object to be passed to the CA file.
+
+    Returns:
+        runner.BackgroundRun: the run, its timeline can be read as the
+            frames are saved
+    """
+    from capyle.runner import BackgroundRun
+    return BackgroundRun(ca_config.filepath, ca_config)
+
+
+def finish_ca(run):
+    """Collect the result of a run started with start_ca once it is done
+
+    Returns:
+        CAConfig: The updated config after values have been updated
+            while pre-running the ca description
+        Timeline: The grid state for each time step
+    """
+    try:
+        return run.join()
+    except Exception:
+        #  if error at runtime, show the errors
         print('[ERROR] Error in CA description while attempting to run CA')
-        if not out_str == '':
-            print(out_str)
-        print(errors_str)
+        traceback.print_exc()
         return None, None
-    else:
-        #  show print out and reload timeline and ca_config
-        if not out_str == '':
-            print(out_str)
-        ca_config = load(ca_config.path)
-        timeline = load(ca_config.timeline_path)
-        return ca_config, timeline
 
 
 def verify_gens(num_gens):
@@ -115,41 +117,97 @@ def gens_to_dims(gens):
     return (gens + 1, (gens * 2 + 1))
 
 
+# configs saved to paths with this extension use the config file format
+# (see ca.configfile), any other object or path is pickled
+CONFIG_EXTENSION = '.json'
+
+
 def load(path):
-    """Load a picked object from disk"""
+    """Load a picked object, or a config file, from disk
+
+    Note:
+        While a description is run in process, objects saved to the path
+        during the run are returned directly
+    """
+    store, memory_only = _in_process_store()
+    if store is not None and path in store:
+        return store[path]
+    if path.endswith(CONFIG_EXTENSION):
+        from capyle.ca import load_config
+        return load_config(path)
     with open(path, 'rb') as input:
         p = pickle.load(input)
     return p
 
 
 def save(obj, path):
-    """Save an object to disk"""
+    """Save an object to disk, a config to a path ending in
+    CONFIG_EXTENSION being saved as a config file
+
+    Note:
+        While a description is run in process, the object is also kept in
+        memory. Memory only paths (eg. the timeline) are not written to disk
+    """
+    store, memory_only = _in_process_store()
+    if store is not None:
+        store[path] = obj
+        if path in memory_only:
+            return
+    if path.endswith(CONFIG_EXTENSION):
+        from capyle.ca import save_config
+        save_config(obj, path)
+        return
     with open(path, 'wb') as output:
         pickle.dump(obj, output, -1)
 
 
+def _in_process_store():
+    """Return the objects saved by the description being run in process,
+    and the paths that are kept in memory only"""
+    # imported here as the runner depends on this module
+    from capyle.runner import current_store
+    return current_store()
+
+
 def get_metadata(filepath):
-    """Parse given description file and infer the dimensionality and title"""
+    """Read the title and dimensions of a description from the comment
+    block at the top of the file, eg. "# Name: Game of Life" and
+    "# Dimensions: 2"
+
+    Note:
+        Only the leading comments are read. If they do not give the
+        dimensions, the rest of the file is read line by line until the
+        grid class it uses is found, as a best guess
+
+    Returns:
+        (str, int): the title and dimensions
+    """
     title, dimensions = None, None
     with open(filepath, 'r') as f:
-        # find the values of name and dimensions from first few lines
-        i = 0
-        while title is None or dimensions is None:
-            line = f.readline()
-            if 'name' in line.lower():
-                title = line[line.index(':')+1:].strip()
-            elif 'dimensions' in line.lower():
-                dimensions = int(line[line.index(':')+1:].strip())
-            i += 1
-            # if not in the first few lines,
-            # then take best guess based on class called
-            if i == 10:
-                if 'Grid1D' in f.read():
+        line = ''
+        for line in f:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if not stripped.startswith('#'):
+                break
+            key, sep, value = stripped.lstrip('#').partition(':')
+            key = key.strip().lower()
+            if sep and key == 'name':
+                title = value.strip()
+            elif sep and key == 'dimensions':
+                dimensions = int(value.strip())
+        if dimensions is None:
+            # take best guess based on class called
+            dimensions = 2
+            for line in itertools.chain([line], f):
+                if 'Grid1D' in line:
                     dimensions = 1
-                    title = 'Unamed 1D Automata'
-                else:
-                    dimensions = 2
-                    title = 'Unamed 2D Automata'
+                    break
+                if 'Grid2D' in line:
+                    break
+    if title is None:
+        title = 'Unamed {d}D Automata'.format(d=dimensions)
     return title, dimensions
 
 
@@ -172,6 +230,23 @@ def clip_numeric(i, min, max):
     return i
 
 
+def accepts_keyword(func, name):
+    """Return True if the function can be called with the named keyword
+    argument
+
+    Example:
+        accepts_keyword(lambda grid, ns, nc, out=None: grid, 'out') -> True
+    """
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+    param = params.get(name)
+    return param is not None and param.kind in (
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        inspect.Parameter.KEYWORD_ONLY)
+
+
 def is_valid_integer(x):
     """Tests if the supplied value is an or can be converted to an int
 
@@ -216,19 +291,58 @@ def rgb_to_hex(r, g, b):
     return "#{r:02X}{g:02X}{b:02X}".format(r=r, g=g, b=b)
 
 
-def scale_array(old, newrows, newcols):
+def state_dtype(states, extra=()):
+    """Return the narrowest dtype that can hold every state
+
+    Example:
+        state_dtype((0, 1, 2)) -> uint8
+        state_dtype((0, 1, 2), extra=(-100,)) -> int8
+        state_dtype((0, 1, 2), extra=(-200,)) -> int16
+        state_dtype((0, 300)) -> uint16
+        state_dtype((0, 0.5)) -> float64
+
+    Args:
+        states (tuple): the states of the CA
+        extra (tuple): any other values the grid must hold, eg. the state
+            of the border when not wrapping
+
+    Returns:
+        numpy.dtype: the smallest integer dtype holding all the values, or
+            float64 if any of them are not whole numbers
+    """
+    values = list(states if states is not None else (0,)) + list(extra)
+    if not all(float(v).is_integer() for v in values):
+        return np.dtype(np.float64)
+    low, high = int(min(values)), int(max(values))
+    kinds = (np.uint8, np.uint16, np.uint32, np.uint64) if low >= 0 else \
+        (np.int8, np.int16, np.int32, np.int64)
+    for kind in kinds:
+        info = np.iinfo(kind)
+        if info.min <= low and high <= info.max:
+            return np.dtype(kind)
+    return np.dtype(np.float64)
+
+
+def scale_array(old, newrows, newcols, dtype=None):
     """Scale a 2D array to the given size, retainin as much data as possible
 
+    Note:
+        Any cells added are filled with 0
+
     Args:
         old (numpy.ndarray): The array to be scaled
         newrows (int): The new number of rows
         newcols (int): The new number of cols
+        dtype (numpy.dtype): dtype of the scaled array, defaults to the
+            dtype of old
 
     Returns:
         numpy.ndarray: The scaled array with information added/removed
     """
     oldrows, oldcols = old.shape
-    new = np.empty((newrows, newcols))
+    if dtype is None:
+        dtype = old.dtype
+    new = np.zeros((newrows, newcols), dtype=dtype)
     copyrows = oldrows if oldrows < newrows else newrows
     copycols = oldcols if oldcols < newcols else newcols
 
@@ -274,6 +388,31 @@ def title_to_filename(s):
     return s
 
 
+def output_folder(path=None):
+    """Return the folder to save screenshots and animations to, with a
+    trailing slash, the screenshots folder if path is None"""
+    if path is None:
+        return sys.path[0] + "/screenshots/"
+    if not path.endswith("/"):
+        path += "/"
+    return path
+
+
+def unique_filename(folder, catitle, extension):
+    """Return a filename in the folder not yet used, made from the title
+    of the CA and the time"""
+    i = 0
+    title = title_to_filename(catitle)
+    titletime = "{}_{}_".format(title, time.strftime("%Y-%m-%d_%H-%M-%S"))
+    filename = titletime + str(i) + extension
+    # if another file was saved in the same second,
+    # increase the numbering until one that is not used
+    while os.path.exists(folder + filename):
+        i += 1
+        filename = titletime + str(i) + extension
+    return filename
+
+
 def screenshot(cagraph, catitle, path=None):
     """Take a screenshot of the supplied CAGraph and save to disk
 
@@ -281,32 +420,41 @@ def screenshot(cagraph, catitle, path=None):
         cagraph (CAGraph): The graph object to screenshot
         catitle (str): The title of the CA
     """
-    if path is None:
-        screenshot_folder = sys.path[0] + "/screenshots/"
-    else:
-        if not path.endswith("/"):
-            path += "/"
-        screenshot_folder = path
+    screenshot_folder = output_folder(path)
     # check path exists
     if os.path.isdir(screenshot_folder):
-        extension = ".png"
-        i = 0
-        title = title_to_filename(catitle)
-        titletime = "{}_{}_".format(title, time.strftime("%Y-%m-%d_%H-%M-%S"))
-        filename = titletime + str(i) + extension
-        # if another screenshot was taken in the same second,
-        # increase the numbering until one that is not used
-        while os.path.isfile(screenshot_folder + filename):
-            i += 1
-            filename = titletime + str(i) + extension
-        # save the unique filename
-            filepath = screenshot_folder + filename
-            cagraph.screenshot(filepath)
+        filename = unique_filename(screenshot_folder, catitle, ".png")
+        # save to the unique filename
+        cagraph.screenshot(screenshot_folder + filename)
     else:
         filename = None
 
     return filename
 
+
+def export_animation(cagraph, catitle, path=None, extension=".gif"):
+    """Export every frame of the timeline shown on the supplied CAGraph
+    as an animation (see capyle.export.export_timeline)
+
+    Args:
+        cagraph (CAGraph): The graph object showing the timeline
+        catitle (str): The title of the CA
+        extension (str): ".gif" or ".png" for an animated PNG
+
+    Returns:
+        str: the filename saved to, None if the path does not exist or
+            the graph is not showing a timeline
+    """
+    from capyle.export import export_timeline
+    folder = output_folder(path)
+    timeline = getattr(cagraph, 'timeline', None)
+    if not os.path.isdir(folder) or timeline is None:
+        return None
+    filename = unique_filename(folder, catitle, extension)
+    export_timeline(timeline, folder + filename, cagraph.palette)
+    return filename
+
+
 def get_logo():
     os = platform.system()
     fn = ""
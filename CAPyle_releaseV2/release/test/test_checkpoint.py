@@ -0,0 +1,147 @@
+import sys, inspect, unittest, os, tempfile
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import (Grid1D, Grid2D, CAConfig, Checkpointer,
+                       load_checkpoint, Timeline)
+
+
+class Crash(Exception):
+    pass
+
+
+def stochastic(crash_at=None):
+    """A stochastic transition function counting its calls in its
+    additional argument, raising Crash on the crash_at-th call"""
+    def transition(grid, ns, nc, calls):
+        calls[0] += 1
+        if calls[0] == crash_at:
+            raise Crash()
+        p = 0.1 + 0.1 * nc[1]
+        return (np.random.random(p.shape) < p).astype(int)
+    return transition
+
+#----------------------------------------------------------------------
+
+class TestCheckpointer(unittest.TestCase):
+    def test_due(self):
+        checkpointer = Checkpointer('unused', every=10)
+        self.assertFalse(checkpointer.due(9))
+        self.assertTrue(checkpointer.due(10))
+        checkpointer = Checkpointer('unused', seconds=0)
+        self.assertTrue(checkpointer.due(1))
+
+    def test_from_config(self):
+        config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.assertIsNone(Checkpointer.from_config(config))
+        config.checkpoint_file = 'unused'
+        self.assertIsNotNone(Checkpointer.from_config(config))
+
+    def test_no_checkpoint(self):
+        self.assertIsNone(load_checkpoint('not/a/checkpoint'))
+
+#----------------------------------------------------------------------
+
+class TestResume(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'run.ckpt')
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0, 1
+        self.config.grid_dims = 16, 12
+        self.config.num_generations = 40
+        self.config.initial_grid = np.random.randint(0, 2, (16, 12))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def run_grid(self, crash_at=None, seed=5):
+        np.random.seed(seed)
+        g = Grid2D(self.config, (stochastic(crash_at), [0]))
+        g.show_progress = False
+        return g, g.run()
+
+    def check_resume(self, checkpoint=20):
+        g, expected = self.run_grid()
+        self.config.checkpoint_file = self.path
+        self.config.checkpoint_every = 5
+        self.assertRaises(Crash, self.run_grid, 23)
+        self.assertEqual(load_checkpoint(self.path)['generation'],
+                         checkpoint)
+        self.config.resume = True
+        g, timeline = self.run_grid(seed=99)
+        self.assertEqual(g.additional_args[0], [40])
+        self.assertEqual(len(timeline), len(expected))
+        self.assertTrue(np.array_equal(timeline.array, expected.array))
+
+    def test_memory(self):
+        self.check_resume()
+
+    def test_frames_appended(self):
+        self.config.checkpoint_file = self.path
+        self.config.checkpoint_every = 5
+        g, timeline = self.run_grid()
+        checkpoint = load_checkpoint(self.path)
+        # the checkpoint holds no frames, they are in the frames file
+        self.assertNotIn('frames', checkpoint)
+        frames = Checkpointer(self.path).load_frames(checkpoint)
+        self.assertTrue(np.array_equal(
+            frames, timeline.array[:checkpoint['num_frames']]))
+        self.assertEqual(os.path.getsize(self.path + '.frames'),
+                         frames.nbytes)
+
+    def test_file(self):
+        self.config.timeline_file = os.path.join(self.tempdir.name, 'tl')
+        self.check_resume()
+        self.assertEqual(len(Timeline.open(self.config.timeline_file)), 41)
+
+    def test_interval(self):
+        self.config.timeline_interval = 3
+        # checkpoints are only saved with the frames, 6 12 and 18
+        self.check_resume(18)
+
+    def test_no_checkpoint(self):
+        # resuming without a checkpoint runs from the start
+        g, expected = self.run_grid()
+        self.config.checkpoint_file = self.path
+        self.config.resume = True
+        g, timeline = self.run_grid()
+        self.assertTrue(np.array_equal(timeline.array, expected.array))
+
+    def test_mismatch(self):
+        self.config.checkpoint_file = self.path
+        self.config.checkpoint_every = 5
+        self.run_grid()
+        self.config.num_generations = 12
+        self.config.resume = True
+        self.assertRaises(ValueError, self.run_grid)
+
+    def test_grid1d(self):
+        config = CAConfig('test/testdescriptions/1dbasic.py')
+        config.states = 0, 1
+        config.nhood_arr = [1, 1, 1]
+        config.num_generations = 29
+        config.checkpoint_file = self.path
+        config.checkpoint_every = 4
+        config.initial_grid = np.random.randint(0, 2, (1, 20))
+
+        def run(crash_at=None):
+            np.random.seed(3)
+            g = Grid1D(config, (stochastic(crash_at), [0]))
+            g.show_progress = False
+            return g, g.run()
+
+        g, expected = run()
+        self.assertRaises(Crash, run, 18)
+        config.resume = True
+        g, timeline = run()
+        self.assertEqual(g.current_gen, 29)
+        self.assertTrue(np.array_equal(timeline.array, expected.array))
+
+if __name__ == '__main__':
+    unittest.main()
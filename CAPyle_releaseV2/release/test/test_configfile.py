@@ -0,0 +1,136 @@
+import sys, inspect, unittest, os, json, tempfile
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import CAConfig, LifeRule, save_config, load_config
+from capyle.utils import save, load, get_metadata
+# the module load_config is from, as capyle.ca imports it by its own name
+configfile = sys.modules[load_config.__module__]
+
+def make_config():
+    config = CAConfig(main_dir_loc + 'ca_descriptions/gol_2d.py')
+    config.title = 'Test'
+    config.dimensions = 2
+    config.states = (0, 1, 2)
+    config.grid_dims = (40, 30)
+    config.fill_in_defaults()
+    config.initial_grid = np.arange(1200, dtype=np.uint8).reshape(40, 30) % 3
+    return config
+
+class TestConfigFile(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'config.json')
+
+    def test_round_trip(self):
+        config = make_config()
+        config.wind = np.linspace(0, 1, 5000)
+        save_config(config, self.path)
+        loaded = load_config(self.path)
+        self.assertEqual(loaded.states, (0, 1, 2))
+        self.assertEqual(loaded.grid_dims, (40, 30))
+        self.assertEqual(loaded.state_colors, config.state_colors)
+        np.testing.assert_array_equal(loaded.nhood_arr, config.nhood_arr)
+        np.testing.assert_array_equal(loaded.initial_grid,
+                                      config.initial_grid)
+        np.testing.assert_array_equal(loaded.wind, config.wind)
+        self.assertEqual(loaded.initial_grid.dtype, np.uint8)
+
+    def test_utils(self):
+        # save and load pick the format from the extension
+        config = make_config()
+        save(config, self.path)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['format'],
+                             configfile.FORMAT_VERSION)
+        self.assertEqual(load(self.path).title, 'Test')
+
+    def test_grid_not_rewritten(self):
+        config = make_config()
+        save_config(config, self.path)
+        gridfile = configfile.grid_path(self.path)
+        os.utime(gridfile, (0, 0))
+        config.num_generations = 7
+        save_config(config, self.path)
+        self.assertEqual(os.path.getmtime(gridfile), 0)
+        config.initial_grid[0, 0] = 2
+        save_config(config, self.path)
+        self.assertNotEqual(os.path.getmtime(gridfile), 0)
+        self.assertEqual(load_config(self.path).initial_grid[0, 0], 2)
+
+    def test_permissions(self):
+        # as for a file opened for writing, not only for the owner
+        umask = os.umask(0o022)
+        try:
+            save_config(make_config(), self.path)
+        finally:
+            os.umask(umask)
+        for path in (self.path, configfile.grid_path(self.path)):
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['config.json', 'config_initial_grid.npy'])
+
+    def test_mmap(self):
+        old = configfile.MMAP_BYTES
+        configfile.MMAP_BYTES = 100
+        try:
+            save_config(make_config(), self.path)
+            grid = load_config(self.path).initial_grid
+        finally:
+            configfile.MMAP_BYTES = old
+        self.assertTrue(isinstance(grid, np.memmap))
+        # copy on write, changes are not written back
+        grid[0, 0] = 2
+        reloaded = np.load(configfile.grid_path(self.path))
+        self.assertEqual(reloaded[0, 0], 0)
+
+    def test_pickled(self):
+        config = make_config()
+        config.rule = LifeRule()
+        config.pinned = {'states', 'title'}
+        save_config(config, self.path)
+        loaded = load_config(self.path)
+        self.assertTrue(isinstance(loaded.rule, LifeRule))
+        self.assertEqual(loaded.pinned, {'states', 'title'})
+
+    def test_invalid(self):
+        config = make_config()
+        config.num_generations = 'many'
+        self.assertRaises(ValueError, save_config, config, self.path)
+        with open(self.path, 'w') as f:
+            json.dump({'format': configfile.FORMAT_VERSION,
+                       'values': {'dimensions': 'two'},
+                       'initial_grid': None}, f)
+        self.assertRaises(ValueError, load_config, self.path)
+        with open(self.path, 'w') as f:
+            f.write('not a config')
+        self.assertRaises(ValueError, load_config, self.path)
+
+#----------------------------------------------------------------------
+
+class TestMetadata(unittest.TestCase):
+    def write(self, text):
+        fd, path = tempfile.mkstemp(suffix='.py')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_header(self):
+        path = self.write("# Name: Forest fire\n#\n# Dimensions: 1\n\n"
+                          "import sys\n# Name: not this\ngrid = Grid2D()\n")
+        self.assertEqual(get_metadata(path), ('Forest fire', 1))
+
+    def test_guess(self):
+        path = self.write("# a description\nimport sys\n"
+                          "grid = Grid1D(config, rule)\n")
+        self.assertEqual(get_metadata(path), ('Unamed 1D Automata', 1))
+        path = self.write("import sys\n")
+        self.assertEqual(get_metadata(path), ('Unamed 2D Automata', 2))
+
+if __name__ == '__main__':
+    unittest.main()
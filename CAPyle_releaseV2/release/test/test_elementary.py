@@ -0,0 +1,100 @@
+import sys, inspect, unittest
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import (Grid1D, CAConfig, ElementaryRule, run_elementary,
+                       pack_row, unpack_rows)
+import capyle.utils as utils
+
+
+def reference_step(row, rule_num, wrap):
+    """Apply the rule cell by cell from its binary expansion"""
+    rulebool = utils.int_to_binary(rule_num)
+    n = len(row)
+    new = np.zeros(n, dtype=np.uint8)
+    for i in range(n):
+        if wrap:
+            l, r = row[i - 1], row[(i + 1) % n]
+        else:
+            l = row[i - 1] if i > 0 else 0
+            r = row[i + 1] if i < n - 1 else 0
+        new[i] = rulebool[7 - (4*l + 2*row[i] + r)]
+    return new
+
+#----------------------------------------------------------------------
+
+class TestPackedMeta(type):
+    def __new__(mcs, name, bases, dict):
+        def gen_test(rule_num, numcells, wrap):
+            def test(self):
+                row = np.random.randint(0, 2, numcells).astype(np.uint8)
+                rows = unpack_rows(run_elementary(rule_num, row, 5, wrap),
+                                   numcells)
+                expected = row
+                for generation in rows:
+                    self.assertTrue(np.array_equal(generation, expected))
+                    expected = reference_step(expected, rule_num, wrap)
+            return test
+
+        for rule_num in (0, 30, 90, 110, 184, 255):
+            for numcells in (5, 64, 65, 130):
+                for wrap in (True, False):
+                    testname = "test_rule_{r}_{n}_{w}".format(
+                        r=rule_num, n=numcells, w=wrap)
+                    dict[testname] = gen_test(rule_num, numcells, wrap)
+        return type.__new__(mcs, name, bases, dict)
+
+class TestPacked(unittest.TestCase, metaclass=TestPackedMeta):
+    def test_all_rules(self):
+        row = np.random.randint(0, 2, 70).astype(np.uint8)
+        for rule_num in range(256):
+            rows = unpack_rows(run_elementary(rule_num, row, 1), 70)
+            self.assertTrue(np.array_equal(
+                rows[1], reference_step(row, rule_num, True)))
+
+    def test_pack_round_trip(self):
+        row = np.random.randint(0, 2, 100)
+        self.assertTrue(np.array_equal(unpack_rows(pack_row(row), 100), row))
+
+#----------------------------------------------------------------------
+
+class TestGridLookup(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig("test/testdescriptions/1dbasic.py")
+        self.config.num_generations = 30
+        self.config.states = 0,1
+        self.config.dimensions = 1
+        self.config.nhood_arr = [1,1,1]
+        self.config.initial_grid = np.array([np.random.randint(0, 2, 61)])
+
+    def case(self, rule_num, wrap):
+        self.config.wrap = wrap
+        rule = ElementaryRule(rule_num)
+        g = Grid1D(self.config, rule)
+        self.assertIsNotNone(g._lookup)
+        # wrapping the rule stops the lookup being used
+        reference = Grid1D(self.config, lambda *args: rule(*args))
+        self.assertIsNone(reference._lookup)
+        for i in range(self.config.num_generations):
+            g.step()
+            reference.step()
+        self.assertTrue(np.array_equal(g.grid, reference.grid))
+        expected = reference_step(g.grid[0].astype(np.uint8), rule_num, wrap)
+        self.assertTrue(np.array_equal(g.grid[1], expected))
+
+    def test_rule_30(self):
+        self.case(30, True)
+
+    def test_rule_110(self):
+        self.case(110, True)
+
+    def test_rule_90_no_wrap(self):
+        self.case(90, False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import sys, inspect, unittest, os, struct, tempfile, zlib
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.render import Palette
+from capyle.export import (ColorIndexer, export_timeline, lzw_encode,
+                           changed_box)
+
+
+def lzw_decode(data, min_code_size):
+    """Decode GIF LZW codes back to the colour indices"""
+    clear = 1 << min_code_size
+    end = clear + 1
+    bits = int.from_bytes(data, 'little')
+    pos, size = 0, min_code_size + 1
+    table, previous, out = None, None, bytearray()
+    while True:
+        code = (bits >> pos) & ((1 << size) - 1)
+        pos += size
+        if code == clear:
+            table = [bytes([i]) for i in range(clear)] + [b'', b'']
+            size, previous = min_code_size + 1, None
+            continue
+        if code == end:
+            return bytes(out)
+        if code < len(table):
+            entry = table[code]
+            if previous is not None:
+                table.append(previous + entry[:1])
+        else:
+            entry = previous + previous[:1]
+            table.append(entry)
+        out += entry
+        previous = entry
+        if len(table) == 1 << size and size < 12:
+            size += 1
+
+
+def png_chunks(data):
+    """Return the (type, data) of each chunk of a PNG"""
+    chunks, pos = [], 8
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos + 4])
+        chunks.append((data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]))
+        pos += length + 12
+    return chunks
+
+
+def png_image(data, shape):
+    """Decompress scanlines with no filtering to an image"""
+    rows = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+    return rows.reshape(shape[0], shape[1] + 1)[:, 1:]
+
+#----------------------------------------------------------------------
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.palette = Palette((0, 1, 2), [(0, 0, 0), (1, 0, 0), (0, 0, 1)])
+        first = np.zeros((20, 30), dtype=np.uint8)
+        first[5:8, 10:12] = 1
+        second = first.copy()
+        second[15, 3] = 2
+        self.frames = [first, second, second.copy(), first]
+
+    def test_lzw(self):
+        for data in [b'\x00', b'\x01\x02\x03' * 3000,
+                     bytes(np.random.randint(0, 4, 10000).astype(np.uint8))]:
+            self.assertEqual(lzw_decode(lzw_encode(data, 2), 2), data)
+
+    def test_changed_box(self):
+        a, b = self.frames[:2]
+        self.assertEqual(changed_box(a, b), (15, 16, 3, 4))
+        self.assertEqual(changed_box(a, a), (0, 1, 0, 1))
+
+    def test_gif(self):
+        path = os.path.join(self.dir, 'a.gif')
+        self.assertEqual(export_timeline(self.frames, path, self.palette), 4)
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b'GIF89a'))
+        self.assertTrue(data.endswith(b'\x3b'))
+        width, height = struct.unpack('<HH', data[6:10])
+        self.assertEqual((width, height), (30, 20))
+        self.assertEqual(data.count(b'\x21\xf9\x04'), 4)
+
+    def test_apng(self):
+        path = os.path.join(self.dir, 'a.png')
+        export_timeline(self.frames, path, self.palette, start=1, fps=5)
+        with open(path, 'rb') as f:
+            chunks = png_chunks(f.read())
+        kinds = [k for k, d in chunks]
+        self.assertEqual(kinds, [b'IHDR', b'acTL', b'PLTE', b'fcTL', b'IDAT',
+                                 b'fcTL', b'fdAT', b'fcTL', b'fdAT', b'IEND'])
+        self.assertEqual(struct.unpack('>II', chunks[1][1]), (3, 0))
+        self.assertEqual(chunks[2][1], bytes([0, 0, 0, 255, 0, 0, 0, 0, 255]))
+        image = png_image(chunks[4][1], (20, 30))
+        np.testing.assert_array_equal(image, self.frames[1])
+        # the last frame only redraws the cells that changed
+        seq, w, h, x, y, num, den = struct.unpack('>IIIIIHH',
+                                                  chunks[7][1][:24])
+        self.assertEqual((w, h, x, y), (1, 1, 3, 15))
+        self.assertEqual((num, den), (200, 1000))
+        self.assertEqual(png_image(chunks[8][1][4:], (1, 1)), [[0]])
+
+    def test_sequence(self):
+        path = os.path.join(self.dir, 'frames')
+        export_timeline(self.frames, path, self.palette, step=2, scale=2)
+        self.assertEqual(sorted(os.listdir(path)),
+                         ['frame_00000.png', 'frame_00001.png'])
+        with open(os.path.join(path, 'frame_00001.png'), 'rb') as f:
+            chunks = dict(png_chunks(f.read()))
+        image = png_image(chunks[b'IDAT'], (40, 60))
+        np.testing.assert_array_equal(image[::2, ::2], self.frames[2])
+
+    def test_sparse_states(self):
+        palette = Palette((0, 1000), [(1, 0, 0), (0, 0, 1)])
+        indexer = ColorIndexer(palette)
+        self.assertEqual(indexer.colors.tolist(), [[255, 0, 0], [0, 0, 255]])
+        self.assertEqual(indexer(np.array([[1000, 0]])).tolist(), [[1, 0]])
+
+    def test_no_frames(self):
+        path = os.path.join(self.dir, 'a.gif')
+        self.assertRaises(ValueError, export_timeline, self.frames, path,
+                          self.palette, start=10)
+
+if __name__ == '__main__':
+    unittest.main()
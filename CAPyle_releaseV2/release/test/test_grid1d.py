@@ -141,5 +141,38 @@ class TestInitialGridSet(unittest.TestCase, metaclass=TestInitialGridSetMeta):
 
 #----------------------------------------------------------------------
 
+class TestStepOut(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig("test/testdescriptions/1dbasic.py")
+        self.config.num_generations = 20
+        self.config.states = 0,1
+        self.config.dimensions = 1
+        self.config.nhood_arr = [1,0,1]
+        self.config.initial_grid = np.array([np.random.randint(0, 2, 41)])
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts):
+        return (neighbourcounts[1] == 1).astype(int)
+
+    def transfunc_out(self, grid, neighbourstates, neighbourcounts, out):
+        return np.equal(neighbourcounts[1], 1, out=out)
+
+    def test_out(self):
+        g = Grid1D(self.config, self.transfunc)
+        g_out = Grid1D(self.config, self.transfunc_out)
+        self.assertTrue(g_out._transition_out)
+        for i in range(self.config.num_generations):
+            g.step()
+            g_out.step()
+        self.assertTrue(np.array_equal(g.grid, g_out.grid))
+
+    def test_neighbour_views(self):
+        g = Grid1D(self.config, self.transfunc)
+        left, center, right = g.get_neighbour_arrays()
+        self.assertFalse(left.flags.writeable)
+        # the center is masked out of the neighbourhood, but is still the
+        # row itself
+        self.assertTrue(np.array_equal(center, g.grid[0]))
+        self.assertTrue(np.shares_memory(right, g.wrapping_grid))
+
 if __name__ == '__main__':
     unittest.main()
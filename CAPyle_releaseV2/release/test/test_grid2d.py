@@ -1,4 +1,4 @@
-import sys, inspect, unittest
+import sys, inspect, unittest, tracemalloc, gc
 import numpy as np
 this_file_loc = (inspect.stack()[0][1])
 main_dir_loc = this_file_loc[:this_file_loc.index('test')]
@@ -7,7 +7,8 @@ sys.path.append(main_dir_loc + 'capyle')
 sys.path.append(main_dir_loc + 'capyle/ca')
 sys.path.append(main_dir_loc + 'capyle/guicomponents')
 
-from capyle.ca import Grid2D, Neighbourhood, CAConfig
+from capyle.ca import (Grid2D, Neighbourhood, CAConfig, moore_neighbourhood,
+                       circular_neighbourhood)
 
 #----------------------------------------------------------------------
 
@@ -155,5 +156,488 @@ class TestInitialGridSetMeta(type):
 class TestInitialGridSet(unittest.TestCase, metaclass=TestInitialGridSetMeta):
     pass
 
+#----------------------------------------------------------------------
+
+class TestCountNeighbours(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0,1,2,3,4,5,6
+        self.config.grid_dims = 30,40
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts):
+        return grid
+
+    def reference_states(self, g):
+        #masked NW N NE, W E, SW S SE neighbour arrays
+        nhood, grid = g.neighbourhood.neighbourhood, g.wrapping_grid
+        return np.array([nhood[0, 0] * grid[0:-2, 0:-2], nhood[0, 1] * grid[0:-2, 1:-1],
+                         nhood[0, 2] * grid[0:-2, 2:], nhood[1, 0] * grid[1:-1, 0:-2],
+                         nhood[1, 2] * grid[1:-1, 2:], nhood[2, 0] * grid[2:, 0:-2],
+                         nhood[2, 1] * grid[2:, 1:-1], nhood[2, 2] * grid[2:, 2:]])
+
+    def reference(self, g):
+        #per state, per neighbour counting
+        ns = self.reference_states(g)
+        counts = []
+        for state in self.config.states:
+            countg = np.zeros(g.grid.shape)
+            for n in ns:
+                countg += (n == state) + 0
+            counts.append(countg)
+        return counts
+
+    def case(self, nhood, wrap):
+        self.config.nhood_arr = nhood
+        self.config.wrap = wrap
+        self.config.initial_grid = np.random.randint(0, 7, self.config.grid_dims)
+        g = Grid2D(self.config, self.transfunc)
+        expected = self.reference(g)
+        for counts in (g.count_neighbours(), g.count_neighbours(g.get_neighbour_states())):
+            self.assertTrue(np.issubdtype(counts.dtype, np.integer))
+            self.assertEqual(counts.shape, (7,) + g.grid.shape)
+            for e, c in zip(expected, counts):
+                self.assertTrue(np.array_equal(e, c))
+
+    def test_moore(self):
+        self.case(np.ones((3,3)), True)
+
+    def test_lazy_states(self):
+        self.config.nhood_arr = np.array([[0,1,0],[1,1,1],[0,1,0]])
+        self.config.initial_grid = np.random.randint(0, 7, self.config.grid_dims)
+        g = Grid2D(self.config, self.transfunc)
+        expected = self.reference_states(g)
+        lazy = g.get_neighbour_states(lazy=True)
+        self.assertEqual(lazy.shape, expected.shape)
+        self.assertTrue(np.array_equal(np.asarray(lazy), expected))
+        self.assertTrue(np.array_equal(g.get_neighbour_states(), expected))
+        self.assertTrue(np.array_equal(lazy == 3, expected == 3))
+        for i, n in enumerate(lazy):
+            self.assertTrue(np.array_equal(n, expected[i]))
+        #unmasked neighbours are read only views of the wrapping grid
+        self.assertTrue(np.shares_memory(lazy[1], g.wrapping_grid))
+        self.assertFalse(lazy[1].flags.writeable)
+
+    def test_von_neumann(self):
+        self.case(np.array([[0,1,0],[1,1,1],[0,1,0]]), True)
+
+    def test_no_wrap(self):
+        self.case(np.array([[1,0,1],[0,1,0],[1,1,1]]), False)
+
+    def radius_case(self, nhood, wrap):
+        #compare against counting every neighbour of every cell directly
+        self.config.nhood_arr = nhood
+        self.config.wrap = wrap
+        self.config.initial_grid = np.random.randint(0, 7, self.config.grid_dims)
+        g = Grid2D(self.config, self.transfunc)
+        r = g.neighbourhood.radius
+        self.assertEqual(g.wrapping_grid.shape,
+                         (g.grid.shape[0] + 2*r, g.grid.shape[1] + 2*r))
+        rows, cols = g.grid.shape
+        expected = np.zeros((7, rows, cols))
+        #neighbours masked out by the neighbourhood read as state 0
+        expected[0] += np.count_nonzero(nhood == 0)
+        for i, j in zip(*np.nonzero(nhood)):
+            if (i, j) == (r, r):
+                continue
+            n = g.wrapping_grid[i:i + rows, j:j + cols]
+            for s in self.config.states:
+                expected[s] += n == s
+        counts = g.count_neighbours()
+        self.assertTrue(np.array_equal(counts, expected))
+        self.assertTrue(np.array_equal(g.count_neighbours(g.get_neighbour_states()),
+                                       expected))
+
+    def test_radius_moore(self):
+        self.radius_case(moore_neighbourhood(3), True)
+
+    def test_radius_circular(self):
+        self.radius_case(circular_neighbourhood(4), False)
+
+    def test_radius_wrap(self):
+        self.config.nhood_arr = moore_neighbourhood(2)
+        self.config.wrap = True
+        self.config.grid_dims = 6,7
+        self.config.initial_grid = np.random.randint(0, 7, self.config.grid_dims)
+        g = Grid2D(self.config, self.transfunc)
+        torus = np.pad(g.grid, 2, mode='wrap')
+        self.assertTrue(np.array_equal(g.wrapping_grid, torus))
+
+#----------------------------------------------------------------------
+
+class TestInPlace(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0,1,2
+        self.config.nhood_arr = moore_neighbourhood(1)
+        self.config.grid_dims = 12,12
+        self.config.initial_grid = np.zeros((12, 12), dtype=int)
+        self.config.initial_grid[2, 2] = 1
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts):
+        # burns out the fire, then spreads it to the cells below, reading
+        # the neighbour states after changing the grid in place
+        grid[grid == 1] = 2
+        grid[(grid == 0) & (neighbourstates[1] == 1)] = 1
+        return grid
+
+    def case(self):
+        g = Grid2D(self.config, self.transfunc)
+        expected = np.array(self.config.initial_grid)
+        for i in range(3):
+            g.step()
+            expected[2 + i, 2], expected[3 + i, 2] = 2, 1
+            self.assertTrue(np.array_equal(g.grid, expected))
+
+    def test_step(self):
+        self.case()
+
+    def test_active_tiles(self):
+        # only the tiles near the fire are active after the first step
+        self.config.active_tile_size = 2
+        self.case()
+
+#----------------------------------------------------------------------
+
+class TestStateDtype(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0,1,2
+        self.config.grid_dims = 5,5
+        self.config.initial_grid = np.random.randint(0, 3, (5,5))
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts):
+        return grid
+
+    def case(self, wrap, expected):
+        self.config.wrap = wrap
+        g = Grid2D(self.config, self.transfunc)
+        self.assertEqual(g.grid.dtype, expected)
+        self.assertEqual(g.wrapping_grid.dtype, expected)
+        return g
+
+    def test_wrap(self):
+        self.case(True, np.uint8)
+
+    def test_no_wrap(self):
+        # the border state is negative
+        g = self.case(False, np.int8)
+        self.assertTrue(np.all(g.wrapping_grid[0] == Grid2D.NO_WRAP_STATE))
+
+    def test_float_border(self):
+        self.case(0.5, np.float64)
+
+    def test_override(self):
+        self.config.state_dtype = np.int32
+        self.case(True, np.int32)
+
+    def test_timeline(self):
+        self.config.num_generations = 3
+        g = self.case(True, np.uint8)
+        g.show_progress = False
+        self.assertEqual(g.run().dtype, np.uint8)
+
+#----------------------------------------------------------------------
+
+class TestActiveTiles(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0,1
+        self.config.nhood_arr = moore_neighbourhood(1)
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts):
+        # game of life, B3/S23
+        alive = neighbourcounts[1]
+        return ((alive == 3) | ((grid == 1) & (alive == 2))).astype(int)
+
+    def reference(self, grid):
+        """Step a fresh full grid from the given states"""
+        self.config.active_tile_size = None
+        self.config.initial_grid = grid
+        g = Grid2D(self.config, self.transfunc)
+        g.step()
+        return np.array(g.grid)
+
+    def case(self, initial, tile_size, generations):
+        self.config.grid_dims = initial.shape
+        expected = [initial]
+        for i in range(generations):
+            expected.append(self.reference(expected[-1]))
+        self.config.active_tile_size = tile_size
+        self.config.initial_grid = initial
+        g = Grid2D(self.config, self.transfunc)
+        numactive = []
+        for i in range(generations):
+            g.step()
+            numactive.append(np.count_nonzero(g.active_tiles))
+            self.assertTrue(np.array_equal(g.grid, expected[i + 1]))
+        return numactive
+
+    def glider(self, shape):
+        grid = np.zeros(shape, dtype=int)
+        grid[1, 2] = grid[2, 3] = grid[3, 1] = grid[3, 2] = grid[3, 3] = 1
+        return grid
+
+    def test_glider_wrap(self):
+        self.config.wrap = True
+        numactive = self.case(self.glider((40, 36)), 8, 60)
+        # only the tiles around the glider are stepped, the glider spans
+        # at most 2x2 tiles so at most 4x4 of the 5x5 tiles are active
+        self.assertTrue(max(numactive[1:]) <= 16)
+
+    def test_glider_no_wrap(self):
+        self.config.wrap = False
+        self.case(self.glider((40, 36)), 8, 60)
+
+    def test_random(self):
+        self.config.wrap = True
+        self.case(np.random.randint(0, 2, (37, 45)), 16, 30)
+
+    def test_small_tiles(self):
+        self.config.wrap = True
+        self.config.nhood_arr = moore_neighbourhood(2)
+        self.case(np.random.randint(0, 2, (20, 23)) *
+                  (np.random.random((20, 23)) < 0.2), 1, 10)
+
+    def test_invalid_tile_size(self):
+        self.config.grid_dims = 10, 10
+        self.config.active_tile_size = 0
+        self.assertRaises(ValueError, Grid2D, self.config, self.transfunc)
+
+#----------------------------------------------------------------------
+
+class TestStepBuffers(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0,1
+        self.config.nhood_arr = moore_neighbourhood(1)
+        self.config.grid_dims = 30, 40
+        self.config.initial_grid = np.random.randint(0, 2, (30, 40))
+
+    def life(self, grid, neighbourstates, neighbourcounts):
+        alive = neighbourcounts[1]
+        return ((alive == 3) | ((grid == 1) & (alive == 2))).astype(int)
+
+    def life_out(self, grid, neighbourstates, neighbourcounts, out):
+        alive = neighbourcounts[1]
+        np.equal(alive, 3, out=out)
+        out |= (grid == 1) & (alive == 2)
+        return out
+
+    def reference(self, grid, generations):
+        """Step fresh full grids from the given states"""
+        initial = self.config.initial_grid
+        for i in range(generations):
+            self.config.initial_grid = grid
+            g = Grid2D(self.config, self.life)
+            g.step()
+            grid = np.array(g.grid)
+        self.config.initial_grid = initial
+        return grid
+
+    def test_new_array(self):
+        expected = self.reference(self.config.initial_grid, 6)
+        g = Grid2D(self.config, self.life)
+        grid = g.grid
+        for i in range(6):
+            g.step()
+        # the grid stays the view of the wrapping grid
+        self.assertIs(g.grid, grid)
+        self.assertTrue(np.shares_memory(g.grid, g.wrapping_grid))
+        self.assertTrue(np.array_equal(g.grid, expected))
+
+    def test_out(self):
+        expected = self.reference(self.config.initial_grid, 6)
+        g = Grid2D(self.config, self.life_out)
+        self.assertTrue(g._transition_out)
+        for i in range(6):
+            g.step()
+        self.assertTrue(np.array_equal(g.grid, expected))
+
+    def test_out_active_tiles(self):
+        # a random grid steps every tile, a glider only the tiles around it
+        glider = np.zeros((30, 40), dtype=int)
+        glider[1, 2] = glider[2, 3] = glider[3, 1:4] = 1
+        for initial in (self.config.initial_grid, glider):
+            self.config.active_tile_size = None
+            expected = self.reference(initial, 6)
+            self.config.initial_grid = initial
+            self.config.active_tile_size = 2
+            g = Grid2D(self.config, self.life_out)
+            for i in range(6):
+                g.step()
+            self.assertTrue(np.array_equal(g.grid, expected))
+
+    def test_no_allocation(self):
+        # large enough that a copy of the grid dwarfs the fixed size
+        # buffers numpy casts through
+        self.config.grid_dims = 1000, 1000
+        self.config.initial_grid = np.random.randint(0, 2, (1000, 1000))
+        self.config.compile_rule = True
+        g = Grid2D(self.config, self.life)
+        g.step()
+        tracemalloc.start()
+        try:
+            for i in range(5):
+                g.step()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # far less than a single copy of the grid
+        self.assertTrue(peak < g.grid.size // 4)
+
+#----------------------------------------------------------------------
+
+class TestThreadedStep(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0,1,2
+        self.config.grid_dims = 53, 37
+        self.config.initial_grid = np.random.randint(0, 3, (53, 37))
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts):
+        new = grid.copy()
+        new[(grid == 0) & (neighbourcounts[1] > 2)] = 1
+        new[(grid == 1) & (neighbourcounts[2] > neighbourcounts[1])] = 2
+        new[(grid == 2) & (neighbourcounts[0] > 4)] = 0
+        return new
+
+    def transfunc_in_place(self, grid, neighbourstates, neighbourcounts):
+        # changes the grid in place like the 2dbasic description
+        born = (grid == 0) & (neighbourcounts[1] > 2)
+        grid[grid == 2] = 0
+        grid[born] = 1
+        return grid
+
+    def transfunc_states(self, grid, neighbourstates, neighbourcounts):
+        # uses the neighbour above each cell
+        return np.asarray(neighbourstates[1]).copy()
+
+    def transfunc_in_place_states(self, grid, neighbourstates,
+                                  neighbourcounts):
+        # reads the neighbour states, across the band edges, after changing
+        # the grid in place
+        grid[grid == 1] = 2
+        grid[(grid == 0) & (neighbourstates[1] == 1)] = 1
+        grid[(grid == 2) & (neighbourstates[6] == 0)] = 0
+        return grid
+
+    def case(self, transfunc, nhood, wrap):
+        self.config.nhood_arr = nhood
+        self.config.wrap = wrap
+        self.config.num_threads = None
+        expected = Grid2D(self.config, transfunc)
+        self.config.num_threads = 4
+        g = Grid2D(self.config, transfunc)
+        self.assertEqual(len(g._bands), 4)
+        for i in range(8):
+            expected.step()
+            g.step()
+            self.assertTrue(np.array_equal(g.grid, expected.grid))
+
+    def test_moore(self):
+        for wrap in (True, False):
+            self.case(self.transfunc, moore_neighbourhood(1), wrap)
+
+    def test_radius(self):
+        for wrap in (True, False):
+            self.case(self.transfunc, circular_neighbourhood(3), wrap)
+
+    def test_in_place(self):
+        self.case(self.transfunc_in_place, moore_neighbourhood(1), True)
+
+    def test_neighbour_states(self):
+        self.case(self.transfunc_states, moore_neighbourhood(1), True)
+
+    def test_in_place_states(self):
+        self.case(self.transfunc_in_place_states, moore_neighbourhood(1),
+                  True)
+
+    def test_close(self):
+        self.config.num_threads = 2
+        g = Grid2D(self.config, self.transfunc)
+        g.step()
+        pool = g._pool
+        g.close()
+        self.assertTrue(pool._shutdown)
+        # the pool is started again if needed
+        g.step()
+        pool = g._pool
+        del g
+        gc.collect()
+        self.assertTrue(pool._shutdown)
+
+    def test_bands(self):
+        self.config.num_threads = 2
+        self.config.grid_dims = 1000, 600
+        self.config.initial_grid = None
+        g = Grid2D(self.config, self.transfunc)
+        # at most BAND_CELLS cells in each band
+        self.assertEqual(len(g._bands), 3)
+        self.assertEqual(g._bands[-1][1], 1000)
+
+#----------------------------------------------------------------------
+
+class TestRandom(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0,1
+        self.config.grid_dims = 40, 30
+        self.config.num_generations = 10
+        self.config.seed = 12
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts, uniforms):
+        return (uniforms < 0.5).astype(grid.dtype)
+
+    def transfunc_rng(self, grid, neighbourstates, neighbourcounts, rng):
+        return rng.integers(0, 2, grid.shape)
+
+    def run_grid(self, transfunc):
+        g = Grid2D(self.config, transfunc)
+        g.show_progress = False
+        return g.run().array
+
+    def test_seeded(self):
+        for transfunc in (self.transfunc, self.transfunc_rng):
+            first = self.run_grid(transfunc)
+            np.random.random(100)
+            np.testing.assert_array_equal(first, self.run_grid(transfunc))
+            self.assertTrue(0 < first[1:].mean() < 1)
+
+    def test_seeds_differ(self):
+        first = self.run_grid(self.transfunc)
+        self.config.seed = 13
+        self.assertFalse(np.array_equal(first, self.run_grid(self.transfunc)))
+
+    def test_spawned(self):
+        children = np.random.SeedSequence(5).spawn(2)
+        runs = []
+        for child in children:
+            self.config.seed = child
+            runs.append(self.run_grid(self.transfunc))
+        self.assertFalse(np.array_equal(runs[0], runs[1]))
+        self.config.seed = np.random.SeedSequence(5).spawn(2)[1]
+        np.testing.assert_array_equal(runs[1], self.run_grid(self.transfunc))
+
+    def test_threads(self):
+        # uniforms are drawn for the whole grid, whatever the bands
+        expected = self.run_grid(self.transfunc)
+        self.config.num_threads = 3
+        np.testing.assert_array_equal(expected, self.run_grid(self.transfunc))
+
+    def test_uniforms_buffer(self):
+        g = Grid2D(self.config, self.transfunc)
+        first = g.uniforms((40, 30))
+        self.assertIs(g.uniforms((40, 30)), first)
+        self.assertTrue(np.all((first >= 0) & (first < 1)))
+
+    def test_state(self):
+        g = Grid2D(self.config, self.transfunc)
+        state = g.get_state()
+        g.step()
+        after = g.grid.copy()
+        g.set_state(state)
+        g.step()
+        np.testing.assert_array_equal(g.grid, after)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,159 @@
+import sys, inspect, unittest
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import (Grid2D, CAConfig, LifeRule, HashLife,
+                       moore_neighbourhood)
+
+
+def reference_step(grid, rule):
+    """Apply the rule to a wrapping grid cell by cell"""
+    rows, cols = grid.shape
+    new = np.zeros_like(grid)
+    for y in range(rows):
+        for x in range(cols):
+            alive = sum(grid[(y + dy) % rows, (x + dx) % cols]
+                        for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                        if dy or dx)
+            new[y, x] = rule.table[grid[y, x], alive]
+    return new
+
+#----------------------------------------------------------------------
+
+class TestLifeRule(unittest.TestCase):
+    def test_from_string(self):
+        rule = LifeRule.from_string('B36/S23')
+        self.assertEqual(rule.birth, {3, 6})
+        self.assertEqual(rule.survival, {2, 3})
+        self.assertEqual(str(rule), 'B36/S23')
+        self.assertEqual(LifeRule.from_string('s23/b3'), LifeRule())
+
+    def test_from_string_invalid(self):
+        for rule in ('B3', 'B3/S23/S1', 'B3/X23', 'B9/S23', '23/3'):
+            self.assertRaises(ValueError, LifeRule.from_string, rule)
+
+    def test_transition_function(self):
+        rule = LifeRule()
+        config = CAConfig('test/testdescriptions/2dbasic.py')
+        config.states = 0, 1
+        config.nhood_arr = moore_neighbourhood(1)
+        config.grid_dims = 12, 10
+        config.wrap = False
+        config.initial_grid = np.random.randint(0, 2, (12, 10))
+        g = Grid2D(config, rule)
+        # not wrapping, so the rule is applied as a transition function
+        self.assertIsNone(g._hashlife)
+        padded = np.zeros((14, 12), dtype=int)
+        padded[1:-1, 1:-1] = config.initial_grid
+        g.step()
+        self.assertTrue(np.array_equal(
+            g.grid, reference_step(padded, rule)[1:-1, 1:-1]))
+
+#----------------------------------------------------------------------
+
+class TestHashLife(unittest.TestCase):
+    def test_array_round_trip(self):
+        engine = HashLife(LifeRule())
+        cells = np.random.randint(0, 2, (32, 32)).astype(np.uint8)
+        node = engine.from_array(cells)
+        self.assertEqual(node.level, 5)
+        self.assertEqual(node.population, cells.sum())
+        self.assertTrue(np.array_equal(engine.to_array(node), cells))
+        # equal squares are the same node
+        self.assertIs(engine.from_array(cells.copy()), node)
+
+    def test_not_square(self):
+        engine = HashLife(LifeRule())
+        self.assertRaises(ValueError, engine.from_array, np.zeros((8, 4)))
+        self.assertRaises(ValueError, engine.from_array, np.zeros((6, 6)))
+
+    def check_torus(self, rule, shape, generations, max_nodes=2**20):
+        engine = HashLife(rule, max_nodes)
+        grid = np.random.randint(0, 2, shape).astype(np.uint8)
+        expected = grid
+        for i in range(generations):
+            expected = reference_step(expected, rule)
+        result = engine.step_torus(grid, generations)
+        self.assertTrue(np.array_equal(result, expected))
+        return engine
+
+    def test_life(self):
+        for generations in (1, 2, 5, 8, 13):
+            self.check_torus(LifeRule(), (16, 16), generations)
+
+    def test_odd_shape(self):
+        self.check_torus(LifeRule(), (11, 7), 9)
+
+    def test_highlife(self):
+        self.check_torus(LifeRule.from_string('B36/S23'), (12, 20), 6)
+
+    def test_birth_from_empty(self):
+        self.check_torus(LifeRule.from_string('B0/S8'), (8, 8), 3)
+
+    def test_eviction(self):
+        engine = self.check_torus(LifeRule(), (16, 16), 7, max_nodes=256)
+        self.assertTrue(engine.evictions > 0)
+        self.assertTrue(len(engine._nodes) <= 256)
+
+    def test_glider_period(self):
+        # a glider returns to its start after 4 generations per cell
+        # travelled, so 4 * width generations on a torus
+        engine = HashLife(LifeRule())
+        grid = np.zeros((64, 64), dtype=np.uint8)
+        grid[1, 2] = grid[2, 3] = grid[3, 1] = grid[3, 2] = grid[3, 3] = 1
+        result = engine.step_torus(grid, 4 * 64 * 1000)
+        self.assertTrue(np.array_equal(result, grid))
+
+#----------------------------------------------------------------------
+
+class TestGrid2DHashLife(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0, 1
+        self.config.nhood_arr = moore_neighbourhood(1)
+        self.config.grid_dims = 20, 24
+        self.config.wrap = True
+        self.config.initial_grid = np.random.randint(0, 2, (20, 24))
+
+    def reference(self, generations):
+        expected = self.config.initial_grid
+        for i in range(generations):
+            expected = reference_step(expected, LifeRule())
+        return expected
+
+    def test_recognised(self):
+        g = Grid2D(self.config, LifeRule())
+        self.assertIsNotNone(g._hashlife)
+        for i in range(5):
+            g.step()
+            self.assertTrue(np.array_equal(g.grid, self.reference(i + 1)))
+
+    def test_told(self):
+        self.config.life_rule = 'B3/S23'
+        g = Grid2D(self.config, lambda grid, ns, nc: grid)
+        self.assertIsNotNone(g._hashlife)
+        g.advance(21)
+        self.assertTrue(np.array_equal(g.grid, self.reference(21)))
+
+    def test_timeline_interval(self):
+        self.config.num_generations = 50
+        self.config.timeline_interval = 20
+        g = Grid2D(self.config, LifeRule())
+        g.show_progress = False
+        timeline = g.run()
+        self.assertEqual(len(timeline), 4)
+        for frame, generations in zip(timeline, (0, 20, 40, 50)):
+            self.assertTrue(np.array_equal(frame,
+                                           self.reference(generations)))
+
+    def test_not_recognised(self):
+        self.config.states = 0, 1, 2
+        self.assertIsNone(Grid2D(self.config, LifeRule())._hashlife)
+
+if __name__ == '__main__':
+    unittest.main()
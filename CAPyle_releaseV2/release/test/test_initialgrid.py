@@ -0,0 +1,76 @@
+import sys, inspect, unittest
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import (proportional_states, random_states, noise_states,
+                       fractal_noise, randomise1d, randomise2d)
+import capyle.ca.initialgrid as initialgrid
+
+class TestProportional(unittest.TestCase):
+    def test_exact(self):
+        grid = proportional_states((100, 100), 0, [(1, 0.4), (2, 0.3)], rng=1)
+        self.assertEqual(grid.dtype, np.uint8)
+        self.assertEqual(np.bincount(grid.ravel()).tolist(),
+                         [3000, 4000, 3000])
+
+    def test_blocks(self):
+        # counts stay exact across blocks
+        size = initialgrid.BLOCK_SIZE
+        grid = proportional_states((3, size), 5, [(7, 0.2), (9, 0.1)], rng=2)
+        self.assertEqual(np.count_nonzero(grid == 7), int(0.2 * 3 * size))
+        self.assertEqual(np.count_nonzero(grid == 9), int(0.1 * 3 * size))
+
+    def test_seeded(self):
+        a = proportional_states((50, 50), 0, [(1, 0.5)], rng=3)
+        b = proportional_states((50, 50), 0, [(1, 0.5)],
+                                rng=np.random.default_rng(3))
+        np.testing.assert_array_equal(a, b)
+
+    def test_too_much(self):
+        self.assertRaises(ValueError, proportional_states, (10, 10), 0,
+                          [(1, 0.6), (2, 0.6)])
+
+    def test_randomise2d(self):
+        grid = np.zeros((20, 30), dtype=np.int16)
+        out = randomise2d(grid, 1, [(2, 0.25), (3, 0.25)], rng=4)
+        self.assertEqual(out.dtype, np.int16)
+        self.assertEqual(np.bincount(out.ravel()).tolist(), [0, 300, 150, 150])
+
+    def test_randomise1d(self):
+        grid = np.zeros((5, 40), dtype=np.uint8)
+        randomise1d(grid, 0, [(1, 0.25)], rng=5)
+        self.assertEqual(np.count_nonzero(grid[0]), 10)
+        self.assertEqual(np.count_nonzero(grid[1:]), 0)
+
+#----------------------------------------------------------------------
+
+class TestStructured(unittest.TestCase):
+    def test_random(self):
+        grid = random_states((200, 200), 0, [(1, 0.25), (2, 0.5)], rng=6)
+        fractions = np.bincount(grid.ravel()) / grid.size
+        np.testing.assert_allclose(fractions, [0.25, 0.25, 0.5], atol=0.02)
+
+    def test_noise(self):
+        grid = noise_states((100, 120), 0, [(1, 0.1), (2, 0.5)], scale=10,
+                            octaves=3, rng=7)
+        self.assertEqual(np.bincount(grid.ravel()).tolist(),
+                         [4800, 1200, 6000])
+
+    def test_clustered(self):
+        # neighbouring cells are more often in the same state than at random
+        grid = noise_states((100, 100), 0, [(1, 0.5)], scale=20, rng=8)
+        same = np.mean(grid[:, 1:] == grid[:, :-1])
+        self.assertTrue(same > 0.9)
+
+    def test_fractal_noise(self):
+        noise = fractal_noise((30, 40), 8, octaves=2, rng=9)
+        self.assertEqual(noise.shape, (30, 40))
+        self.assertTrue(noise.min() >= 0 and noise.max() <= 1.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,8 @@ sys.path.append(main_dir_loc + 'capyle')
 sys.path.append(main_dir_loc + 'capyle/ca')
 sys.path.append(main_dir_loc + 'capyle/guicomponents')
 
-from capyle.ca import Neighbourhood
+from capyle.ca import (Neighbourhood, moore_neighbourhood,
+                       von_neumann_neighbourhood, circular_neighbourhood)
 
 #define global methods
 def hascenter(a):
@@ -78,8 +79,9 @@ class TestNeighbourhood2DShapesMeta(type):
                         #if even dims and hence no center cell
                         dict[testname] = gen_test_valerr(arr)
                     else:
-                        #odd dimensions
-                        dict[testname] = gen_test_success(arr, (3,3))
+                        #odd dimensions, padded to a square of the largest dimension
+                        size = max(3, *shape)
+                        dict[testname] = gen_test_success(arr, (size,size))
             else:
                 #if supplied array is 1d
                 if shape == (0,):
@@ -91,7 +93,8 @@ class TestNeighbourhood2DShapesMeta(type):
                         dict[testname] = gen_test_valerr(arr)
                     else:
                         #else valid array shape
-                        dict[testname] = gen_test_success(arr, (3,3))
+                        size = max(3, shape[0])
+                        dict[testname] = gen_test_success(arr, (size,size))
         return type.__new__(mcs, name, bases, dict) 
 
 class TestNeighbourhood2DShapes(unittest.TestCase, metaclass=TestNeighbourhood2DShapesMeta):
@@ -124,7 +127,8 @@ class TestDimensions2DMeta(type):
                 newshape.append(s)
             a = np.ones(newshape)
             if (a.ndim == 1 or a.ndim == 2) and hascenter(a):
-                dict[testname] = gen_test_success(a, (3,3))
+                size = max(3, s)
+                dict[testname] = gen_test_success(a, (size,size))
             else:
                 dict[testname] = gen_test_valerr(a)
         return type.__new__(mcs, name, bases, dict)
@@ -264,5 +268,28 @@ class TestNeighbourhoodTypes(unittest.TestCase):
         self.assertTrue(np.array_equal(ls_hood.neighbourhood, nd_hood.neighbourhood))
         self.assertEqual(type(ls_hood.neighbourhood), type(nd_hood.neighbourhood))
 
+#----------------------------------------------------------------------
+
+class TestRadius(unittest.TestCase):
+    def test_pad_centered(self):
+        n = Neighbourhood(np.ones((3,5)))
+        control = np.zeros((5,5))
+        control[1:4] = 1
+        self.assertTrue(np.array_equal(n.neighbourhood, control))
+        self.assertEqual(n.radius, 2)
+
+    def test_no_reduce(self):
+        n = Neighbourhood(moore_neighbourhood(3))
+        self.assertEqual(n.neighbourhood.shape, (7,7))
+        self.assertEqual(n.radius, 3)
+
+    def test_presets(self):
+        self.assertTrue(np.array_equal(moore_neighbourhood(1), np.ones((3,3))))
+        self.assertTrue(np.array_equal(von_neumann_neighbourhood(1),
+                                       [[0,1,0],[1,1,1],[0,1,0]]))
+        self.assertEqual(np.count_nonzero(von_neumann_neighbourhood(2)), 13)
+        self.assertEqual(np.count_nonzero(circular_neighbourhood(2)), 13)
+        self.assertEqual(np.count_nonzero(circular_neighbourhood(3)), 29)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,214 @@
+import sys, inspect, unittest
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import (Grid1D, Grid2D, CAConfig, StateCounts,
+                       FirstGeneration, FrameSampler, Reducer, StopWhen,
+                       LifeRule, moore_neighbourhood, observe_runs)
+
+
+def decay(grid, ns, nc):
+    """Cells count down to 0, with state 3 spreading to 0 cells"""
+    new = np.where(grid > 0, grid - 1, 0)
+    new[(grid == 0) & (nc[3] > 0)] = 3
+    return new
+
+#----------------------------------------------------------------------
+
+class TestObservers(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0, 1, 2, 3
+        self.config.grid_dims = 15, 18
+        self.config.num_generations = 12
+        self.config.initial_grid = np.random.randint(0, 4, (15, 18))
+
+    def run_grid(self, observers, timeline=True):
+        g = Grid2D(self.config, decay)
+        g.show_progress = False
+        return g.run(observers=observers, timeline=timeline)
+
+    def test_state_counts(self):
+        counts = StateCounts()
+        timeline = self.run_grid([counts])
+        self.assertEqual(counts.counts.shape, (13, 4))
+        for frame, row in zip(timeline, counts.counts):
+            self.assertEqual(list(row),
+                             [np.count_nonzero(frame == s) for s in range(4)])
+
+    def test_sorted_states(self):
+        # states that are not small integers are counted by their index
+        counts = StateCounts(states=(3, 0))
+        timeline = self.run_grid([counts])
+        self.assertEqual(list(counts.counts[5]),
+                         [np.count_nonzero(timeline[5] == 3),
+                          np.count_nonzero(timeline[5] == 0)])
+
+    def test_no_timeline(self):
+        counts = StateCounts()
+        self.config.timeline_interval = 5
+        self.assertIsNone(self.run_grid([counts], timeline=False))
+        # every generation is still observed
+        self.assertEqual(counts.counts.sum(axis=1).tolist(), [15 * 18] * 13)
+
+    def test_observe_runs(self):
+        counts, added = StateCounts(), StateCounts()
+        with observe_runs([added], timeline=False):
+            self.assertIsNone(self.run_grid([counts]))
+        self.assertTrue(np.array_equal(added.counts, counts.counts))
+        # runs outside the context are as before
+        self.assertIsNotNone(self.run_grid([]))
+
+    def test_saved_frames_only(self):
+        every, saved = StateCounts(), StateCounts()
+        saved.every_generation = False
+        self.config.timeline_interval = 5
+        advanced = []
+        g = Grid2D(self.config, decay)
+        g.show_progress = False
+        advance = g.advance
+        def record(generations):
+            advanced.append(generations)
+            advance(generations)
+        g.advance = record
+        timeline = g.run(observers=[saved])
+        # the grid jumps between the saved frames, which are all observed
+        self.assertEqual(advanced, [5, 5, 2])
+        for n, frame in zip((0, 5, 10, 12), timeline):
+            self.assertEqual(saved.counts[n].tolist(),
+                             [np.count_nonzero(frame == s) for s in range(4)])
+        self.assertEqual(saved.counts[1].sum(), 0)
+        # with an observer of every generation the grid steps one at a time
+        advanced[:] = []
+        g.set_grid(self.config.initial_grid)
+        g.run(observers=[saved, every])
+        self.assertEqual(advanced, [1] * 12)
+
+    def test_first_generation(self):
+        mask = self.config.initial_grid == 0
+        first = FirstGeneration(3, mask=mask)
+        timeline = self.run_grid([first])
+        frames = timeline.array
+        for y, x in zip(*np.nonzero(mask)):
+            reached = np.nonzero(frames[:, y, x] == 3)[0]
+            expected = reached[0] if len(reached) else -1
+            self.assertEqual(first.generations[y, x], expected)
+        self.assertTrue(np.all(first.generations[~mask] == -1))
+
+    def test_frame_sampler(self):
+        sampler = FrameSampler(every=4)
+        fires = FrameSampler(trigger=lambda n, g: np.all(g != 3), limit=1)
+        timeline = self.run_grid([sampler, fires])
+        self.assertEqual(sampler.generations, [0, 4, 8, 12])
+        for n, frame in zip(sampler.generations, sampler.frames):
+            self.assertTrue(np.array_equal(frame, timeline[n]))
+        self.assertTrue(len(fires.frames) <= 1)
+        self.assertRaises(ValueError, FrameSampler)
+
+    def test_reducer(self):
+        total = Reducer(np.sum)
+        timeline = self.run_grid([total])
+        self.assertEqual(total.generations, list(range(13)))
+        self.assertEqual(total.values, [frame.sum() for frame in timeline])
+
+    def test_grid1d(self):
+        config = CAConfig('test/testdescriptions/1dbasic.py')
+        config.states = 0, 1
+        config.nhood_arr = [1, 1, 1]
+        config.num_generations = 10
+        config.initial_grid = np.random.randint(0, 2, (1, 15))
+        g = Grid1D(config, lambda grid, ns, nc: nc[1] % 2)
+        g.show_progress = False
+        counts = StateCounts()
+        timeline = g.run(observers=[counts])
+        rows = timeline[-1]
+        for n, row in enumerate(counts.counts):
+            self.assertEqual(row[1], np.count_nonzero(rows[n]))
+
+#----------------------------------------------------------------------
+
+class TestCycles(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0, 1
+        self.config.grid_dims = 10, 10
+        self.config.num_generations = 50
+        self.config.nhood_arr = moore_neighbourhood(1)
+        # a blinker, period 2
+        self.config.initial_grid = np.zeros((10, 10), dtype=int)
+        self.config.initial_grid[4, 3:6] = 1
+
+    def run_grid(self, transition, config=None, observers=()):
+        config = self.config if config is None else config
+        g = Grid2D(config, transition) if config.dimensions == 2 else \
+            Grid1D(config, transition)
+        g.show_progress = False
+        return g.run(observers=observers)
+
+    def test_stop(self):
+        self.config.detect_cycles = True
+        timeline = self.run_grid(LifeRule())
+        self.assertEqual(timeline.metadata['cycle_period'], 2)
+        # found at generation 2, confirmed over 2 more
+        self.assertEqual(timeline.metadata['cycle_generation'], 4)
+        self.assertEqual(timeline.metadata['stopped'], 4)
+        self.assertEqual(len(timeline), 5)
+
+    def test_fixed_point(self):
+        self.config.states = 0, 1, 2, 3
+        self.config.initial_grid = np.random.randint(0, 3, (10, 10))
+        self.config.detect_cycles = True
+        self.config.cycle_confirm = 0
+        timeline = self.run_grid(decay)
+        # every cell has counted down to 0 by generation 2
+        self.assertEqual(timeline.metadata['cycle_period'], 1)
+        self.assertTrue(timeline.metadata['cycle_generation'] <= 3)
+        self.assertFalse(timeline[-1].any())
+
+    def test_fast_forward(self):
+        expected = self.run_grid(LifeRule())
+        self.config.detect_cycles = True
+        self.config.cycle_action = 'fast_forward'
+        self.config.timeline_interval = 7
+        timeline = self.run_grid(LifeRule())
+        self.assertEqual(timeline.metadata['cycle_period'], 2)
+        frames = list(range(0, 50, 7)) + [50]
+        self.assertTrue(np.array_equal(timeline.array,
+                                       expected.array[frames]))
+
+    def test_fast_forward_1d(self):
+        config = CAConfig('test/testdescriptions/1dbasic.py')
+        config.states = 0, 1
+        config.nhood_arr = [1, 1, 1]
+        config.num_generations = 30
+        config.initial_grid = np.zeros((1, 20), dtype=int)
+        config.initial_grid[0, 10] = 1
+        # the row is 2 * num_generations + 1 wide, so rather than spread
+        # to fill it lone cells die out, reaching a fixed point
+        die = lambda grid, ns, nc: (nc[1] > 1).astype(int)
+        expected = self.run_grid(die, config)
+        config.detect_cycles = True
+        config.cycle_action = 'fast_forward'
+        timeline = self.run_grid(die, config)
+        self.assertEqual(timeline.metadata['cycle_period'], 1)
+        self.assertTrue(np.array_equal(timeline.array, expected.array))
+
+    def test_invalid_action(self):
+        self.config.detect_cycles = True
+        self.config.cycle_action = 'rewind'
+        self.assertRaises(ValueError, self.run_grid, LifeRule())
+
+    def test_stop_when(self):
+        stop = StopWhen(lambda g: g[4, 4] == 1 and g[3, 4] == 1)
+        timeline = self.run_grid(LifeRule(), observers=[stop])
+        self.assertEqual(stop.generation, 1)
+        self.assertEqual(len(timeline), 2)
+        self.assertEqual(timeline.metadata, {'stopped': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys, inspect, unittest, io
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import (Grid2D, CAConfig, ProgressSink, NullProgress,
+                       TerminalProgress, ProgressReporter, progress_sink)
+
+
+class RecordingProgress(ProgressSink):
+    """Keeps every event sent to it"""
+    interval = 0
+
+    def __init__(self):
+        self.total = None
+        self.events = []
+        self.last = None
+
+    def start(self, total):
+        self.total = total
+
+    def update(self, event):
+        self.events.append(event)
+
+    def finish(self, event):
+        self.last = event
+
+#----------------------------------------------------------------------
+
+class TestProgress(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig('test/testdescriptions/2dbasic.py')
+        self.config.states = 0, 1
+        self.config.grid_dims = 10, 12
+        self.config.num_generations = 20
+        self.config.timeline_interval = 4
+
+    def test_grid_run(self):
+        sink = RecordingProgress()
+        g = Grid2D(self.config, lambda grid, ns, nc: grid)
+        g.show_progress = sink
+        timeline = g.run()
+        self.assertEqual(len(timeline), 6)
+        self.assertEqual(sink.total, 20)
+        self.assertEqual([e.generation for e in sink.events],
+                         [4, 8, 12, 16, 20])
+        self.assertEqual(sink.last.generation, 20)
+        self.assertTrue(sink.last.elapsed >= 0)
+
+    def test_throttled(self):
+        sink = RecordingProgress()
+        sink.interval = 3600
+        reporter = ProgressReporter(sink, 100, 50)
+        reporter.run(lambda: [reporter.update(n) for n in range(100)])
+        self.assertEqual(sink.events, [])
+
+    def test_cells_per_sec(self):
+        reporter = ProgressReporter(RecordingProgress(), 100, 50)
+        reporter.run(lambda: None, first_generation=10)
+        event = reporter.event(30)
+        self.assertTrue(event.cells_per_sec > 0)
+        self.assertAlmostEqual(event.cells_per_sec * event.elapsed, 1000)
+
+    def test_terminal(self):
+        stream = io.StringIO()
+        sink = TerminalProgress(stream, width=10)
+        sink.interval = 0
+        g = Grid2D(self.config, lambda grid, ns, nc: grid)
+        g.show_progress = sink
+        g.run()
+        lines = stream.getvalue()
+        self.assertTrue(lines.endswith('\n'))
+        self.assertIn('[##########] 20/20', lines)
+
+    def test_worker_error(self):
+        # errors from the CA reach the caller whatever the sink
+        def fail(grid, ns, nc):
+            raise KeyError('fail')
+        g = Grid2D(self.config, fail)
+        g.show_progress = False
+        self.assertRaises(KeyError, g.run)
+
+    def test_progress_sink(self):
+        self.assertIsInstance(progress_sink(False), NullProgress)
+        self.assertIsInstance(progress_sink('terminal'), TerminalProgress)
+        sink = RecordingProgress()
+        self.assertIs(progress_sink(sink), sink)
+        self.assertRaises(ValueError, progress_sink, 'window')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import sys, inspect, unittest, threading
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import FramePyramid, Timeline, mode_downsample
+
+
+def reference_mode(grid):
+    """Downsample cell by cell, ties going to the first cell in the block"""
+    rows, cols = grid.shape
+    out = np.empty(((rows + 1) // 2, (cols + 1) // 2), dtype=grid.dtype)
+    for y in range(out.shape[0]):
+        for x in range(out.shape[1]):
+            block = [grid[min(2 * y + dy, rows - 1), min(2 * x + dx, cols - 1)]
+                     for dy in (0, 1) for dx in (0, 1)]
+            counts = [block.count(v) for v in block]
+            out[y, x] = block[counts.index(max(counts))]
+    return out
+
+#----------------------------------------------------------------------
+
+class TestModeDownsample(unittest.TestCase):
+    def test_mode(self):
+        grid = np.array([[1, 2, 0, 0],
+                         [2, 3, 0, 4]])
+        self.assertEqual(mode_downsample(grid).tolist(), [[2, 0]])
+
+    def test_reference(self):
+        for shape in ((8, 8), (7, 10), (1, 5), (9, 1)):
+            grid = np.random.randint(0, 4, shape)
+            self.assertTrue(np.array_equal(mode_downsample(grid),
+                                           reference_mode(grid)))
+
+#----------------------------------------------------------------------
+
+class TestFramePyramid(unittest.TestCase):
+    def setUp(self):
+        self.frames = np.random.randint(0, 3, (3, 70, 45)).astype(np.uint8)
+
+    def levels(self, frame):
+        levels = [frame]
+        while max(levels[-1].shape) > 1:
+            levels.append(mode_downsample(levels[-1]))
+        return levels
+
+    def test_shapes(self):
+        pyramid = FramePyramid(self.frames, tile_size=8)
+        self.assertEqual(pyramid.shapes[:3], [(70, 45), (35, 23), (18, 12)])
+        self.assertEqual(pyramid.shapes[-1], (1, 1))
+
+    def test_tiles_match_whole_levels(self):
+        pyramid = FramePyramid(self.frames, tile_size=8)
+        levels = self.levels(self.frames[1])
+        for level, expected in enumerate(levels):
+            rows, cols = expected.shape
+            region = pyramid.region(1, level, (0, rows), (0, cols))
+            self.assertTrue(np.array_equal(region, expected))
+
+    def test_view(self):
+        pyramid = FramePyramid(self.frames, tile_size=8)
+        levels = self.levels(self.frames[2])
+        # 4 cells per pixel
+        cells = pyramid.view(2, (8, 48, 4, 44), (10, 10))
+        self.assertTrue(np.array_equal(cells, levels[2][2:12, 1:11]))
+        # zoomed in, one cell per pixel
+        cells = pyramid.view(2, (10, 20, 5, 15), (10, 10))
+        self.assertTrue(np.array_equal(cells, self.frames[2][10:20, 5:15]))
+
+    def test_cache(self):
+        pyramid = FramePyramid(self.frames, tile_size=8, max_tiles=4)
+        pyramid.region(0, 2, (0, 18), (0, 12))
+        self.assertTrue(len(pyramid._tiles) <= 4)
+        pyramid.invalidate(0)
+        self.assertEqual(len(pyramid._tiles), 0)
+
+    def test_invalidate_while_reading(self):
+        # as when the run invalidates frames while the GUI views them
+        pyramid = FramePyramid(self.frames, tile_size=4, max_tiles=16)
+        stop = threading.Event()
+        def invalidate():
+            while not stop.is_set():
+                pyramid.invalidate(0)
+        thread = threading.Thread(target=invalidate)
+        thread.start()
+        try:
+            for i in range(200):
+                pyramid.view(0, (0, 70, 0, 45), (10, 10))
+        finally:
+            stop.set()
+            thread.join()
+        self.assertTrue(len(pyramid._tiles) <= 16)
+
+    def test_invalidated_while_computing(self):
+        # a tile computed from a frame invalidated meanwhile is not cached
+        frames = list(self.frames)
+        pyramid = FramePyramid(frames, tile_size=8)
+        class Frames(object):
+            def __getitem__(self, frame):
+                pyramid.invalidate(frame)
+                return frames[frame]
+        pyramid.frames = Frames()
+        pyramid.tile(0, 1, 0, 0)
+        self.assertEqual(len(pyramid._tiles), 0)
+
+    def test_timeline(self):
+        timeline = Timeline(2, (70, 45), np.uint8)
+        timeline[0] = self.frames[0]
+        pyramid = timeline.pyramid(tile_size=8)
+        self.assertIs(timeline.pyramid(), pyramid)
+        before = pyramid.view(0, (0, 70, 0, 45), (10, 10)).copy()
+        # rewriting a frame drops its cached tiles
+        timeline[0] = self.frames[1]
+        after = pyramid.view(0, (0, 70, 0, 45), (10, 10))
+        self.assertTrue(np.array_equal(
+            after, self.levels(self.frames[1])[2]))
+        self.assertTrue(np.array_equal(
+            before, self.levels(self.frames[0])[2]))
+
+if __name__ == '__main__':
+    unittest.main()
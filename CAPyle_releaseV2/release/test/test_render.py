@@ -0,0 +1,76 @@
+import sys, inspect, unittest
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.render import Palette, Downsampler, sample_indices
+
+class TestPalette(unittest.TestCase):
+    def test_state_colors(self):
+        colors = [(0, 0, 0), (1, 0, 0), (0, 0.5, 1)]
+        palette = Palette((0, 1, 2), colors)
+        grid = np.array([[0, 1], [2, 1]], dtype=np.uint8)
+        image = palette(grid)
+        self.assertEqual(image.dtype, np.uint8)
+        self.assertEqual(image.shape, (2, 2, 3))
+        self.assertEqual(image[0, 1].tolist(), [255, 0, 0])
+        self.assertEqual(image[1, 0].tolist(), [0, 128, 255])
+
+    def test_grayscale(self):
+        palette = Palette((0, 1))
+        image = palette(np.array([[0, 1]]))
+        self.assertEqual(image[0, 0].tolist(), [0, 0, 0])
+        self.assertEqual(image[0, 1].tolist(), [255, 255, 255])
+
+    def test_offset_states(self):
+        palette = Palette((3, 4, 5), [(0, 0, 0), (0, 1, 0), (0, 0, 1)])
+        image = palette(np.array([[5, 3, 4]]))
+        self.assertEqual(image[0].tolist(),
+                         [[0, 0, 255], [0, 0, 0], [0, 255, 0]])
+
+    def test_float_states(self):
+        palette = Palette((0.0, 0.5, 1.0), [(1, 0, 0), (0, 1, 0), (0, 0, 1)])
+        image = palette(np.array([[1.0, 0.5, 0.0]]))
+        self.assertEqual(image[0].tolist(),
+                         [[0, 0, 255], [0, 255, 0], [255, 0, 0]])
+
+    def test_float_grid(self):
+        # whole number states held in a float grid
+        palette = Palette((0, 1), [(0, 0, 0), (1, 1, 1)])
+        image = palette(np.array([[1.0, 0.0]]))
+        self.assertEqual(image[0].tolist(), [[255, 255, 255], [0, 0, 0]])
+        palette = Palette((3, 4), [(0, 0, 0), (1, 1, 1)])
+        image = palette(np.array([[4.0, 3.0]]))
+        self.assertEqual(image[0].tolist(), [[255, 255, 255], [0, 0, 0]])
+
+    def test_out(self):
+        palette = Palette((0, 1))
+        out = np.empty((4, 5, 3), dtype=np.uint8)
+        self.assertIs(palette(np.ones((4, 5), dtype=int), out=out), out)
+        self.assertTrue(np.all(out == 255))
+
+#----------------------------------------------------------------------
+
+class TestDownsampler(unittest.TestCase):
+    def test_sample_indices(self):
+        self.assertEqual(sample_indices(5, 10).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(sample_indices(10, 4).tolist(), [0, 2, 5, 7])
+
+    def test_small_grid(self):
+        grid = np.arange(12).reshape(3, 4)
+        downsampler = Downsampler(grid.shape, (100, 100))
+        self.assertIs(downsampler(grid), grid)
+
+    def test_large_grid(self):
+        grid = np.arange(1000 * 800).reshape(1000, 800)
+        downsampler = Downsampler(grid.shape, (250, 400))
+        sampled = downsampler(grid)
+        self.assertEqual(sampled.shape, (250, 400))
+        self.assertEqual(sampled[1, 1], grid[4, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+import sys, inspect, unittest, threading, pickle
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import (Grid1D, Grid2D, CAConfig, TableRule, TotalisticRule,
+                       ElementaryRule, CountRule, compile_rule,
+                       moore_neighbourhood)
+from capyle.ca.rules import _count_vectors
+
+
+def reference_step(row, rule, wrap):
+    """Apply the rule cell by cell"""
+    n, r, k = len(row), rule.radius, rule.num_states
+    new = np.zeros(n, dtype=int)
+    for i in range(n):
+        cells = []
+        for j in range(i - r, i + r + 1):
+            if wrap:
+                cells.append(int(row[j % n]))
+            else:
+                cells.append(int(row[j]) if 0 <= j < n else 0)
+        if isinstance(rule, TotalisticRule):
+            index = sum(cells)
+        else:
+            index = 0
+            for c in cells:
+                index = index * k + c
+        new[i] = rule.table[index]
+    return new
+
+#----------------------------------------------------------------------
+
+class TestRuleGridMeta(type):
+    def __new__(mcs, name, bases, dict):
+        def gen_test(rule, wrap, lookup):
+            def test(self):
+                config = CAConfig("test/testdescriptions/1dbasic.py")
+                config.num_generations = 20
+                config.dimensions = 1
+                config.states = tuple(range(rule.num_states))
+                config.nhood_arr = [1] * (2*rule.radius + 1)
+                config.wrap = wrap
+                config.initial_grid = np.array(
+                    [np.random.randint(0, rule.num_states, 41)])
+                if lookup:
+                    g = Grid1D(config, rule)
+                    self.assertIsNotNone(g._lookup)
+                else:
+                    g = Grid1D(config, lambda *args: rule(*args))
+                    self.assertIsNone(g._lookup)
+                for i in range(config.num_generations):
+                    g.step()
+                for i in range(config.num_generations):
+                    expected = reference_step(g.grid[i], rule, wrap)
+                    self.assertTrue(np.array_equal(g.grid[i+1], expected))
+            return test
+
+        np.random.seed(0)
+        rules = {
+            'table_k3_r1': TableRule(np.random.randint(0, 3, 27), 3, 1),
+            'table_k2_r2': TableRule.from_number(0x6e1a2b3c, 2, 2),
+            'table_k4_r2': TableRule(np.random.randint(0, 4, 4**5), 4, 2),
+            'totalistic_k3_r1': TotalisticRule.from_number(1635, 3, 1),
+            'totalistic_k5_r3': TotalisticRule(
+                np.random.randint(0, 5, 29), 5, 3),
+        }
+        for rulename, rule in rules.items():
+            for wrap in (True, False):
+                for lookup in (True, False):
+                    testname = "test_{n}_{w}_{l}".format(
+                        n=rulename, w=wrap, l='lookup' if lookup else 'call')
+                    dict[testname] = gen_test(rule, wrap, lookup)
+        return type.__new__(mcs, name, bases, dict)
+
+class TestRuleGrid(unittest.TestCase, metaclass=TestRuleGridMeta):
+    pass
+
+#----------------------------------------------------------------------
+
+class TestRuleTable(unittest.TestCase):
+    def test_from_number_elementary(self):
+        for rule_num in (30, 90, 110):
+            self.assertTrue(np.array_equal(
+                TableRule.from_number(rule_num).table,
+                ElementaryRule(rule_num).table))
+            rule = ElementaryRule.from_number(rule_num)
+            self.assertTrue(isinstance(rule, ElementaryRule))
+            self.assertEqual(rule.rule_num, rule_num)
+        self.assertRaises(ValueError, ElementaryRule.from_number, 30, 3)
+
+    def test_totalistic_from_number(self):
+        # 1635 = 2020120 in base 3, least significant digit first
+        rule = TotalisticRule.from_number(1635, 3)
+        self.assertEqual(list(rule.table), [0, 2, 1, 0, 2, 0, 2])
+
+    def test_wrong_table_size(self):
+        self.assertRaises(ValueError, TableRule, np.zeros(9), 2, 1)
+
+    def test_table_too_large(self):
+        self.assertRaises(ValueError, TableRule.from_number, 0, 10, 5)
+
+#----------------------------------------------------------------------
+
+class TestRadiusNeighbours(unittest.TestCase):
+    def setUp(self):
+        self.config = CAConfig("test/testdescriptions/1dbasic.py")
+        self.config.num_generations = 10
+        self.config.dimensions = 1
+        self.config.states = 0,1,2
+        self.config.nhood_arr = [1,0,1,1,1]
+        self.config.initial_grid = np.array([np.random.randint(0, 3, 21)])
+
+    def transfunc(self, grid, neighbourstates, neighbourcounts):
+        return grid[0]
+
+    def test_wrap(self):
+        g = Grid1D(self.config, self.transfunc)
+        self.assertEqual(g.wrapsize, 2)
+        row = g.grid[0]
+        self.assertTrue(np.array_equal(g.wrapping_grid[0],
+                                       np.pad(row, 2, mode='wrap')))
+
+    def test_counts(self):
+        g = Grid1D(self.config, self.transfunc)
+        ns = g.get_neighbour_arrays()
+        self.assertEqual(len(ns), 5)
+        row = np.pad(g.grid[0], 2, mode='wrap')
+        n = g.grid.shape[1]
+        # the neighbour on the left is masked out to state 0
+        neighbours = [row[:n], np.zeros(n), row[3:3+n], row[4:4+n]]
+        self.assertTrue(np.array_equal(ns[2], g.grid[0]))
+        counts = g.count_neighbours(ns)
+        for i, s in enumerate(self.config.states):
+            expected = sum(nb == s for nb in neighbours)
+            self.assertTrue(np.array_equal(counts[i], expected))
+
+#----------------------------------------------------------------------
+
+def fire(grid, neighbourstates, neighbourcounts):
+    """Deterministic forest fire, states burnt, fire, water, forest"""
+    new = grid.copy()
+    new[grid == 1] = 0
+    new[(grid == 3) & (neighbourcounts[1] > 1)] = 1
+    return new
+
+class TestCountRule(unittest.TestCase):
+    def test_rank(self):
+        for k, n in ((2, 8), (3, 4), (7, 8), (4, 24)):
+            rule = CountRule(tuple(range(k)), n)
+            ranks = rule.rank(_count_vectors(k, n))
+            self.assertEqual(rule.num_counts, len(ranks))
+            self.assertTrue(np.array_equal(np.sort(ranks),
+                                           np.arange(rule.num_counts)))
+
+    def test_compiled(self):
+        rule = compile_rule(fire, (0, 1, 2, 3), 8)
+        grid = np.random.randint(0, 4, (30, 40))
+        counts = np.zeros((4, 30, 40), dtype=int)
+        for y in range(30):
+            for x in range(40):
+                # at most 8 neighbours, fewer on a border
+                total = np.random.randint(0, 9)
+                for i in np.random.randint(0, 4, total):
+                    counts[i, y, x] += 1
+        self.assertTrue(np.array_equal(rule(grid, None, counts),
+                                       fire(grid, None, counts)))
+
+    def test_grid(self):
+        config = CAConfig('test/testdescriptions/2dbasic.py')
+        config.states = 0, 1, 2, 3
+        config.nhood_arr = moore_neighbourhood(1)
+        config.grid_dims = 25, 30
+        for wrap in (True, False):
+            config.wrap = wrap
+            config.initial_grid = np.random.randint(0, 4, (25, 30))
+            config.compile_rule = True
+            g = Grid2D(config, fire)
+            self.assertIsInstance(g.transition_func, CountRule)
+            config.compile_rule = False
+            expected = Grid2D(config, fire)
+            g.step()
+            expected.step()
+            self.assertTrue(np.array_equal(g.grid, expected.grid))
+
+    def test_thread_buffers(self):
+        rule = compile_rule(fire, (0, 1, 2, 3), 8)
+        buffers = rule._buffers((3, 4))
+        other = []
+        thread = threading.Thread(
+            target=lambda: other.append(rule._buffers((3, 4))))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0][0], buffers[0])
+        self.assertIs(rule._buffers((3, 4)), buffers)
+        # the buffers are not pickled
+        copy = pickle.loads(pickle.dumps(rule))
+        grid = np.random.randint(0, 4, (5, 6))
+        counts = np.random.multinomial(8, [0.25] * 4, (5, 6)).transpose(2, 0, 1)
+        self.assertTrue(np.array_equal(copy(grid, None, counts),
+                                       rule(grid, None, counts)))
+
+    def test_states(self):
+        def transfunc(grid, neighbourstates, neighbourcounts):
+            return np.where(neighbourcounts[0] > 3, 10, grid)
+        rule = compile_rule(transfunc, (10, 5), 8)
+        grid = np.array([[5, 5, 10]])
+        counts = np.array([[[4, 2, 0]], [[4, 6, 8]]])
+        self.assertTrue(np.array_equal(rule(grid, None, counts),
+                                       [[10, 5, 10]]))
+
+    def test_neighbour_states(self):
+        def transfunc(grid, neighbourstates, neighbourcounts):
+            return neighbourstates[0]
+        self.assertRaises(ValueError, compile_rule, transfunc, (0, 1), 8)
+
+    def test_not_a_state(self):
+        def transfunc(grid, neighbourstates, neighbourcounts):
+            return grid + 1
+        self.assertRaises(ValueError, compile_rule, transfunc, (0, 1), 8)
+
+    def test_stochastic(self):
+        def transfunc(grid, neighbourstates, neighbourcounts, p):
+            burn = (neighbourcounts[1] > 0) & (np.random.random(grid.shape)
+                                               < p)
+            return np.where(burn, 1, grid)
+        self.assertRaises(ValueError, compile_rule, transfunc, (0, 1), 8,
+                          (0.5,))
+        rule = compile_rule(transfunc, (0, 1), 8, (0.3,), samples=2000)
+        grid = np.zeros((200, 200), dtype=int)
+        counts = np.zeros((2, 200, 200), dtype=int)
+        counts[1, :100] = 1
+        new = rule(grid, None, counts)
+        self.assertAlmostEqual(new[:100].mean(), 0.3, delta=0.03)
+        self.assertEqual(new[100:].sum(), 0)
+
+    def test_seeded(self):
+        def transfunc(grid, neighbourstates, neighbourcounts, p,
+                      uniforms=None):
+            burn = (neighbourcounts[1] > 0) & (uniforms < p)
+            return np.where(burn, 1, grid)
+        config = CAConfig('test/testdescriptions/2dbasic.py')
+        config.states = 0, 1
+        config.nhood_arr = moore_neighbourhood(1)
+        config.grid_dims = 40, 40
+        config.compile_rule = True
+        config.compile_samples = 200
+        def run(seed, num_threads=None):
+            config.seed = seed
+            config.num_threads = num_threads
+            config.initial_grid = np.zeros((40, 40), dtype=int)
+            config.initial_grid[20, 20] = 1
+            g = Grid2D(config, (transfunc, 0.3))
+            self.assertTrue(g.transition_func.stochastic)
+            for i in range(5):
+                g.step()
+            return np.array(g.grid)
+        a = run(7)
+        self.assertTrue(np.array_equal(a, run(7)))
+        self.assertTrue(np.array_equal(a, run(7, num_threads=3)))
+        self.assertFalse(np.array_equal(a, run(8)))
+
+if __name__ == '__main__':
+    unittest.main()
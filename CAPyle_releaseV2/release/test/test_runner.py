@@ -0,0 +1,100 @@
+import sys, inspect, unittest, threading
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+import capyle
+from capyle.ca import CAConfig, StreamProgress
+from capyle.runner import (load_description, prerun, run_description,
+                           BackgroundRun, in_process_store, current_store)
+
+TESTDESCRIPTIONS_PATH = 'test/testdescriptions/'
+
+class TestInProcessRun(unittest.TestCase):
+    def setUp(self):
+        self.filepath = TESTDESCRIPTIONS_PATH + '2drun.py'
+
+    def test_prerun(self):
+        ca_config = prerun(self.filepath)
+        self.assertIsInstance(ca_config, CAConfig)
+        self.assertEqual(ca_config.title, "Example 2D CA Run")
+        self.assertEqual(ca_config.states, (0,1))
+        self.assertEqual(ca_config.grid_dims, (20,20))
+
+    def test_run(self):
+        timeline = capyle.run(self.filepath)
+        self.assertEqual(len(timeline), 21)
+        #a glider keeps its 5 cells and moves 1 cell diagonally every 4 generations
+        for frame in timeline:
+            self.assertEqual(np.count_nonzero(frame), 5)
+        self.assertTrue(np.array_equal(timeline[4], np.roll(timeline[0], (1,1), (0,1))))
+
+    def test_config_not_modified(self):
+        ca_config = CAConfig(self.filepath)
+        ca_config.fill_in_defaults()
+        new_config, timeline = run_description(self.filepath, ca_config)
+        self.assertEqual(new_config.num_generations, 20)
+        self.assertEqual(ca_config.num_generations, 100)
+
+    def test_store_per_thread(self):
+        seen = []
+        with in_process_store({'a': 1}) as store:
+            thread = threading.Thread(
+                target=lambda: seen.append(current_store()[0]))
+            thread.start()
+            thread.join()
+            self.assertIs(current_store()[0], store)
+        self.assertEqual(seen, [None])
+        self.assertIsNone(current_store()[0])
+
+    def test_loaded_once(self):
+        module = load_description(self.filepath)
+        capyle.run(self.filepath)
+        self.assertIs(load_description(self.filepath), module)
+
+#----------------------------------------------------------------------
+
+class TestBackgroundRun(unittest.TestCase):
+    def setUp(self):
+        self.filepath = TESTDESCRIPTIONS_PATH + '2drun.py'
+        self.ca_config = prerun(self.filepath)
+
+    def test_run(self):
+        run = BackgroundRun(self.filepath, self.ca_config)
+        ca_config, timeline = run.join()
+        self.assertTrue(run.done)
+        # the timeline streamed is the one returned
+        self.assertIs(run.timeline, timeline)
+        self.assertTrue(run.progress.finished)
+        expected = capyle.run(self.filepath, self.ca_config)
+        self.assertTrue(np.array_equal(timeline.array, expected.array))
+
+    def test_prerun_during_run(self):
+        # as when a description is opened in the GUI during a run
+        run = BackgroundRun(self.filepath, self.ca_config)
+        while not run.done:
+            self.assertEqual(prerun(self.filepath).title, "Example 2D CA Run")
+        ca_config, timeline = run.join()
+        self.assertEqual(len(timeline), 21)
+
+    def test_cancel(self):
+        progress = StreamProgress()
+        # cancelled before the run starts, so it ends after one step
+        progress.cancelled = True
+        run = BackgroundRun(self.filepath, self.ca_config, progress)
+        ca_config, timeline = run.join()
+        self.assertEqual(len(timeline), 2)
+        self.assertEqual(timeline.metadata['cancelled'], 1)
+
+    def test_error(self):
+        filepath = TESTDESCRIPTIONS_PATH + '2dinvalid.py'
+        run = BackgroundRun(filepath, prerun(filepath))
+        # the description creates Grid2D with arguments it does not take
+        self.assertRaises(TypeError, run.join)
+
+if __name__ == '__main__':
+    unittest.main()
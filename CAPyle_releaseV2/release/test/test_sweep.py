@@ -0,0 +1,97 @@
+import sys, inspect, unittest
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import Observer, CAConfig, Grid2D
+from capyle.sweep import (parameter_grid, iter_sweep, sweep, replicate_seed,
+                          EverInState, FirstInState)
+
+TESTDESCRIPTIONS_PATH = 'test/testdescriptions/'
+
+class NumGenerations(Observer):
+    def start(self, grid, num_generations):
+        self.count = 0
+
+    def update(self, generation, grid):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+class RandomDraw(Observer):
+    #draws from the global random state seeded for the replicate
+    def result(self):
+        return np.random.random()
+
+class NumFrames(object):
+    #reduces the timeline, which is kept for it
+    def __call__(self, timeline):
+        return len(timeline)
+
+class TestParameterGrid(unittest.TestCase):
+    def test_product(self):
+        points = parameter_grid({'wrap': [True, False], 'num_generations': [5, 10, 15]})
+        self.assertEqual(len(points), 6)
+        self.assertIn({'wrap': False, 'num_generations': 10}, points)
+
+    def test_seeds(self):
+        self.assertEqual(replicate_seed(1, 2, 3), replicate_seed(1, 2, 3))
+        self.assertNotEqual(replicate_seed(1, 2, 3), replicate_seed(1, 2, 4))
+        self.assertNotEqual(replicate_seed(1, 2, 3), replicate_seed(2, 2, 3))
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.filepath = TESTDESCRIPTIONS_PATH + '2drun.py'
+        self.reducers = {'frames': NumGenerations(), 'draw': RandomDraw(),
+                         'visited': EverInState(1), 'first': FirstInState(1, 0)}
+
+    def test_overrides(self):
+        #num_generations is set in setup, but the override is kept
+        results = sweep(self.filepath, {'num_generations': [4, 8]}, replicates=2,
+                        reducers=self.reducers, processes=1)
+        self.assertEqual([r[1]['frames'] for r in results], [5, 9])
+        #the glider visits more cells the longer it runs
+        visited = [np.count_nonzero(r[1]['visited']) for r in results]
+        self.assertTrue(visited[0] < visited[1])
+        self.assertEqual(results[0][1]['first'], 1)
+
+    def test_interval(self):
+        #generations, not frame numbers, when only some frames are saved
+        config = CAConfig(TESTDESCRIPTIONS_PATH + '2dbasic.py')
+        config.states = 0, 1, 2, 3, 4, 5
+        config.grid_dims = 4, 4
+        config.num_generations = 10
+        config.timeline_interval = 2
+        config.initial_grid = np.full((4, 4), 5)
+        g = Grid2D(config, lambda grid, ns, nc: np.maximum(grid - 1, 0))
+        g.show_progress = False
+        first = FirstInState(0, 5)
+        g.run(observers=[first])
+        self.assertEqual(first.result(), 5)
+
+    def test_timeline_reducer(self):
+        results = sweep(self.filepath, {'num_generations': [4]},
+                        reducers={'frames': NumFrames(),
+                                  'first': FirstInState(1, 0)},
+                        processes=1)
+        self.assertEqual(results[0][1]['frames'], 5)
+        self.assertEqual(results[0][1]['first'], 1)
+
+    def test_deterministic(self):
+        overrides = {'num_generations': [2]}
+        single = list(iter_sweep(self.filepath, overrides, replicates=3,
+                                 reducers=self.reducers, seed=7, processes=1))
+        pooled = list(iter_sweep(self.filepath, overrides, replicates=3,
+                                 reducers=self.reducers, seed=7, processes=2))
+        draws = {r: stats['draw'] for i, params, r, stats in single}
+        self.assertEqual(len(set(draws.values())), 3)
+        for i, params, r, stats in pooled:
+            self.assertEqual(stats['draw'], draws[r])
+
+if __name__ == '__main__':
+    unittest.main()
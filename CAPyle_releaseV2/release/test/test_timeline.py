@@ -0,0 +1,89 @@
+import sys, inspect, unittest, os, pickle, tempfile
+import numpy as np
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+
+from capyle.ca import Timeline, Grid2D, CAConfig
+
+class TestTimeline(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'timeline.tl')
+        self.frames = np.random.randint(0, 7, (5, 12, 9))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def fill(self, timeline):
+        for i, frame in enumerate(self.frames):
+            self.assertEqual(len(timeline), i)
+            timeline[i] = frame
+
+    def test_memory(self):
+        timeline = Timeline(5, (12, 9), np.int8, (0,1,2,3,4,5,6))
+        self.fill(timeline)
+        self.assertTrue(np.array_equal(timeline.array, self.frames))
+        self.assertTrue(np.array_equal(timeline[-1], self.frames[-1]))
+        loaded = pickle.loads(pickle.dumps(timeline))
+        self.assertTrue(np.array_equal(loaded.array, self.frames))
+
+    def test_out_of_order(self):
+        timeline = Timeline(5, (12, 9))
+        self.assertRaises(IndexError, timeline.__setitem__, 2, self.frames[2])
+
+    def test_file(self):
+        timeline = Timeline(5, (12, 9), np.int16, (0,1,2,3,4,5,6), path=self.path)
+        self.fill(timeline)
+        timeline.flush()
+        loaded = Timeline.open(self.path)
+        self.assertEqual(len(loaded), 5)
+        self.assertEqual(loaded.dtype, np.int16)
+        self.assertEqual(loaded.states, (0,1,2,3,4,5,6))
+        for a, b in zip(loaded, self.frames):
+            self.assertTrue(np.array_equal(a, b))
+        #only the path is pickled for file backed timelines
+        self.assertTrue(len(pickle.dumps(timeline)) < self.frames.nbytes)
+        self.assertTrue(np.array_equal(pickle.loads(pickle.dumps(timeline)).array, self.frames))
+
+    def test_partial_file(self):
+        timeline = Timeline(5, (12, 9), path=self.path)
+        timeline[0] = self.frames[0]
+        timeline.flush()
+        self.assertEqual(len(Timeline.open(self.path)), 1)
+
+    def test_large_header(self):
+        states = tuple(range(200))
+        timeline = Timeline(5, (12, 9), np.uint8, states, path=self.path)
+        self.assertEqual(Timeline.open(self.path).states, states)
+        timeline[0] = self.frames[0]
+        timeline[1] = self.frames[1]
+        # the header outgrows the space before the frames
+        timeline.metadata['notes'] = 'x' * 5000
+        timeline.flush()
+        timeline[2] = self.frames[2]
+        timeline.flush()
+        loaded = Timeline.open(self.path)
+        self.assertEqual(loaded.metadata['notes'], 'x' * 5000)
+        self.assertEqual(loaded.states, states)
+        self.assertTrue(np.array_equal(loaded.array, self.frames[:3]))
+        self.assertEqual(os.listdir(self.tempdir.name), ['timeline.tl'])
+
+    def test_grid_run(self):
+        config = CAConfig('test/testdescriptions/2dbasic.py')
+        config.states = 0,1
+        config.grid_dims = 10,10
+        config.num_generations = 6
+        config.timeline_file = self.path
+        config.initial_grid = np.random.randint(0, 2, config.grid_dims)
+        g = Grid2D(config, lambda grid, ns, nc: grid)
+        g.show_progress = False
+        timeline = g.run()
+        self.assertEqual(len(timeline), 7)
+        self.assertTrue(np.array_equal(Timeline.open(self.path)[6], config.initial_grid))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,4 @@
-import unittest, inspect, sys
+import unittest, inspect, sys, tempfile
 import numpy as np
 this_file_loc = (inspect.stack()[0][1])
 main_dir_loc = this_file_loc[:this_file_loc.index('test')]
@@ -90,5 +90,62 @@ class TestScaleArray(unittest.TestCase):
         self.assertTrue(b.shape == toshape)
         self.assertTrue(np.array_equal(b, a[:b.shape[0], :b.shape[1]]))
 
+    def test_keeps_dtype(self):
+        a = np.ones((10,10), dtype=np.uint8)
+        b = utils.scale_array(a, 12, 12)
+        self.assertEqual(b.dtype, np.uint8)
+        self.assertTrue(np.all(b[10:] == 0))
+
+    def test_dtype(self):
+        a = np.ones((10,10))
+        b = utils.scale_array(a, 5, 5, dtype=np.int8)
+        self.assertEqual(b.dtype, np.int8)
+
+class TestStateDtype(unittest.TestCase):
+    def test_unsigned(self):
+        self.assertEqual(utils.state_dtype((0,1,2,3,4,5,6)), np.uint8)
+
+    def test_signed(self):
+        self.assertEqual(utils.state_dtype((0,1,2), extra=(-100,)), np.int8)
+
+    def test_wide(self):
+        self.assertEqual(utils.state_dtype((0,1000)), np.uint16)
+        self.assertEqual(utils.state_dtype((-1,1000)), np.int16)
+
+    def test_float(self):
+        self.assertEqual(utils.state_dtype((0,0.5)), np.float64)
+
+    def test_float_whole(self):
+        self.assertEqual(utils.state_dtype((0.0,1.0)), np.uint8)
+
+    def test_no_states(self):
+        self.assertEqual(utils.state_dtype(None), np.uint8)
+
+#----------------------------------------------------------------------
+
+class FakeGraph(object):
+    def __init__(self):
+        self.saved = []
+
+    def screenshot(self, filepath):
+        self.saved.append(filepath)
+        open(filepath, 'w').close()
+
+class TestScreenshot(unittest.TestCase):
+    def test_unique_files(self):
+        folder = tempfile.mkdtemp()
+        graph = FakeGraph()
+        first = utils.screenshot(graph, 'Game of life', folder)
+        second = utils.screenshot(graph, 'Game of life', folder)
+        self.assertNotEqual(first, second)
+        self.assertEqual(graph.saved, [folder + '/' + first,
+                                       folder + '/' + second])
+        self.assertTrue(first.startswith('Game_of_life_'))
+
+    def test_missing_folder(self):
+        graph = FakeGraph()
+        self.assertIsNone(utils.screenshot(graph, 'a', '/no/such/folder'))
+        self.assertEqual(graph.saved, [])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,64 @@
+# Name: Example 2D CA Run
+# Dimensions: 2
+
+# --- Set up executable path, do not edit ---
+import sys, inspect
+this_file_loc = (inspect.stack()[0][1])
+main_dir_loc = this_file_loc[:this_file_loc.index('test/testdescriptions')]
+sys.path.append(main_dir_loc)
+sys.path.append(main_dir_loc + 'capyle')
+sys.path.append(main_dir_loc + 'capyle/ca')
+sys.path.append(main_dir_loc + 'capyle/guicomponents')
+# ---
+
+import numpy as np
+from capyle.ca import Grid2D
+import capyle.utils as utils
+
+def transition_func(grid, neighbourstates, neighbourcounts):
+    dead_neighbours, live_neighbours = neighbourcounts
+    # if 3 live neighbours and is dead -> cell born
+    birth = (live_neighbours == 3) & (grid == 0)
+    # if 2 or 3 live neighbours and is alive -> survives
+    survive = ((live_neighbours == 2) | (live_neighbours == 3)) & (grid == 1)
+    grid[:, :] = 0
+    grid[birth | survive] = 1
+    return grid
+
+def setup(args):
+    config_path = args[0]
+    config = utils.load(config_path)
+    # --- THE CA MUST BE RELOADED IN THE GUI IF ANY OF THE BELOW ARE CHANGED ---
+    config.title = "Example 2D CA Run"
+    config.dimensions = 2
+    config.states = (0,1)
+    # --------------------------------------------------------------------------
+
+    # ---- Override the defaults below (these may be changed at anytime) ----
+    config.num_generations = 20
+    config.grid_dims = (20,20)
+    # ----------------------------------------------------------------------
+
+    if len(args) == 2:
+        config.save()
+        sys.exit()
+
+    return config
+
+def main(args=None):
+    config = setup(sys.argv[1:] if args is None else args)
+
+    grid = Grid2D(config, transition_func)
+    # glider in the top left corner
+    grid.grid[1, 2] = 1
+    grid.grid[2, 3] = 1
+    grid.grid[3, 1:4] = 1
+    grid.refresh_wrap()
+
+    timeline = grid.run()
+
+    config.save()
+    utils.save(timeline, config.timeline_path)
+
+if __name__ == "__main__":
+    main()